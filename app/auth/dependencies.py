@@ -1,13 +1,35 @@
 from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
 from app.security.tokens import verify_access_token
-from app.database.crud import get_user_by_username
-from app.database.database import get_db
+from app.database.crud import get_user_by_username, get_user_by_username_async
+from app.database.database import (
+    get_async_db, get_db, get_read_db
+)
+from app.auth.principals import Principal, principal_cache
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 
+def _credentials_exception():
+    return HTTPException(
+        status_code=401,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def _token_subject(token: str) -> str:
+    payload = verify_access_token(token)
+    if not payload:
+        raise _credentials_exception()
+    username: str = payload.get("sub")
+    if username is None:
+        raise _credentials_exception()
+    return username
+
+
 def get_current_user(
     token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
 ):
@@ -20,18 +42,65 @@ def get_current_user(
     Raises:
         HTTPException: 401 if token is invalid or user not found
     """
-    credentials_exception = HTTPException(
-        status_code=401,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    payload = verify_access_token(token)
-    if not payload:
-        raise credentials_exception
-    username: str = payload.get("sub")
-    if username is None:
-        raise credentials_exception
+    username = _token_subject(token)
     user = get_user_by_username(db, username)
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
+    principal_cache.set(username, Principal.from_user(user))
     return user
+
+
+def get_current_principal(
+    token: str = Depends(oauth2_scheme), db: Session = Depends(get_read_db)
+) -> Principal:
+    """Dependency to get a cached, session-free identity from JWT token.
+
+    Resolved principals are kept in a bounded TTL cache, so hot-path
+    requests do not query the users table. The cache is invalidated
+    whenever a user row is inserted, updated or deleted.
+    Args:
+        token: JWT access token from Authorization header
+        db: Database session, only used on a cache miss
+    Returns:
+        Principal: Immutable id/username of the authenticated user
+    Raises:
+        HTTPException: 401 if token is invalid or user not found
+    """
+    username = _token_subject(token)
+    principal = principal_cache.get(username)
+    if principal is not None:
+        return principal
+    user = get_user_by_username(db, username)
+    if user is None:
+        raise _credentials_exception()
+    principal = Principal.from_user(user)
+    principal_cache.set(username, principal)
+    return principal
+
+
+async def get_current_principal_async(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db),
+) -> Principal:
+    """Async counterpart of ``get_current_principal``.
+
+    Runs on the event loop, so async routes never hop to the threadpool
+    just to authenticate.
+    Args:
+        token: JWT access token from Authorization header
+        db: Async database session, only used on a cache miss
+    Returns:
+        Principal: Immutable id/username of the authenticated user
+    Raises:
+        HTTPException: 401 if token is invalid or user not found
+    """
+    username = _token_subject(token)
+    principal = principal_cache.get(username)
+    if principal is not None:
+        return principal
+    user = await get_user_by_username_async(db, username)
+    if user is None:
+        raise _credentials_exception()
+    principal = Principal.from_user(user)
+    principal_cache.set(username, principal)
+    return principal
@@ -0,0 +1,53 @@
+import os
+from dataclasses import dataclass
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from app.database.models import User
+from app.services.cache import TTLCache
+
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "4096"))
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Immutable identity of an authenticated user.
+
+    Unlike the ORM ``User`` it is not bound to a session, so it can be
+    cached across requests and shared between threads.
+    """
+
+    id: int
+    username: str
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(id=user.id, username=user.username)
+
+
+# Resolved principals keyed by username (the JWT subject)
+principal_cache = TTLCache(
+    maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL
+)
+
+
+def invalidate_principal(username: str):
+    """Forget the cached principal for a username."""
+    principal_cache.pop(username)
+
+
+@event.listens_for(User, "after_insert")
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_user(mapper, connection, target):
+    invalidate_principal(target.username)
+    for old_username in inspect(target).attrs.username.history.deleted:
+        invalidate_principal(old_username)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _invalidate_bulk_user_changes(orm_execute_state):
+    # Bulk UPDATE/DELETE statements bypass the per-object events above
+    if (orm_execute_state.is_update or orm_execute_state.is_delete) and \
+            orm_execute_state.bind_mapper is inspect(User):
+        principal_cache.clear()
@@ -0,0 +1,256 @@
+"""At-rest compression of note bodies.
+
+``CompressedText`` stores bodies of at least ``NOTE_COMPRESS_THRESHOLD``
+UTF-8 bytes as a zlib BLOB behind a small header, and anything shorter,
+or anything that does not shrink, as plain TEXT. Reads tell the two
+apart by the SQLite storage class and the header, so rows written before
+compression existed keep working unchanged.
+
+The header records the uncompressed length, so SQL can report a body's
+size without inflating it and a snippet only inflates its first bytes.
+Connections of the application's engines, and of any engine passed to
+``register_functions``, get these SQL functions for queries (the schema
+never uses them, so other clients can still write notes):
+
+- ``note_content(content)``: the body as text
+- ``note_content_length(content)``: its length in UTF-8 bytes
+- ``note_snippet(content, n)``: its first ``n`` characters
+
+Compress the rows of an existing database in the background with::
+
+    python -m app.database.compression recompress
+    python -m app.database.compression stats
+"""
+
+import argparse
+import os
+import struct
+import time
+import zlib
+from sqlalchemy import Text, event
+from sqlalchemy.types import TypeDecorator
+from app.database.database import async_engine, engine, read_engine
+
+# Bodies of at least this many UTF-8 bytes are compressed; 0 disables
+NOTE_COMPRESS_THRESHOLD = int(os.getenv("NOTE_COMPRESS_THRESHOLD", "1024"))
+NOTE_COMPRESS_LEVEL = int(os.getenv("NOTE_COMPRESS_LEVEL", "6"))
+
+# Marker and format version, then the uncompressed length in bytes
+MAGIC = b"NZ\x01"
+_HEADER = struct.Struct(">3sI")
+
+
+def compress_content(
+    text: str,
+    threshold: int = None,
+    level: int = None,
+):
+    """Encode a note body for storage.
+
+    Returns:
+        bytes or str: The compressed form with its header, or ``text``
+        itself when it is below the threshold or does not shrink
+    """
+    threshold = NOTE_COMPRESS_THRESHOLD if threshold is None else threshold
+    level = NOTE_COMPRESS_LEVEL if level is None else level
+    if not threshold:
+        return text
+    raw = text.encode()
+    if len(raw) < threshold:
+        return text
+    packed = _HEADER.pack(MAGIC, len(raw)) + zlib.compress(raw, level)
+    return packed if len(packed) < len(raw) else text
+
+
+def is_compressed(value) -> bool:
+    return isinstance(value, bytes) and value[:len(MAGIC)] == MAGIC
+
+
+def decompress_content(value):
+    """Decode a stored note body; plain text is returned unchanged."""
+    if isinstance(value, bytes):
+        if is_compressed(value):
+            return zlib.decompress(value[_HEADER.size:]).decode()
+        return value.decode()
+    return value
+
+
+def content_length(value):
+    """UTF-8 length of a stored body, read from the header if compressed."""
+    if value is None:
+        return None
+    if is_compressed(value):
+        return _HEADER.unpack_from(value)[1]
+    if isinstance(value, bytes):
+        return len(value)
+    return len(value.encode())
+
+
+def content_snippet(value, length: int):
+    """First ``length`` characters, inflating only as much as needed."""
+    if is_compressed(value):
+        inflated = zlib.decompressobj().decompress(
+            value[_HEADER.size:], length * 4
+        )
+        # A character cut at the end is dropped
+        return inflated.decode(errors="ignore")[:length]
+    value = decompress_content(value)
+    return None if value is None else value[:length]
+
+
+class CompressedText(TypeDecorator):
+    """Text column that compresses large values transparently."""
+
+    impl = Text
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return compress_content(value)
+
+    def process_result_value(self, value, dialect):
+        return decompress_content(value)
+
+
+def _add_functions(dbapi_connection, connection_record):
+    if not hasattr(dbapi_connection, "create_function"):
+        return
+    dbapi_connection.create_function(
+        "note_content", 1, decompress_content, deterministic=True
+    )
+    dbapi_connection.create_function(
+        "note_content_length", 1, content_length, deterministic=True
+    )
+    dbapi_connection.create_function(
+        "note_snippet", 2, content_snippet, deterministic=True
+    )
+
+
+def register_functions(bind):
+    """Add the note content SQL functions to every connection of ``bind``."""
+    event.listen(bind, "connect", _add_functions)
+    return bind
+
+
+for _bind in dict.fromkeys((engine, read_engine, async_engine.sync_engine)):
+    register_functions(_bind)
+
+
+def recompress(
+    bind,
+    threshold: int = None,
+    level: int = None,
+    batch_size: int = 500,
+    everything: bool = False,
+    pause: float = 0.0,
+) -> dict:
+    """Bring stored bodies in line with the compression settings.
+
+    Walks ``notes`` by id in short transactions, so it can run next to
+    the application. Plain bodies over the threshold are compressed;
+    with ``everything`` compressed bodies are re-encoded as well, e.g.
+    after a level change. ``updated_at`` is left alone, so ETags and
+    cursors stay valid. The search index triggers see the stored value
+    change and re-index each rewritten row, which needs ``sync_index``
+    on ``bind`` (or a later ``ensure_fts``) for compressed bodies.
+
+    Returns:
+        dict: Rows scanned and rewritten, and bytes before and after
+    """
+    stats = {"scanned": 0, "rewritten": 0, "bytes_before": 0,
+             "bytes_after": 0}
+    after = 0
+    while True:
+        with bind.begin() as connection:
+            rows = connection.exec_driver_sql(
+                "SELECT id, content FROM notes WHERE id > ? "
+                "ORDER BY id LIMIT ?",
+                (after, batch_size),
+            ).fetchall()
+            if not rows:
+                return stats
+            changes = []
+            for note_id, stored in rows:
+                if everything or not is_compressed(stored):
+                    encoded = compress_content(
+                        decompress_content(stored), threshold, level
+                    )
+                    if encoded != stored:
+                        changes.append((encoded, note_id))
+                        stats["bytes_before"] += _stored_size(stored)
+                        stats["bytes_after"] += _stored_size(encoded)
+            if changes:
+                connection.exec_driver_sql(
+                    "UPDATE notes SET content = ? WHERE id = ?", changes
+                )
+        stats["scanned"] += len(rows)
+        stats["rewritten"] += len(changes)
+        after = rows[-1][0]
+        if pause:
+            time.sleep(pause)
+
+
+def _stored_size(value) -> int:
+    return len(value) if isinstance(value, bytes) else len(value.encode())
+
+
+def storage_stats(bind) -> dict:
+    """How many bodies are compressed and how much space they take."""
+    with bind.connect() as connection:
+        row = connection.exec_driver_sql(
+            "SELECT count(*), "
+            "sum(typeof(content) = 'blob'), "
+            "coalesce(sum(length(CAST(content AS BLOB))), 0), "
+            "coalesce(sum(note_content_length(content)), 0) "
+            "FROM notes"
+        ).one()
+    notes, compressed, stored, original = row
+    return {
+        "notes": notes,
+        "compressed": compressed or 0,
+        "stored_bytes": stored,
+        "content_bytes": original,
+        "ratio": original / stored if stored else 1.0,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="python -m app.database.compression",
+        description="Manage compression of stored note bodies.",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("recompress")
+    run.add_argument("--threshold", type=int, default=None)
+    run.add_argument("--level", type=int, default=None)
+    run.add_argument("--batch-size", type=int, default=500)
+    run.add_argument("--pause", type=float, default=0.0,
+                     help="seconds to sleep between batches")
+    run.add_argument("--all", action="store_true",
+                     help="re-encode compressed bodies too")
+    commands.add_parser("stats")
+    args = parser.parse_args()
+
+    if args.command == "recompress":
+        # Imported here: fts depends on this module through the models.
+        # Importing it also indexes compressed bodies as they are written
+        from app.database.fts import ensure_fts, optimize_fts
+
+        # Triggers from older schemas would index the stored bytes
+        ensure_fts(engine)
+        started = time.perf_counter()
+        result = recompress(engine, args.threshold, args.level,
+                            args.batch_size, args.all, args.pause)
+        if result["rewritten"]:
+            with engine.begin() as connection:
+                optimize_fts(connection)
+        elapsed = time.perf_counter() - started
+        print(f"Scanned {result['scanned']} notes, rewrote "
+              f"{result['rewritten']} ({result['bytes_before']} -> "
+              f"{result['bytes_after']} bytes) in {elapsed:.1f}s")
+    result = storage_stats(engine)
+    print(f"{result['compressed']}/{result['notes']} notes compressed, "
+          f"{result['stored_bytes']} bytes stored for "
+          f"{result['content_bytes']} bytes of content "
+          f"({result['ratio']:.2f}x)")
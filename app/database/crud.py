@@ -1,6 +1,27 @@
-from sqlalchemy.orm import Session
-from .models import User, Note
-from app.security.hashing import get_password_hash, verify_password
+from sqlalchemy import Integer, String, delete, func, insert, select
+from sqlalchemy import tuple_, type_coerce, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, make_transient_to_detached, undefer
+from sqlalchemy.orm.attributes import set_committed_value
+from .models import User, Note, NoteListVersion, TranslationJob
+from app.security.hashing import (
+    get_password_hash,
+    verify_and_update_password,
+)
+
+
+def commit_keeping_loaded(db: Session):
+    """Commit without expiring loaded objects.
+
+    Rows that were just read back with RETURNING are already current, so
+    this saves the refresh SELECT that would follow a normal commit.
+    """
+    expire_on_commit = db.expire_on_commit
+    db.expire_on_commit = False
+    try:
+        db.commit()
+    finally:
+        db.expire_on_commit = expire_on_commit
 
 
 def create_user(db: Session, username: str, password: str) -> User:
@@ -13,10 +34,23 @@ def create_user(db: Session, username: str, password: str) -> User:
         User: Created user object
     """
     hashed_password = get_password_hash(password)
-    db_user = User(username=username, password_hash=hashed_password)
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    return add_user(db, username, hashed_password)
+
+
+def add_user(db: Session, username: str, password_hash: str) -> User:
+    """Store a user whose password has already been hashed.
+    Args:
+        db: Database session
+        username: Unique username
+        password_hash: bcrypt hash of the password
+    Returns:
+        User: Created user object
+    """
+    db_user = db.scalars(insert(User).returning(User), [{
+        "username": username,
+        "password_hash": password_hash,
+    }]).one()
+    commit_keeping_loaded(db)
     return db_user
 
 
@@ -24,54 +58,727 @@ def get_user_by_username(db: Session, username: str):
     return db.query(User).filter(User.username == username).first()
 
 
+def update_password_hash(db: Session, user: User, password_hash: str):
+    user.password_hash = password_hash
+    db.commit()
+    return user
+
+
 def authenticate_user(db: Session, username: str, password: str):
     user = get_user_by_username(db, username)
-    if not user or not verify_password(password, user.password_hash):
+    if not user:
         return None
+    verified, new_hash = verify_and_update_password(
+        password, user.password_hash
+    )
+    if not verified:
+        return None
+    if new_hash:
+        update_password_hash(db, user, new_hash)
     return user
 
 
 def get_note_by_id(db: Session, note_id: int):
-    return db.query(Note).filter(Note.id == note_id).first()
+    return db.query(Note).options(undefer(Note.content)).filter(
+        Note.id == note_id
+    ).first()
+
+
+def get_user_notes_by_ids(db: Session, user_id: int, note_ids: list) -> dict:
+    """The user's notes among ``note_ids``, with content, keyed by id.
+
+    One query for all of them; other users' notes are never loaded.
+    """
+    notes = db.scalars(
+        select(Note)
+        .options(undefer(Note.content))
+        .where(Note.user_id == user_id, Note.id.in_(note_ids))
+    )
+    return {note.id: note for note in notes}
+
+
+def get_existing_note_ids(db: Session, note_ids: list) -> set:
+    """Which of ``note_ids`` exist, whoever owns them."""
+    return set(db.scalars(select(Note.id).where(Note.id.in_(note_ids))))
+
+
+def _stored_timestamps(versions: list) -> list:
+    # Timestamps as stored: microsecond values written by SQLAlchemy, and
+    # whole seconds for rows stamped by CURRENT_TIMESTAMP
+    stored = []
+    for version in versions:
+        stored.append(version.strftime("%Y-%m-%d %H:%M:%S.%f"))
+        if version.microsecond == 0:
+            stored.append(version.strftime("%Y-%m-%d %H:%M:%S"))
+    return stored
+
+
+def _returned_note(row) -> Note:
+    """Wrap a RETURNING row as a detached Note.
+
+    ORM UPDATE ... RETURNING leaves a copy of the note that is already in
+    the identity map untouched; merging this object with ``load=False``
+    refreshes that copy without another query.
+    """
+    note = Note(**row._mapping)
+    make_transient_to_detached(note)
+    return note
+
+
+def _note_returning(values: dict) -> list:
+    # A body that was just written is known; reading it back would only
+    # inflate it again
+    written = {"content"} & values.keys()
+    return [column for column in Note.__table__.c
+            if column.key not in written]
+
+
+def _set_written_content(note: Note, content: str):
+    """Fill in a deferred body with the text that was just written."""
+    set_committed_value(note, "content", content)
+    return note
+
+
+def _owned_note(note_id: int, user_id: int, versions: list = None):
+    condition = (Note.id == note_id) & (Note.user_id == user_id)
+    if versions is not None:
+        raw_updated_at = type_coerce(Note.updated_at, String)
+        condition &= raw_updated_at.in_(_stored_timestamps(versions))
+    return condition
+
+
+def note_access_status(db: Session, note_id: int, user_id: int = None) -> int:
+    """Explain why an ownership-scoped statement matched no row.
+
+    Only runs on the failure path, so successful writes stay a single
+    statement.
+    Returns:
+        int: 404 if the note does not exist, 403 if it belongs to
+        another user, 412 if it is the user's but at another version
+    """
+    owner = db.scalar(select(Note.user_id).where(Note.id == note_id))
+    if owner is None:
+        return 404
+    return 412 if owner == user_id else 403
+
+
+def get_note_version(db: Session, note_id: int):
+    """Fetch only what an ETag check needs.
+
+    Returns:
+        Row: (user_id, updated_at), or None if the note does not exist
+    """
+    return db.execute(
+        select(Note.user_id, Note.updated_at).where(Note.id == note_id)
+    ).first()
+
+
+def get_user_notes_version(db: Session, user_id: int) -> int:
+    """Version of a user's notes that any create, update or delete
+    changes.
+
+    Read from the counter the notes triggers keep in
+    ``note_list_versions``, so it costs one primary key lookup however
+    many notes the user has.
+    Returns:
+        int: The version, 0 before the user's first change
+    """
+    return db.scalar(
+        select(NoteListVersion.version)
+        .where(NoteListVersion.user_id == user_id)
+    ) or 0
+
+
+def add_note(db: Session, title: str, content: str, user_id: int):
+    """Insert a note without committing, so it can join a larger batch."""
+    note = db.scalars(insert(Note).returning(Note), [{
+        "title": title,
+        "content": content,
+        "user_id": user_id,
+    }]).one()
+    return _set_written_content(note, content)
 
 
 def create_note(db: Session, title: str, content: str, user_id: int):
-    db_note = Note(title=title, content=content, user_id=user_id)
-    db.add(db_note)
-    db.commit()
-    db.refresh(db_note)
+    db_note = add_note(db, title, content, user_id)
+    commit_keeping_loaded(db)
     return db_note
 
 
+def apply_note_update(
+        db: Session,
+        note_id: int,
+        user_id: int,
+        title: str = None,
+        content: str = None,
+        versions: list = None
+):
+    """Update a user's note without committing.
+
+    Ownership (and the expected version, if given) is part of the WHERE
+    clause and the new row comes back through RETURNING, so an update is
+    one statement.
+    Args:
+        db: Database session
+        note_id: Target note ID
+        user_id: Owner the note must belong to
+        title: New title, unchanged if None
+        content: New content, unchanged if None
+        versions: updated_at values the note must currently have
+    Returns:
+        Tuple: (note, 200) or (None, 404/403/412)
+    """
+    values = {
+        name: value
+        for name, value in (("title", title), ("content", content))
+        if value is not None
+    }
+    if values:
+        row = db.execute(
+            update(Note).where(_owned_note(note_id, user_id, versions))
+            .values(**values).returning(*_note_returning(values))
+        ).first()
+        note = db.merge(_returned_note(row), load=False) if row else None
+        if note is not None and content is not None:
+            _set_written_content(note, content)
+    else:
+        note = db.scalars(
+            select(Note).options(undefer(Note.content))
+            .where(_owned_note(note_id, user_id, versions))
+        ).one_or_none()
+    if note is None:
+        return None, note_access_status(db, note_id, user_id)
+    return note, 200
+
+
 def update_note(
         db: Session,
         note_id: int,
+        user_id: int,
         title: str = None,
-        content: str = None
+        content: str = None,
+        versions: list = None
 ):
-    note = get_note_by_id(db, note_id)
-    if title is not None:
-        note.title = title
-    if content is not None:
-        note.content = content
+    """Update a user's note and commit.
+
+    Returns:
+        Tuple: (note, 200) or (None, 404/403/412)
+    """
+    note, status = apply_note_update(
+        db, note_id, user_id, title=title, content=content,
+        versions=versions
+    )
+    if note is not None:
+        commit_keeping_loaded(db)
+    return note, status
+
+
+def delete_note(db: Session, note_id: int, user_id: int,
+                versions: list = None) -> int:
+    """Delete a user's note with one ownership-scoped statement.
+
+    Args:
+        db: Database session
+        note_id: Target note ID
+        user_id: Owner the note must belong to
+        versions: updated_at values the note must currently have
+    Returns:
+        int: 200 if deleted, otherwise 404/403/412
+    """
+    deleted = db.execute(
+        delete(Note).where(_owned_note(note_id, user_id, versions))
+        .returning(Note.id)
+    ).first()
+    if deleted is None:
+        return note_access_status(db, note_id, user_id)
     db.commit()
-    db.refresh(note)
-    return note
+    return 200
+
+
+# Columns of a note as returned by the API, for Core row queries
+NOTE_COLUMNS = (
+    Note.id,
+    Note.user_id,
+    Note.title,
+    Note.content,
+    Note.created_at,
+    Note.updated_at,
+)
+
+# Characters of content returned as a listing's snippet
+NOTE_SNIPPET_LENGTH = 200
+
+# Columns a listing can select by name. content_length (in UTF-8 bytes)
+# and snippet are computed in SQL, so summaries never load or inflate
+# the full content (see app.database.compression)
+NOTE_LIST_FIELDS = {
+    "id": Note.id,
+    "user_id": Note.user_id,
+    "title": Note.title,
+    "content": Note.content,
+    "created_at": Note.created_at,
+    "updated_at": Note.updated_at,
+    "content_length": func.note_content_length(
+        Note.content, type_=Integer
+    ).label("content_length"),
+    "snippet": func.note_snippet(
+        Note.content, NOTE_SNIPPET_LENGTH, type_=String
+    ).label("snippet"),
+}
+
+NOTE_SUMMARY_FIELDS = (
+    "id",
+    "user_id",
+    "title",
+    "created_at",
+    "updated_at",
+    "content_length",
+    "snippet",
+)
+
+
+def note_list_columns(fields) -> tuple:
+    """Columns for the ``NOTE_LIST_FIELDS`` names in ``fields``."""
+    return tuple(NOTE_LIST_FIELDS[name] for name in fields)
+
+
+def _user_notes_statement(user_id: int, skip: int, limit: int,
+                          order: str = None, columns: tuple = (Note,)):
+    query = select(*columns).where(Note.user_id == user_id)
+    if order == "asc":
+        query = query.order_by(Note.updated_at.asc(), Note.id.asc())
+    elif order == "desc":
+        query = query.order_by(Note.updated_at.desc(), Note.id.desc())
+    return query.offset(skip).limit(limit)
+
+
+def _user_notes_keyset_statement(user_id: int, limit: int, after: tuple,
+                                 order: str, columns: tuple = (Note,)):
+    # Raw stored value, so cursors compare exactly like the column
+    raw_updated_at = type_coerce(Note.updated_at, String).label(
+        "raw_updated_at"
+    )
+    key = tuple_(Note.updated_at, Note.id)
+    query = select(*columns, raw_updated_at).where(Note.user_id == user_id)
+    if order == "asc":
+        if after is not None:
+            query = query.where(key > tuple_(*after))
+        query = query.order_by(Note.updated_at.asc(), Note.id.asc())
+    else:
+        if after is not None:
+            query = query.where(key < tuple_(*after))
+        query = query.order_by(Note.updated_at.desc(), Note.id.desc())
+    return query.limit(limit + 1)
 
 
-def delete_note(db: Session, note_id: int):
-    note = get_note_by_id(db, note_id)
-    if note:
-        db.delete(note)
+def _keyset_rows_page(rows: list, limit: int):
+    # Rows end with raw_updated_at, which is not part of the response
+    notes = [row._asdict() for row in rows[:limit]]
+    for note in notes:
+        del note["raw_updated_at"]
+    position = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        position = (last.raw_updated_at, last.id)
+    return notes, position
+
+
+def get_user_notes(
+        db: Session,
+        user_id: int,
+        skip: int = 0,
+        limit: int = 100,
+        order: str = None
+):
+    return db.scalars(
+        _user_notes_statement(user_id, skip, limit, order)
+        .options(undefer(Note.content))
+    ).all()
+
+
+def get_user_note_rows(
+        db: Session,
+        user_id: int,
+        skip: int = 0,
+        limit: int = 100,
+        order: str = None,
+        columns: tuple = NOTE_COLUMNS
+) -> list:
+    """Like ``get_user_notes``, but as plain dicts from a Core query.
+
+    Skips ORM identity tracking and object construction; used by the
+    listing routes, which serialize the rows directly.
+    """
+    statement = _user_notes_statement(
+        user_id, skip, limit, order, columns=columns
+    )
+    return [row._asdict() for row in db.execute(statement)]
+
+
+def get_user_note_rows_keyset(
+        db: Session,
+        user_id: int,
+        limit: int = 100,
+        after: tuple = None,
+        order: str = "desc",
+        columns: tuple = NOTE_COLUMNS
+):
+    """Fetch one page of a user's notes ordered by (updated_at, id).
+
+    Seeks past ``after`` using ix_notes_user_updated_id instead of
+    skipping rows, so every page costs the same.
+    Args:
+        db: Database session
+        user_id: Owner of the notes
+        limit: Page size
+        after: (updated_at, id) of the last row of the previous page,
+            with updated_at as stored in the database
+        order: "asc" or "desc"
+        columns: Columns to return; must include ``Note.id``
+    Returns:
+        Tuple: (rows as dicts, position of the last row or None if no
+        more pages)
+    """
+    if limit < 1:
+        return [], None
+    rows = db.execute(_user_notes_keyset_statement(
+        user_id, limit, after, order, columns=columns
+    )).all()
+    return _keyset_rows_page(rows, limit)
+
+
+def iter_user_note_chunks(db: Session, user_id: int,
+                          chunk_size: int = 1000):
+    """Yield all of a user's notes, ordered by id, as lists of dicts.
+
+    Rows are fetched ``chunk_size`` at a time from a server-side cursor,
+    so memory use does not grow with the number of notes.
+    """
+    statement = (
+        select(*NOTE_COLUMNS)
+        .where(Note.user_id == user_id)
+        .order_by(Note.id)
+        .execution_options(yield_per=chunk_size)
+    )
+    for partition in db.execute(statement).partitions():
+        yield [row._asdict() for row in partition]
+
+
+def import_notes(db: Session, user_id: int, notes: list) -> int:
+    """Insert notes with a single executemany and commit them.
+
+    Args:
+        db: Database session
+        user_id: Owner of the new notes
+        notes: Dicts with ``title`` and ``content``
+    Returns:
+        int: Number of notes inserted
+    """
+    if not notes:
+        return 0
+    db.execute(insert(Note), [{
+        "title": note["title"],
+        "content": note["content"],
+        "user_id": user_id,
+    } for note in notes])
+    db.commit()
+    return len(notes)
+
+
+def create_translation_job(
+        db: Session,
+        job_id: str,
+        note_id: int,
+        user_id: int,
+        source_lang: str,
+        target_lang: str
+):
+    job = TranslationJob(
+        id=job_id,
+        note_id=note_id,
+        user_id=user_id,
+        source_lang=source_lang,
+        target_lang=target_lang,
+        status="pending",
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def get_translation_job(db: Session, job_id: str):
+    return db.query(TranslationJob).filter(TranslationJob.id == job_id).first()
+
+
+def update_translation_job(
+        db: Session,
+        job_id: str,
+        status: str,
+        result: str = None,
+        error: str = None
+):
+    job = get_translation_job(db, job_id)
+    if job:
+        job.status = status
+        job.result = result
+        job.error = error
         db.commit()
-    return note
+    return job
 
 
-def get_user_notes(db: Session, user_id: int, skip: int = 0, limit: int = 100):
+def delete_translation_job(db: Session, job_id: str):
+    job = get_translation_job(db, job_id)
+    if job:
+        db.delete(job)
+        db.commit()
+
+
+def get_unfinished_translation_jobs(db: Session):
     return (
-        db.query(Note)
-        .filter(Note.user_id == user_id)
-        .offset(skip)
-        .limit(limit)
+        db.query(TranslationJob)
+        .filter(TranslationJob.status.in_(("pending", "running")))
+        .order_by(TranslationJob.created_at)
         .all()
     )
+
+
+def apply_note_batch(db: Session, user_id: int, operations: list):
+    """Apply create/update/delete operations for one user atomically.
+
+    Ownership of every referenced note is checked with a single query,
+    each kind of change runs as one executemany-style statement, and the
+    whole batch is committed in one transaction.
+    Args:
+        db: Database session
+        user_id: Owner of the notes
+        operations: Dicts with "op" ("create", "update" or "delete"),
+            and "id", "title", "content" as needed
+    Returns:
+        List: One dict per operation, in order, with "status" (HTTP-style
+        code), "id", "note" (for creates and updates) and "error"
+    """
+    results = [
+        {"op": op["op"], "status": 200, "id": op.get("id"),
+         "note": None, "error": None}
+        for op in operations
+    ]
+
+    def fail(index, code, error):
+        results[index]["status"] = code
+        results[index]["error"] = error
+
+    referenced = [op["id"] for op in operations
+                  if op["op"] != "create" and op.get("id") is not None]
+    owners = dict(db.execute(
+        select(Note.id, Note.user_id).where(Note.id.in_(set(referenced)))
+    ).all()) if referenced else {}
+    seen = set()
+
+    creates, updates, deletes = [], [], []
+    for index, op in enumerate(operations):
+        if op["op"] == "create":
+            if op.get("title") is None or op.get("content") is None:
+                fail(index, 422, "Title and content are required")
+            else:
+                creates.append(index)
+            continue
+        note_id = op.get("id")
+        if note_id is None:
+            fail(index, 422, "Note id is required")
+        elif note_id in seen:
+            fail(index, 409, "Note appears more than once in the batch")
+        elif note_id not in owners:
+            fail(index, 404, "Note resource not found")
+        elif owners[note_id] != user_id:
+            fail(index, 403, "Unauthorized note access")
+        elif op["op"] == "update":
+            updates.append(index)
+        else:
+            deletes.append(index)
+        if note_id is not None:
+            seen.add(note_id)
+
+    if creates:
+        # Rowids are assigned in insertion order, so sorting the returned
+        # rows by id lines them up with the request without forcing
+        # SQLAlchemy into one INSERT per row
+        created = sorted(db.scalars(
+            insert(Note).returning(Note),
+            [{"user_id": user_id,
+              "title": operations[i]["title"],
+              "content": operations[i]["content"]} for i in creates],
+        ).all(), key=lambda note: note.id)
+        for index, note in zip(creates, created):
+            results[index]["id"] = note.id
+            results[index]["note"] = _set_written_content(
+                note, operations[index]["content"]
+            )
+    if updates:
+        changes = [
+            {key: operations[i][key] for key in ("id", "title", "content")
+             if operations[i].get(key) is not None}
+            for i in updates
+        ]
+        changes = [change for change in changes if len(change) > 1]
+        if changes:
+            db.execute(update(Note), changes)
+        updated = {
+            note.id: note for note in db.scalars(
+                select(Note).options(undefer(Note.content))
+                .where(Note.id.in_([operations[i]["id"] for i in updates]))
+                .execution_options(populate_existing=True)
+            )
+        }
+        for index in updates:
+            results[index]["note"] = updated[operations[index]["id"]]
+    if deletes:
+        db.execute(
+            delete(Note).where(
+                Note.id.in_([operations[i]["id"] for i in deletes])
+            ),
+            execution_options={"synchronize_session": False},
+        )
+    # Snapshot rows before commit expires them, to avoid a reload per note
+    for result in results:
+        if result["note"] is not None:
+            note = result["note"]
+            result["note"] = {
+                column.key: getattr(note, column.key)
+                for column in Note.__table__.columns
+            }
+    db.commit()
+    return results
+
+
+# --------------- Async variants (AsyncSession) ---------------
+async def get_user_by_username_async(db: AsyncSession, username: str):
+    return await db.scalar(select(User).where(User.username == username))
+
+
+async def get_note_by_id_async(db: AsyncSession, note_id: int):
+    return await db.get(Note, note_id, options=[undefer(Note.content)])
+
+
+async def note_access_status_async(db: AsyncSession, note_id: int,
+                                   user_id: int = None) -> int:
+    owner = await db.scalar(select(Note.user_id).where(Note.id == note_id))
+    if owner is None:
+        return 404
+    return 412 if owner == user_id else 403
+
+
+async def get_note_version_async(db: AsyncSession, note_id: int):
+    return (await db.execute(
+        select(Note.user_id, Note.updated_at).where(Note.id == note_id)
+    )).first()
+
+
+async def get_user_notes_version_async(
+    db: AsyncSession, user_id: int
+) -> int:
+    return await db.scalar(
+        select(NoteListVersion.version)
+        .where(NoteListVersion.user_id == user_id)
+    ) or 0
+
+
+async def create_note_async(
+        db: AsyncSession,
+        title: str,
+        content: str,
+        user_id: int
+):
+    db_note = (await db.scalars(insert(Note).returning(Note), [{
+        "title": title,
+        "content": content,
+        "user_id": user_id,
+    }])).one()
+    _set_written_content(db_note, content)
+    await db.commit()
+    return db_note
+
+
+async def update_note_async(
+        db: AsyncSession,
+        note_id: int,
+        user_id: int,
+        title: str = None,
+        content: str = None,
+        versions: list = None
+):
+    """Async counterpart of ``update_note``.
+
+    Returns:
+        Tuple: (note, 200) or (None, 404/403/412)
+    """
+    values = {
+        name: value
+        for name, value in (("title", title), ("content", content))
+        if value is not None
+    }
+    if values:
+        row = (await db.execute(
+            update(Note).where(_owned_note(note_id, user_id, versions))
+            .values(**values).returning(*_note_returning(values))
+        )).first()
+        note = await db.merge(_returned_note(row), load=False) \
+            if row else None
+        if note is not None and content is not None:
+            _set_written_content(note, content)
+    else:
+        note = (await db.scalars(
+            select(Note).options(undefer(Note.content))
+            .where(_owned_note(note_id, user_id, versions))
+        )).one_or_none()
+    if note is None:
+        return None, await note_access_status_async(db, note_id, user_id)
+    await db.commit()
+    return note, 200
+
+
+async def delete_note_async(db: AsyncSession, note_id: int, user_id: int,
+                            versions: list = None):
+    """Async counterpart of ``delete_note``.
+
+    Returns:
+        int: 200 if deleted, otherwise 404/403/412
+    """
+    deleted = (await db.execute(
+        delete(Note).where(_owned_note(note_id, user_id, versions))
+        .returning(Note.id)
+    )).first()
+    if deleted is None:
+        return await note_access_status_async(db, note_id, user_id)
+    await db.commit()
+    return 200
+
+
+async def get_user_note_rows_async(
+        db: AsyncSession,
+        user_id: int,
+        skip: int = 0,
+        limit: int = 100,
+        order: str = None,
+        columns: tuple = NOTE_COLUMNS
+) -> list:
+    result = await db.execute(_user_notes_statement(
+        user_id, skip, limit, order, columns=columns
+    ))
+    return [row._asdict() for row in result]
+
+
+async def get_user_note_rows_keyset_async(
+        db: AsyncSession,
+        user_id: int,
+        limit: int = 100,
+        after: tuple = None,
+        order: str = "desc",
+        columns: tuple = NOTE_COLUMNS
+):
+    if limit < 1:
+        return [], None
+    result = await db.execute(_user_notes_keyset_statement(
+        user_id, limit, after, order, columns=columns
+    ))
+    return _keyset_rows_page(result.all(), limit)
@@ -1,5 +1,7 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, declarative_base, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 import os
 from pathlib import Path
 
@@ -7,15 +9,153 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 DATA_DIR = BASE_DIR / "data"
 os.makedirs(DATA_DIR, exist_ok=True)
 
-DATABASE_URL = f"sqlite:///{DATA_DIR}/note_app.db"
+DB_PATH = os.getenv("DB_PATH", str(DATA_DIR / "note_app.db"))
+DATABASE_URL = f"sqlite:///{DB_PATH}"
+ASYNC_DATABASE_URL = f"sqlite+aiosqlite:///{DB_PATH}"
 
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False},
-    echo=True,
+# Serve note CRUD routes from the async stack instead of the threadpool
+DB_ASYNC = os.getenv("DB_ASYNC", "0") == "1"
+
+# "production" enables WAL, a read pool and a single writer connection;
+# "development" keeps one engine with SQLite's defaults
+DB_PROFILE = os.getenv("DB_PROFILE", "development")
+DB_PRODUCTION = DB_PROFILE == "production"
+DB_ECHO = os.getenv("DB_ECHO", "0" if DB_PRODUCTION else "1") == "1"
+
+# Pragmas; an empty value leaves SQLite's default in place
+DB_JOURNAL_MODE = os.getenv("DB_JOURNAL_MODE",
+                            "WAL" if DB_PRODUCTION else "")
+DB_SYNCHRONOUS = os.getenv("DB_SYNCHRONOUS",
+                           "NORMAL" if DB_PRODUCTION else "")
+DB_CACHE_SIZE_KB = os.getenv("DB_CACHE_SIZE_KB",
+                             "65536" if DB_PRODUCTION else "")
+DB_MMAP_SIZE = os.getenv("DB_MMAP_SIZE",
+                         str(256 * 2**20) if DB_PRODUCTION else "")
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+
+# Pool sizes (production profile only). Readers plus overflow should
+# cover the threadpool so sync routes never wait on each other.
+DB_READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", "8"))
+DB_READ_POOL_OVERFLOW = int(os.getenv("DB_READ_POOL_OVERFLOW", "32"))
+DB_WRITE_TIMEOUT = float(os.getenv("DB_WRITE_TIMEOUT", "30"))
+
+
+def sqlite_pragmas(read_only: bool = False) -> list:
+    """Build the PRAGMA statements run on every new connection.
+
+    Args:
+        read_only: Whether the connection only serves reads
+
+    Returns:
+        list: PRAGMA statements for the configured profile
+    """
+    pragmas = [f"PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}"]
+    # The journal mode is stored in the database file, so only the
+    # writer has to (and is allowed to) switch it
+    if DB_JOURNAL_MODE and not read_only:
+        pragmas.append(f"PRAGMA journal_mode = {DB_JOURNAL_MODE}")
+    if DB_SYNCHRONOUS:
+        pragmas.append(f"PRAGMA synchronous = {DB_SYNCHRONOUS}")
+    if DB_CACHE_SIZE_KB:
+        # Negative values are KiB rather than pages
+        pragmas.append(f"PRAGMA cache_size = -{int(DB_CACHE_SIZE_KB)}")
+    if DB_MMAP_SIZE:
+        pragmas.append(f"PRAGMA mmap_size = {int(DB_MMAP_SIZE)}")
+    if read_only:
+        pragmas.append("PRAGMA query_only = 1")
+    return pragmas
+
+
+def apply_pragmas(engine, read_only: bool = False):
+    """Run the profile's pragmas whenever the engine opens a connection."""
+    pragmas = sqlite_pragmas(read_only)
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+    return engine
+
+
+if DB_PRODUCTION:
+    # One writer connection: concurrent writers queue on the pool for up
+    # to DB_WRITE_TIMEOUT seconds instead of failing with "database is
+    # locked" inside SQLite
+    engine = apply_pragmas(create_engine(
+        DATABASE_URL,
+        connect_args={"check_same_thread": False},
+        echo=DB_ECHO,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=DB_WRITE_TIMEOUT,
+    ))
+    read_engine = apply_pragmas(create_engine(
+        DATABASE_URL,
+        connect_args={"check_same_thread": False},
+        echo=DB_ECHO,
+        pool_size=DB_READ_POOL_SIZE,
+        max_overflow=DB_READ_POOL_OVERFLOW,
+    ), read_only=True)
+else:
+    engine = apply_pragmas(create_engine(
+        DATABASE_URL,
+        connect_args={"check_same_thread": False},
+        echo=DB_ECHO,
+    ))
+    read_engine = engine
+
+
+class RoutingSession(Session):
+    """Session bound to the writer or to the read pool for its lifetime.
+
+    The choice is made when the session is opened, through
+    ``info["writing"]``: ``get_db`` sets it, ``get_read_db`` clears it,
+    and sessions opened without it (background jobs, scripts) write.
+    Routing on the statement instead would send a ``text()`` write, or
+    the reads before a write, to a read-only connection.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        return engine if self.info.get("writing", True) else read_engine
+
+
+SessionLocal = sessionmaker(
+    autocommit=False,
+    autoflush=False,
+    bind=engine,
+    class_=RoutingSession if DB_PRODUCTION else Session,
 )
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# aiosqlite defaults to NullPool, which would start a connection thread
+# per session; keep connections pooled instead
+if DB_PRODUCTION:
+    # A single connection as well, so the async stack adds at most one
+    # writer next to the sync one; busy_timeout covers contention
+    # between the two
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        poolclass=AsyncAdaptedQueuePool,
+        echo=DB_ECHO,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=DB_WRITE_TIMEOUT,
+    )
+else:
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        poolclass=AsyncAdaptedQueuePool,
+        echo=DB_ECHO,
+    )
+apply_pragmas(async_engine.sync_engine)
+
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False
+)
 
 Base = declarative_base()
 
@@ -30,8 +170,35 @@ def get_db():
         >>> db = next(get_db())
         >>> db.query(User).all()
     """
-    db = SessionLocal()
+    db = SessionLocal(info={"writing": True})
     try:
         yield db
     finally:
         db.close()
+
+
+def get_read_db():
+    """Dependency that provides a session on the read-only pool.
+
+    Used by GET routes and by routes that only read before slow work, so
+    they do not hold the writer; in the development profile it shares
+    the single engine with ``get_db``.
+
+    Yields:
+        Session: SQLAlchemy session that cannot write
+    """
+    db = SessionLocal(info={"writing": False})
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_db():
+    """Dependency that provides an async database session.
+
+    Yields:
+        AsyncSession: SQLAlchemy session running on the event loop
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,408 @@
+"""Full-text search over notes backed by an SQLite FTS5 index.
+
+``notes_fts`` is an external-content index over ``notes``: it stores
+postings only and reads titles back from ``notes`` for highlighting, so
+the text is not kept twice. Notes are indexed with their ``user_id`` so
+searches are scoped by intersecting posting lists rather than filtering
+afterwards.
+
+Plain SQL triggers keep the index in sync on every write path (ORM,
+bulk statements, raw SQL, the sqlite3 shell). SQL cannot read a
+compressed body (see ``app.database.compression``), so for those the
+triggers only queue work: bodies to index in ``notes_fts_pending``, and
+the indexed values of rewritten or deleted rows in ``notes_fts_stale``,
+which FTS5 needs to remove their postings. The application works the
+queues off right after the statement that filled them (``sync_index``);
+rows queued by other clients are indexed by ``ensure_fts`` on the next
+start. Content snippets are cut in Python from the inflated bodies of
+the matching notes.
+
+Rebuild the index of an existing database with::
+
+    python -m app.database.fts rebuild
+"""
+
+import re
+import sys
+import unicodedata
+from sqlalchemy import TIMESTAMP, event, text
+from sqlalchemy.orm import Session
+from app.database.compression import decompress_content
+from app.database.database import async_engine, engine
+from app.database.models import Note
+
+FTS_TABLE = "notes_fts"
+FTS_PENDING = "notes_fts_pending"
+FTS_STALE = "notes_fts_stale"
+HIGHLIGHT_START = "<mark>"
+HIGHLIGHT_END = "</mark>"
+SNIPPET_ELLIPSIS = "…"
+
+# Whether a row's postings are those of its current values
+_INDEXED = (f"NOT EXISTS (SELECT 1 FROM {FTS_PENDING} WHERE id = {{0}}) "
+            f"AND NOT EXISTS (SELECT 1 FROM {FTS_STALE} WHERE id = {{0}})")
+
+# Removes the postings of ``old`` or queues its values for the
+# application, then indexes ``new`` or queues it
+_UNINDEX_OLD = f"""
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, content, user_id)
+        SELECT 'delete', old.id, old.title, old.content, old.user_id
+        WHERE typeof(old.content) != 'blob' AND {_INDEXED.format("old.id")};
+        INSERT OR IGNORE INTO {FTS_STALE}(id, title, content, user_id)
+        SELECT old.id, old.title, old.content, old.user_id
+        WHERE typeof(old.content) = 'blob' AND {_INDEXED.format("old.id")};
+        DELETE FROM {FTS_PENDING} WHERE id = old.id;
+"""
+_INDEX_NEW = f"""
+        INSERT INTO {FTS_TABLE}(rowid, title, content, user_id)
+        SELECT new.id, new.title, new.content, new.user_id
+        WHERE typeof(new.content) != 'blob' AND {_INDEXED.format("new.id")};
+        INSERT OR IGNORE INTO {FTS_PENDING}(id)
+        SELECT new.id WHERE typeof(new.content) = 'blob'
+            OR EXISTS (SELECT 1 FROM {FTS_STALE} WHERE id = new.id);
+"""
+
+FTS_DDL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, content, user_id,
+        content='notes', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"CREATE TABLE IF NOT EXISTS {FTS_PENDING} (id INTEGER PRIMARY KEY)",
+    f"""
+    CREATE TABLE IF NOT EXISTS {FTS_STALE} (
+        id INTEGER PRIMARY KEY, title TEXT, content BLOB, user_id INTEGER
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS notes_fts_ai AFTER INSERT ON notes BEGIN
+        {_INDEX_NEW}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS notes_fts_ad AFTER DELETE ON notes BEGIN
+        {_UNINDEX_OLD}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS notes_fts_au
+    AFTER UPDATE OF title, content, user_id ON notes
+    WHEN old.title IS NOT new.title OR old.user_id IS NOT new.user_id
+        OR old.content IS NOT new.content
+    BEGIN
+        {_UNINDEX_OLD}
+        {_INDEX_NEW}
+    END
+    """,
+]
+
+FTS_DROP = [
+    "DROP TRIGGER IF EXISTS notes_fts_ai",
+    "DROP TRIGGER IF EXISTS notes_fts_ad",
+    "DROP TRIGGER IF EXISTS notes_fts_au",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+    f"DROP TABLE IF EXISTS {FTS_PENDING}",
+    f"DROP TABLE IF EXISTS {FTS_STALE}",
+    # Content view of an older schema
+    "DROP VIEW IF EXISTS notes_fts_source",
+]
+
+SEARCH_SQL = text(f"""
+    SELECT n.id, n.title, n.created_at, n.updated_at, n.content,
+           highlight({FTS_TABLE}, 0, :hl_start, :hl_end) AS title_highlight,
+           bm25({FTS_TABLE}, 10.0, 1.0, 0.0) AS rank
+    FROM {FTS_TABLE}
+    JOIN notes AS n ON n.id = {FTS_TABLE}.rowid
+    WHERE {FTS_TABLE} MATCH :match AND n.user_id = :user_id
+    ORDER BY rank
+    LIMIT :limit OFFSET :offset
+""").columns(created_at=TIMESTAMP, updated_at=TIMESTAMP)
+
+# Words, optionally followed by "*" for a prefix match
+_TOKEN = re.compile(r"(\w+)(\*?)", re.UNICODE)
+_WORD = re.compile(r"\w+", re.UNICODE)
+_WRITES = ("INSERT", "UPDATE", "DELETE", "REPLAC")
+
+
+def create_fts(connection):
+    """Create the FTS table, its queues and triggers if they do not exist."""
+    for statement in FTS_DDL:
+        connection.exec_driver_sql(statement)
+
+
+def drop_fts(connection):
+    connection.info.pop("fts_queues", None)
+    for statement in FTS_DROP:
+        connection.exec_driver_sql(statement)
+
+
+def index_pending(cursor) -> int:
+    """Work off the queues the triggers fill for compressed bodies.
+
+    Postings of stale values are removed first, then the queued notes
+    are indexed with their inflated bodies.
+
+    Args:
+        cursor: DB-API cursor on a connection that can write
+
+    Returns:
+        int: Notes indexed
+    """
+    # The aiosqlite adapter's execute() returns None, so results are
+    # always fetched from the cursor
+    cursor.execute(f"SELECT id, title, content, user_id FROM {FTS_STALE}")
+    stale = cursor.fetchall()
+    if stale:
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, content, "
+            "user_id) VALUES ('delete', ?, ?, ?, ?)",
+            [(note_id, title, decompress_content(content), user_id)
+             for note_id, title, content, user_id in stale],
+        )
+        cursor.executemany(f"DELETE FROM {FTS_STALE} WHERE id = ?",
+                           [(row[0],) for row in stale])
+    cursor.execute(
+        f"SELECT n.id, n.title, n.content, n.user_id FROM {FTS_PENDING} "
+        "AS p JOIN notes AS n ON n.id = p.id"
+    )
+    rows = cursor.fetchall()
+    if rows:
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE}(rowid, title, content, user_id) "
+            "VALUES (?, ?, ?, ?)",
+            [(note_id, title, decompress_content(content), user_id)
+             for note_id, title, content, user_id in rows],
+        )
+    if rows or stale:
+        cursor.execute(f"DELETE FROM {FTS_PENDING}")
+    return len(rows)
+
+
+def _index_connection(connection):
+    cursor = connection.connection.cursor()
+    try:
+        index_pending(cursor)
+    finally:
+        cursor.close()
+
+
+def rebuild_fts(connection):
+    """Re-index every note from the ``notes`` table."""
+    create_fts(connection)
+    connection.exec_driver_sql(
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('delete-all')"
+    )
+    connection.exec_driver_sql(f"DELETE FROM {FTS_STALE}")
+    connection.exec_driver_sql(f"DELETE FROM {FTS_PENDING}")
+    connection.exec_driver_sql(
+        f"INSERT INTO {FTS_TABLE}(rowid, title, content, user_id) "
+        "SELECT id, title, content, user_id FROM notes "
+        "WHERE typeof(content) != 'blob'"
+    )
+    connection.exec_driver_sql(
+        f"INSERT INTO {FTS_PENDING}(id) "
+        "SELECT id FROM notes WHERE typeof(content) = 'blob'"
+    )
+    _index_connection(connection)
+
+
+def optimize_fts(connection):
+    """Merge the index into one segment, dropping deleted postings.
+
+    Worth running after rewriting many notes, e.g. by ``recompress``:
+    FTS5 records removals as delete markers until segments are merged.
+    """
+    connection.exec_driver_sql(
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')"
+    )
+
+
+def _fts_is_current(connection) -> bool:
+    # Indexes of older schemas kept their own copy of the text, or read
+    # it from notes or a view without the queues
+    sql = connection.exec_driver_sql(
+        "SELECT sql FROM sqlite_master WHERE name = ?", (FTS_TABLE,)
+    ).scalar()
+    stale = connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE name = ?", (FTS_STALE,)
+    ).scalar()
+    return sql is not None and "content='notes'" in sql and bool(stale)
+
+
+def ensure_fts(bind=engine):
+    """Create the index on an existing database and fill it once.
+
+    An index from an older schema is dropped and rebuilt, and compressed
+    bodies written by other clients are indexed.
+    """
+    with bind.begin() as connection:
+        if _fts_is_current(connection):
+            create_fts(connection)
+            _index_connection(connection)
+        else:
+            drop_fts(connection)
+            rebuild_fts(connection)
+
+
+def _has_queues(conn) -> bool:
+    # Databases of an older schema have none until ensure_fts upgrades
+    # them; only a positive answer is remembered for the connection
+    if conn.info.get("fts_queues"):
+        return True
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = ?", (FTS_STALE,)
+        )
+        found = cursor.fetchone() is not None
+    finally:
+        cursor.close()
+    if found:
+        conn.info["fts_queues"] = True
+    return found
+
+
+def _sync_after_execute(conn, cursor, statement, parameters, context,
+                        executemany):
+    # Any write to notes may have queued work; reads, DDL and statements
+    # on other tables cannot
+    if ("notes" in statement
+            and statement.lstrip()[:6].upper() in _WRITES
+            and _has_queues(conn)):
+        _index_connection(conn)
+
+
+def sync_index(bind):
+    """Work off the index queues right after statements that write notes.
+
+    The application's engines are covered; call this for any other
+    engine that writes notes through SQLAlchemy.
+    """
+    event.listen(bind, "after_cursor_execute", _sync_after_execute)
+    return bind
+
+
+sync_index(engine)
+sync_index(async_engine.sync_engine)
+
+
+@event.listens_for(Note.__table__, "after_create")
+def _create_fts_with_notes(target, connection, **kw):
+    create_fts(connection)
+
+
+@event.listens_for(Note.__table__, "before_drop")
+def _drop_fts_with_notes(target, connection, **kw):
+    drop_fts(connection)
+
+
+def build_match_query(query: str, user_id: int) -> str:
+    """Turn free text into a safe FTS5 MATCH expression.
+
+    Every word becomes a quoted term (so FTS5 operators in user input are
+    treated as text), a trailing ``*`` keeps its prefix meaning, and the
+    expression is restricted to the user's notes.
+
+    Returns:
+        str: MATCH expression, or an empty string if there are no words
+    """
+    terms = [f'"{word}"{star}' for word, star in _TOKEN.findall(query)]
+    if not terms:
+        return ""
+    return f'user_id : "{int(user_id)}" AND {{title content}} : ' \
+        f'({" ".join(terms)})'
+
+
+def _fold(word: str) -> str:
+    # Matches the tokenizer: case-insensitive, diacritics removed
+    decomposed = unicodedata.normalize("NFKD", word)
+    return "".join(char for char in decomposed
+                   if not unicodedata.combining(char)).casefold()
+
+
+def make_snippet(content: str, query: str, tokens: int = 16) -> str:
+    """Cut a window of about ``tokens`` words around the first match.
+
+    Matching words are wrapped in ``HIGHLIGHT_START``/``HIGHLIGHT_END``
+    and cut ends are marked with an ellipsis, like FTS5's ``snippet()``,
+    which cannot read compressed bodies.
+    """
+    terms = [(_fold(word), bool(star))
+             for word, star in _TOKEN.findall(query)]
+    words = list(_WORD.finditer(content or ""))
+
+    def matches(word) -> bool:
+        folded = _fold(word.group())
+        return any(folded.startswith(term) if prefix else folded == term
+                   for term, prefix in terms)
+
+    first = next((i for i, word in enumerate(words) if matches(word)), 0)
+    start = max(0, min(first - tokens // 4, len(words) - tokens))
+    end = min(len(words), start + tokens)
+    parts = [SNIPPET_ELLIPSIS] if start else []
+    position = words[start].start() if words else 0
+    for word in words[start:end]:
+        parts.append(content[position:word.start()])
+        if matches(word):
+            parts.append(HIGHLIGHT_START + word.group() + HIGHLIGHT_END)
+        else:
+            parts.append(word.group())
+        position = word.end()
+    if end < len(words):
+        parts.append(SNIPPET_ELLIPSIS)
+    return "".join(parts)
+
+
+def search_notes(
+        db: Session,
+        user_id: int,
+        query: str,
+        limit: int = 20,
+        offset: int = 0,
+        snippet_tokens: int = 16
+):
+    """Search a user's notes ranked by BM25 (title weighted over content).
+
+    Args:
+        db: Database session
+        user_id: Owner of the notes
+        query: Free-text search query
+        limit: Maximum number of results
+        offset: Number of results to skip
+        snippet_tokens: Approximate length of content snippets
+
+    Returns:
+        List: Rows with id, title, timestamps, highlighted title,
+        content snippet and rank (lower is better)
+    """
+    match = build_match_query(query, user_id)
+    if not match:
+        return []
+    rows = db.execute(SEARCH_SQL, {
+        "match": match,
+        "user_id": user_id,
+        "limit": limit,
+        "offset": offset,
+        "hl_start": HIGHLIGHT_START,
+        "hl_end": HIGHLIGHT_END,
+    }).mappings().all()
+    results = []
+    for row in rows:
+        result = dict(row)
+        content = decompress_content(result.pop("content"))
+        result["snippet"] = make_snippet(content, query, snippet_tokens)
+        results.append(result)
+    return results
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["rebuild"]:
+        print("Usage: python -m app.database.fts rebuild")
+        sys.exit(2)
+    with engine.begin() as conn:
+        # Replaces tables and triggers from older schemas too
+        drop_fts(conn)
+        rebuild_fts(conn)
+    print("Full-text index rebuilt")
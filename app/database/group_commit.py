@@ -0,0 +1,247 @@
+"""Group commit: many concurrent writes, one transaction, one fsync.
+
+Writers hand a staging function (one that flushes but does not commit,
+such as ``crud.add_note``) to a single committer thread. The thread
+collects requests that arrive within a short window, up to a batch size,
+runs each in its own SAVEPOINT and commits them together. A failing
+write only rolls back its savepoint; every caller gets its own result or
+exception back through a future.
+
+Enable with ``GROUP_COMMIT=1``.
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from concurrent.futures import Future
+from sqlalchemy import inspect, select, tuple_
+from app.database.database import SessionLocal
+
+GROUP_COMMIT = os.getenv("GROUP_COMMIT", "0") == "1"
+GROUP_COMMIT_WINDOW_MS = float(os.getenv("GROUP_COMMIT_WINDOW_MS", "2"))
+GROUP_COMMIT_MAX_BATCH = int(os.getenv("GROUP_COMMIT_MAX_BATCH", "64"))
+
+# Upper bounds of the batch size histogram buckets
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+def _bucket(size: int):
+    for bound in BATCH_SIZE_BUCKETS:
+        if size <= bound:
+            return bound
+    return "+Inf"
+
+
+class GroupCommitter:
+    """Background thread committing concurrent writes in batches.
+
+    Args:
+        enabled: Whether routes should send writes through the committer
+        window: Seconds to keep collecting after the first write arrives
+        max_batch: Maximum number of writes per transaction
+        session_factory: Factory for database sessions
+    """
+
+    def __init__(
+        self,
+        enabled: bool = GROUP_COMMIT,
+        window: float = GROUP_COMMIT_WINDOW_MS / 1000,
+        max_batch: int = GROUP_COMMIT_MAX_BATCH,
+        session_factory=SessionLocal,
+    ):
+        self.enabled = enabled
+        self.window = window
+        self.max_batch = max_batch
+        self.session_factory = session_factory
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self._batches = 0
+        self._writes = 0
+        self._failed_batches = 0
+        self._max_batch_size = 0
+        self._histogram = Counter()
+        self._commit_seconds = 0.0
+        self._recent_commits = deque(maxlen=1024)
+
+    def start(self):
+        """Start the committer thread (idempotent)."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._loop, name="group-commit", daemon=True
+                )
+                self._thread.start()
+
+    def stop(self, timeout: float = 5):
+        """Commit what is already queued, then stop the thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+    def submit(self, func, *args, **kwargs) -> Future:
+        """Queue ``func(db, *args, **kwargs)`` for the next batch.
+
+        Returns:
+            Future: Resolves to the function's result after the commit
+        """
+        if self._thread is None:
+            self.start()
+        future = Future()
+        self._queue.put((future, func, args, kwargs))
+        return future
+
+    def run(self, func, *args, **kwargs):
+        """Submit a write and block until its batch is committed."""
+        return self.submit(func, *args, **kwargs).result()
+
+    def _collect(self, first) -> list:
+        batch = [first]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = (self._queue.get(timeout=remaining)
+                        if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+            if item is _STOP:
+                # Finish this batch first; stop on the next iteration
+                self._queue.put(_STOP)
+                break
+            batch.append(item)
+        return batch
+
+    def _loop(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            batch = self._collect(first)
+            try:
+                self._commit(batch)
+            except Exception:
+                logger.exception("Group commit of %d writes failed",
+                                 len(batch))
+
+    def _commit(self, batch: list):
+        db = self.session_factory()
+        # Rows returned by the staging functions stay loaded after commit
+        db.expire_on_commit = False
+        try:
+            staged = []
+            for future, func, args, kwargs in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                savepoint = db.begin_nested()
+                try:
+                    result = func(db, *args, **kwargs)
+                    savepoint.commit()
+                except Exception as exc:
+                    savepoint.rollback()
+                    future.set_exception(exc)
+                else:
+                    staged.append((future, result))
+
+            started = time.perf_counter()
+            try:
+                db.commit()
+            except Exception as exc:
+                db.rollback()
+                self._record(len(batch), time.perf_counter() - started,
+                             failed=True)
+                for future, _ in staged:
+                    future.set_exception(exc)
+                raise
+            self._record(len(batch), time.perf_counter() - started)
+
+            # Load anything RETURNING did not cover before handing rows
+            # to callers
+            try:
+                _reload(db, [result for _, result in staged])
+                db.expunge_all()
+            except Exception as exc:
+                for future, _ in staged:
+                    future.set_exception(exc)
+                raise
+            for future, result in staged:
+                future.set_result(result)
+        finally:
+            db.close()
+
+    def _record(self, size: int, seconds: float, failed: bool = False):
+        with self._lock:
+            self._batches += 1
+            self._writes += size
+            self._failed_batches += failed
+            self._max_batch_size = max(self._max_batch_size, size)
+            self._histogram[_bucket(size)] += 1
+            self._commit_seconds += seconds
+            self._recent_commits.append(seconds)
+
+    def stats(self) -> dict:
+        """Batch size and commit latency counters."""
+        with self._lock:
+            recent = sorted(self._recent_commits)
+            batches = self._batches
+            return {
+                "enabled": self.enabled,
+                "batches": batches,
+                "writes": self._writes,
+                "failed_batches": self._failed_batches,
+                "queued": self._queue.qsize(),
+                "mean_batch_size": self._writes / batches if batches else 0,
+                "max_batch_size": self._max_batch_size,
+                "batch_size_histogram": {
+                    str(bound): self._histogram[bound]
+                    for bound in (*BATCH_SIZE_BUCKETS, "+Inf")
+                },
+                "commit_seconds_total": self._commit_seconds,
+                "commit_ms_p50": _percentile(recent, 0.5) * 1000,
+                "commit_ms_p99": _percentile(recent, 0.99) * 1000,
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self._reset_stats()
+
+
+def _reload(db, results: list):
+    """Refresh partially loaded ORM rows with one SELECT per class."""
+    by_class = defaultdict(list)
+    for obj in results:
+        state = inspect(obj, raiseerr=False)
+        if state is not None and state.persistent and state.unloaded:
+            by_class[type(obj)].append(state.identity)
+    for cls, identities in by_class.items():
+        primary_key = inspect(cls).primary_key
+        if len(primary_key) == 1:
+            ids = [identity[0] for identity in identities]
+            condition = primary_key[0].in_(ids)
+        else:
+            condition = tuple_(*primary_key).in_(identities)
+        db.execute(
+            select(cls).where(condition)
+            .execution_options(populate_existing=True)
+        ).all()
+
+
+def _percentile(samples: list, fraction: float) -> float:
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+group_committer = GroupCommitter()
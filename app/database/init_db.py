@@ -1,5 +1,6 @@
 import os
-from app.database.database import Base, engine, DATA_DIR
+from pathlib import Path
+from app.database.database import Base, engine, DB_PATH
 
 
 def init_db():
@@ -8,8 +9,8 @@ def init_db():
     Returns:
         Tuple: (success status, database file path)
     """
-    os.makedirs(DATA_DIR, exist_ok=True)
-    db_file = DATA_DIR / "note_app.db"
+    db_file = Path(DB_PATH)
+    os.makedirs(db_file.parent, exist_ok=True)
     db_exists = db_file.exists()
 
     if not db_exists:
@@ -18,10 +19,22 @@ def init_db():
         print(f"Database created at {db_file}")
     else:
         print(f"Database already exists at {db_file}")
+        create_missing_indexes()
 
     return db_file
 
 
+def create_missing_indexes(bind=engine):
+    """Create indexes added to the models after the tables were created.
+
+    ``create_all`` only builds indexes together with new tables, so
+    existing databases need this to pick up new ones.
+    """
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
+
+
 def check_db_connection():
     """Perform a basic connectivity check.
 
@@ -1,8 +1,26 @@
-from sqlalchemy import Column, Integer, String, Text, TIMESTAMP, ForeignKey
+from sqlalchemy import (
+    Column,
+    DDL,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Text,
+    TIMESTAMP,
+    event,
+)
+from datetime import datetime, timezone
+from sqlalchemy.orm import deferred
 from sqlalchemy.sql import func
+from app.database.compression import CompressedText
 from app.database.database import Base
 
 
+def utcnow() -> datetime:
+    """Naive UTC timestamp with microseconds, matching CURRENT_TIMESTAMP."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
 class User(Base):
     __tablename__ = "users"
 
@@ -19,19 +37,76 @@ class User(Base):
 
 class Note(Base):
     __tablename__ = "notes"
+    __table_args__ = (
+        # Serves per-user listings and keyset pagination
+        Index("ix_notes_user_updated_id", "user_id", "updated_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"))
     title = Column(String, nullable=False)
-    content = Column(Text, nullable=False)
-    created_at = Column(TIMESTAMP, server_default=func.now())
+    # Large bodies are stored zlib-compressed; see app.database.compression.
+    # Deferred, so loading a note only inflates its body when it is read
+    # or the query undefers it
+    content = deferred(Column(CompressedText, nullable=False))
+    # Set in Python for microsecond resolution: updated_at versions the
+    # note for ETags, and CURRENT_TIMESTAMP only has whole seconds
+    created_at = Column(TIMESTAMP, default=utcnow, server_default=func.now())
     updated_at = Column(
         TIMESTAMP,
+        default=utcnow,
         server_default=func.now(),
-        onupdate=func.now(),
+        onupdate=utcnow,
     )
 
 
+class NoteListVersion(Base):
+    """Per-user counter bumped by triggers on every change to ``notes``.
+
+    Versions note listings for ETags with one primary key lookup. No
+    foreign key: the triggers also fire while a user's notes are removed
+    by the cascade from ``users``.
+    """
+    __tablename__ = "note_list_versions"
+
+    user_id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+def _bump_version(user_id: str, when: str = "true") -> str:
+    # SELECT ... WHERE rather than VALUES so the bump can be conditional;
+    # SQLite needs the WHERE anyway to parse ON CONFLICT after a SELECT
+    return (
+        "INSERT INTO note_list_versions (user_id, version) "
+        f"SELECT {user_id}, 1 WHERE {when} ON CONFLICT (user_id) "
+        "DO UPDATE SET version = version + 1;"
+    )
+
+
+# Updates only count when a listed column other than the body changes:
+# every body change through the app also moves updated_at, and leaving
+# bodies out keeps listings valid across a recompress.
+NOTE_VERSION_TRIGGERS = (
+    f"""CREATE TRIGGER IF NOT EXISTS notes_version_ai AFTER INSERT ON notes
+BEGIN {_bump_version("new.user_id")} END""",
+    f"""CREATE TRIGGER IF NOT EXISTS notes_version_ad AFTER DELETE ON notes
+BEGIN {_bump_version("old.user_id")} END""",
+    f"""CREATE TRIGGER IF NOT EXISTS notes_version_au AFTER UPDATE ON notes
+WHEN old.id IS NOT new.id OR old.user_id IS NOT new.user_id
+    OR old.title IS NOT new.title OR old.created_at IS NOT new.created_at
+    OR old.updated_at IS NOT new.updated_at
+BEGIN
+    {_bump_version("old.user_id")}
+    {_bump_version("new.user_id", "new.user_id IS NOT old.user_id")}
+END""",
+)
+
+# On the metadata rather than a table, so the triggers are added to
+# existing databases by the next create_all and see both tables
+for _trigger in NOTE_VERSION_TRIGGERS:
+    event.listen(Base.metadata, "after_create", DDL(_trigger))
+
+
 class Token(Base):
     __tablename__ = "tokens"
 
@@ -40,3 +115,34 @@ class Token(Base):
     token = Column(String, nullable=False, unique=True)
     expires_at = Column(TIMESTAMP, nullable=False)
     created_at = Column(TIMESTAMP, server_default=func.now())
+
+
+class TranslationCacheEntry(Base):
+    __tablename__ = "translation_cache"
+
+    key = Column(String(64), primary_key=True)
+    source_lang = Column(String, nullable=False)
+    target_lang = Column(String, nullable=False)
+    translated_text = Column(Text, nullable=False)
+    created_at = Column(TIMESTAMP, server_default=func.now())
+
+
+class TranslationJob(Base):
+    __tablename__ = "translation_jobs"
+
+    id = Column(String(32), primary_key=True)
+    user_id = Column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), index=True
+    )
+    note_id = Column(Integer, ForeignKey("notes.id", ondelete="CASCADE"))
+    source_lang = Column(String, nullable=False)
+    target_lang = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="pending", index=True)
+    result = Column(Text)
+    error = Column(String)
+    created_at = Column(TIMESTAMP, server_default=func.now())
+    updated_at = Column(
+        TIMESTAMP,
+        server_default=func.now(),
+        onupdate=func.now(),
+    )
@@ -1,19 +1,57 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from app.routes import notes, auth
-from app.database.database import Base, engine
+from starlette.concurrency import run_in_threadpool
+from app.routes import notes, notes_async, auth, metrics, translation
+from app.database.database import DB_ASYNC, Base, async_engine, engine
+from app.database.init_db import create_missing_indexes
+from app.database.fts import ensure_fts
+from app.database.group_commit import group_committer
+from app.metrics import MetricsMiddleware
+from app.profiling import ProfilingMiddleware
+from app.services.translation_backends import translation_backend
+from app.services.translation_jobs import job_queue
 from dotenv import load_dotenv
 
 load_dotenv()  # Load environment variables from .env file
 
 # Create DB tables
 Base.metadata.create_all(bind=engine)
+create_missing_indexes(engine)
+ensure_fts(engine)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start background workers and release shared resources on exit."""
+    await job_queue.start()
+    if group_committer.enabled:
+        group_committer.start()
+    yield
+    await job_queue.stop()
+    # Flushes writes that are still queued
+    await run_in_threadpool(group_committer.stop)
+    await translation_backend.aclose()
+    await async_engine.dispose()
+
 
 # Create FastAPI app instance
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+# Added last, so it runs first and the profiler shares its request stats
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 # Include routers
+if DB_ASYNC:
+    # Registered first so its routes take precedence over the sync ones
+    app.include_router(
+        notes_async.router, prefix="/api/notes", tags=["notes"]
+    )
 app.include_router(notes.router, prefix="/api/notes", tags=["notes"])
 app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
+app.include_router(
+    translation.router, prefix="/api/translation", tags=["translation"]
+)
+app.include_router(metrics.router, tags=["metrics"])
 
 if __name__ == "__main__":
     import uvicorn
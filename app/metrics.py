@@ -0,0 +1,401 @@
+"""In-process metrics exposed in the Prometheus text format.
+
+``MetricsMiddleware`` records per-route request latency, status codes
+and requests in flight. SQLAlchemy cursor events count queries and the
+time spent in the database, both in total and per request: the
+middleware puts a ``RequestStats`` into a context variable, which is
+copied into the threadpool running sync routes and their dependencies.
+Services time their slow calls (translation, bcrypt) with
+``timed_call``, which also adds them to the request's stats.
+
+Everything is served by ``GET /metrics`` (``app.routes.metrics``).
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, List, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+
+# Seconds; spans a cached read up to a slow upstream translation
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                   0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Route label of requests that matched no route, so unknown paths do
+# not create new series
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value) -> str:
+    return (str(value).replace("\\", "\\\\").replace("\n", "\\n")
+            .replace('"', '\\"'))
+
+
+def _format_labels(labels: Iterable[Tuple[str, str]]) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in labels]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    """A named family of series, one per combination of label values."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str,
+                 labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: tuple, extra=()) -> str:
+        return _format_labels([*zip(self.labelnames, key), *extra])
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{self._labels(key)} {_format_value(value)}"
+                for key, value in items]
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str,
+                 labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                # Per-bucket counts, then sum and count
+                series = self._values[key] = [0] * len(self.buckets) + [0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the ``with`` block in seconds."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            series = self._values.get(self._key(labels))
+            return series[-1] if series else 0
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, list(series))
+                           for key, series in self._values.items())
+        lines = []
+        for key, series in items:
+            cumulative = 0
+            bounds = [*zip(self.buckets, series), (float("inf"), None)]
+            for bound, count in bounds:
+                # Observations above the last bound only reach +Inf
+                if count is None:
+                    cumulative = series[-1]
+                else:
+                    cumulative += count
+                le = (("le", _format_value(bound)),)
+                lines.append(f"{self.name}_bucket{self._labels(key, le)} "
+                             f"{cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(key)} "
+                         f"{_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{self._labels(key)} "
+                         f"{series[-1]}")
+        return lines
+
+
+# A collector returns (name, kind, help, [(labels dict, value), ...])
+# families computed at scrape time, e.g. from a component's stats()
+Collector = Callable[[], Iterable[Tuple[str, str, str, list]]]
+
+
+class Registry:
+    """Metrics and scrape-time collectors rendered together."""
+
+    def __init__(self):
+        self._metrics: List[Metric] = []
+        self._collectors: List[Collector] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(),
+                  buckets=LATENCY_BUCKETS) -> Histogram:
+        return self.register(
+            Histogram(name, documentation, labelnames, buckets)
+        )
+
+    def register_collector(self, collector: Collector) -> Collector:
+        self._collectors.append(collector)
+        return collector
+
+    def reset(self):
+        for metric in self._metrics:
+            metric.reset()
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format 0.0.4."""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        for collector in self._collectors:
+            for name, kind, documentation, series in collector():
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in series:
+                    lines.append(f"{name}{_format_labels(labels.items())} "
+                                 f"{_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.counter(
+    "http_requests_total", "HTTP requests by route and status code",
+    ("method", "route", "status"),
+)
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route",
+    ("method", "route"),
+)
+http_requests_in_flight = registry.gauge(
+    "http_requests_in_flight", "HTTP requests currently being served",
+)
+db_queries = registry.counter(
+    "db_queries_total", "SQL statements executed",
+)
+db_query_seconds = registry.counter(
+    "db_query_seconds_total", "Time spent executing SQL statements",
+)
+request_db_queries = registry.histogram(
+    "http_request_db_queries", "SQL statements per HTTP request",
+    ("method", "route"), buckets=QUERY_COUNT_BUCKETS,
+)
+request_db_seconds = registry.histogram(
+    "http_request_db_seconds", "Time spent in SQL per HTTP request",
+    ("method", "route"),
+)
+translation_duration = registry.histogram(
+    "translation_request_duration_seconds",
+    "Upstream translation calls, retries included",
+    ("client", "outcome"),
+)
+password_hash_duration = registry.histogram(
+    "password_hash_duration_seconds", "bcrypt hashing and verification",
+    ("operation",),
+)
+
+
+@dataclass
+class RequestStats:
+    """Database work and timed calls done on behalf of one request.
+
+    ``statements`` is None unless someone (the profiler) asked for every
+    statement to be kept.
+    """
+
+    queries: int = 0
+    db_seconds: float = 0.0
+    statements: Optional[list] = None
+    # Call name -> [count, seconds]
+    calls: dict = field(default_factory=dict)
+
+    def record_call(self, name: str, seconds: float):
+        count, total = self.calls.get(name, (0, 0.0))
+        self.calls[name] = [count + 1, total + seconds]
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar(
+    "request_stats", default=None
+)
+
+
+def current_request_stats() -> Optional[RequestStats]:
+    return _request_stats.get()
+
+
+@contextmanager
+def request_stats():
+    """Stats of the current request, tracking them here if nobody does."""
+    stats = _request_stats.get()
+    if stats is not None:
+        yield stats
+        return
+    stats = RequestStats()
+    token = _request_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _request_stats.reset(token)
+
+
+def record_call(name: str, seconds: float):
+    """Add a timed call to the current request's stats, if any."""
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.record_call(name, seconds)
+
+
+@contextmanager
+def timed_call(name: str, histogram: Histogram, **labels):
+    """Time a block into ``histogram`` and the current request's stats."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        histogram.observe(elapsed, **labels)
+        record_call(name, elapsed)
+
+
+# Listens on every engine, including the async engine's sync core and
+# engines created by tests and benchmarks
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context,
+                           executemany):
+    if METRICS_ENABLED or _request_stats.get() is not None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context,
+                          executemany):
+    started = conn.info.get("query_started")
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    db_queries.inc()
+    db_query_seconds.inc(elapsed)
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+        if stats.statements is not None:
+            stats.statements.append((statement, elapsed))
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context):
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_started"):
+        connection.info["query_started"].pop()
+
+
+def route_label(scope: dict) -> str:
+    """Path template of the matched route, e.g. ``/api/notes/{note_id}``."""
+    return getattr(scope.get("route"), "path", UNMATCHED_ROUTE)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, status and database work.
+
+    Written against raw ASGI rather than ``BaseHTTPMiddleware`` so it adds
+    no task or stream wrapping and leaves streaming responses untouched.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        status_code = 500
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_requests_in_flight.dec()
+            _request_stats.reset(token)
+            method = scope["method"]
+            route = route_label(scope)
+            http_requests.inc(method=method, route=route,
+                              status=status_code)
+            http_request_duration.observe(elapsed, method=method,
+                                          route=route)
+            request_db_queries.observe(stats.queries, method=method,
+                                       route=route)
+            request_db_seconds.observe(stats.db_seconds, method=method,
+                                       route=route)
@@ -0,0 +1,311 @@
+"""Profile single requests on demand or by sampling.
+
+A request is profiled when it sends ``PROFILE_TOKEN`` in the
+``X-Profile-Token`` header; the response then names the profile in an
+``X-Profile`` header. A ``profile`` query flag (``?profile=0``) lets a
+client that always sends the header opt single requests out; it never
+replaces the token. With ``PROFILE_SAMPLE_RATE=N`` one request in N is
+profiled as well, to catch slow requests that cannot be reproduced on
+demand. Both are off unless configured.
+
+Each profile is written to ``PROFILE_DIR`` (``app/data/profiles``) as
+``<name>.prof``, readable with ``python -m pstats`` or snakeviz, a
+``<name>.stacks`` file of sampled stacks in the collapsed format of
+flamegraph.pl and speedscope, and a ``<name>.txt`` summary: the SQL
+statements the request ran, time spent in translation and password
+hashing, and the top functions of both.
+
+cProfile only sees the thread it runs in, so it profiles the event
+loop; the work handed to other threads (sync routes and dependencies,
+bcrypt, group commit) is caught by a sampler that records the stacks of
+every thread running application code each ``PROFILE_INTERVAL_MS``.
+Coroutines and threads of other requests running meanwhile appear in the
+profile too. One request is profiled at a time; others arriving
+meanwhile are served unprofiled.
+"""
+
+import cProfile
+import functools
+import hmac
+import io
+import itertools
+import logging
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import parse_qs
+from starlette.concurrency import run_in_threadpool
+from app.database.database import DATA_DIR
+from app.metrics import request_stats, route_label
+
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+# Profile one request in N; 0 disables sampling
+PROFILE_SAMPLE_RATE = int(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", str(DATA_DIR / "profiles")))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "200"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "1"))
+PROFILE_TOP_FUNCTIONS = 40
+
+PROFILE_TOKEN_HEADER = b"x-profile-token"
+PROFILE_QUERY_PARAM = "profile"
+FALSE_VALUES = {"0", "false", "no", "off"}
+APP_DIR = str(Path(__file__).resolve().parent)
+
+logger = logging.getLogger(__name__)
+
+# cProfile profilers cannot nest on a thread, so one request at a time
+_profile_lock = threading.Lock()
+
+
+def _label(code) -> str:
+    filename = Path(code.co_filename).name
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Samples the stacks of all threads from a background thread.
+
+    Threads whose stack holds no frame of the application (idle workers,
+    the event loop waiting for I/O) are left out.
+
+    Args:
+        interval: Seconds between samples
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.samples = 0
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._run, name="profile-sampler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        """Record the current stack of every other thread."""
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        own = threading.get_ident()
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(frame.f_code)
+                frame = frame.f_back
+            if any(code.co_filename.startswith(APP_DIR) for code in stack):
+                stack.reverse()
+                self.stacks[names.get(ident, str(ident)), tuple(stack)] += 1
+        self.samples += 1
+
+    def collapsed(self) -> str:
+        """Stacks as ``thread;outer;...;inner count`` lines."""
+        return "".join(
+            ";".join([thread, *map(_label, stack)]) + f" {count}\n"
+            for (thread, stack), count in self.stacks.most_common()
+        )
+
+    def functions(self) -> Counter:
+        """Samples each function was on the stack in (inclusive)."""
+        counts = Counter()
+        for (_, stack), count in self.stacks.items():
+            for label in set(map(_label, stack)):
+                counts[label] += count
+        return counts
+
+
+class RequestProfile:
+    """cProfile of the event loop and a sampler over all threads."""
+
+    def __init__(self):
+        self.loop_profiler = cProfile.Profile()
+        self.sampler = StackSampler(PROFILE_INTERVAL_MS / 1000)
+
+    def start(self):
+        self.sampler.start()
+        self.loop_profiler.enable()
+
+    def stop(self):
+        self.loop_profiler.disable()
+        self.sampler.stop()
+
+    def stats(self, stream) -> pstats.Stats:
+        return pstats.Stats(self.loop_profiler, stream=stream)
+
+
+def profile_name(scope: dict) -> str:
+    """Sortable file name stem: timestamp, method and path."""
+    stamp = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+    path = re.sub(r"[^A-Za-z0-9]+", "_", scope["path"]).strip("_")
+    return f"{stamp}-{scope['method']}-{path[:60] or 'root'}"
+
+
+def _collapse(statement: str, width: int = 160) -> str:
+    statement = " ".join(statement.split())
+    return statement if len(statement) <= width else statement[:width] + "…"
+
+
+def format_summary(request: str, stats: pstats.Stats, statements: list,
+                   calls: dict, sampler: StackSampler) -> str:
+    """Human-readable summary of a profiled request."""
+    lines = [request, ""]
+    by_statement = {}
+    for statement, seconds in statements:
+        count, total = by_statement.get(statement, (0, 0.0))
+        by_statement[statement] = (count + 1, total + seconds)
+    db_ms = sum(seconds for _, seconds in statements) * 1000
+    lines.append(f"SQL: {len(statements)} statements, {db_ms:.2f} ms")
+    for statement, (count, total) in sorted(
+        by_statement.items(), key=lambda item: -item[1][1]
+    ):
+        lines.append(f"  {count:5d} x {total * 1000:9.2f} ms  "
+                     f"{_collapse(statement)}")
+    lines.append("")
+    lines.append("Timed calls:")
+    for name, (count, total) in sorted(calls.items()):
+        lines.append(f"  {count:5d} x {total * 1000:9.2f} ms  {name}")
+    if not calls:
+        lines.append("  none")
+    lines.append("")
+    lines.append(f"Sampled functions, all threads ({sampler.samples} "
+                 f"samples every {sampler.interval * 1000:g} ms):")
+    functions = sampler.functions().most_common(PROFILE_TOP_FUNCTIONS)
+    for label, count in functions:
+        lines.append(f"  {count:5d}  {label}")
+    if not functions:
+        lines.append("  none")
+    lines.append("")
+    lines.append("Top functions by cumulative time (event loop):")
+    buffer = io.StringIO()
+    stats.stream = buffer
+    stats.sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+    lines.append(buffer.getvalue())
+    return "\n".join(lines)
+
+
+def write_profile(name: str, profile: RequestProfile, summary) -> Path:
+    """Write ``<name>.prof``, ``.stacks`` and ``.txt``; prune old profiles.
+
+    Args:
+        name: File name stem
+        profile: The request's profilers
+        summary: Callable turning the loop stats into the summary text
+
+    Returns:
+        Path: The ``.prof`` file
+    """
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    stats = profile.stats(io.StringIO())
+    path = PROFILE_DIR / f"{name}.prof"
+    stats.dump_stats(path)
+    path.with_suffix(".stacks").write_text(profile.sampler.collapsed(),
+                                           encoding="utf-8")
+    path.with_suffix(".txt").write_text(summary(stats), encoding="utf-8")
+    if PROFILE_KEEP:
+        for old in sorted(PROFILE_DIR.glob("*.prof"))[:-PROFILE_KEEP]:
+            for suffix in (".prof", ".stacks", ".txt"):
+                old.with_suffix(suffix).unlink(missing_ok=True)
+    return path
+
+
+class ProfilingMiddleware:
+    """ASGI middleware running selected requests under cProfile.
+
+    Must sit inside ``MetricsMiddleware``, so both share the request's
+    ``RequestStats``.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._requests = itertools.count(1)
+
+    def _requested(self, scope) -> bool:
+        if not PROFILE_TOKEN:
+            return False
+        token = dict(scope["headers"]).get(PROFILE_TOKEN_HEADER)
+        if token is None or not hmac.compare_digest(token,
+                                                    PROFILE_TOKEN.encode()):
+            return False
+        query = parse_qs(scope["query_string"].decode("latin-1"))
+        flag = query.get(PROFILE_QUERY_PARAM, ["1"])[0]
+        return flag.lower() not in FALSE_VALUES
+
+    def _sampled(self) -> bool:
+        return (PROFILE_SAMPLE_RATE > 0
+                and next(self._requests) % PROFILE_SAMPLE_RATE == 0)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (PROFILE_TOKEN
+                                           or PROFILE_SAMPLE_RATE):
+            await self.app(scope, receive, send)
+            return
+        on_demand = self._requested(scope)
+        if not (on_demand or self._sampled()) or not _profile_lock.acquire(
+            blocking=False
+        ):
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self._profile(scope, receive, send, on_demand)
+        finally:
+            _profile_lock.release()
+
+    async def _profile(self, scope, receive, send, on_demand: bool):
+        name = profile_name(scope)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                # Sampled requests do not learn they were profiled
+                if on_demand:
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        (b"x-profile", name.encode()),
+                    ]
+            await send(message)
+
+        profile = RequestProfile()
+        started = time.perf_counter()
+        with request_stats() as stats:
+            stats.statements = []
+            profile.start()
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                profile.stop()
+                elapsed = time.perf_counter() - started
+                statements, stats.statements = stats.statements, None
+                request = (
+                    f"{scope['method']} {scope['path']} -> {status_code} in "
+                    f"{elapsed * 1000:.2f} ms (route {route_label(scope)}, "
+                    f"{'requested' if on_demand else 'sampled'})"
+                )
+                summary = functools.partial(
+                    format_summary, request, statements=statements,
+                    calls=dict(stats.calls), sampler=profile.sampler,
+                )
+                try:
+                    await run_in_threadpool(
+                        write_profile, name, profile, summary
+                    )
+                except OSError:
+                    logger.exception("Could not write profile %s", name)
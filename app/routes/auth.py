@@ -1,14 +1,21 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from app.database.crud import (
-    create_user,
-    authenticate_user,
+    add_user,
     get_user_by_username,
+    update_password_hash,
+)
+from app.database.database import get_db, get_read_db
+from app.security.hashing import (
+    HashingBusyError,
+    get_password_hash_async,
+    hash_executor,
+    verify_and_update_password_async,
 )
-from app.database.database import get_db
 from app.security.tokens import create_access_token
 from pydantic import BaseModel
-from app.auth.dependencies import get_current_user
+from app.auth.dependencies import get_current_principal
 
 router = APIRouter()
 
@@ -23,21 +30,40 @@ class LoginRequest(BaseModel):
     password: str
 
 
+def hashing_busy_exception():
+    return HTTPException(
+        status_code=503,
+        detail="Authentication service is busy",
+        headers={"Retry-After": str(hash_executor.retry_after)},
+    )
+
+
 @router.post("/signup")
-def signup(request: SignupRequest, db: Session = Depends(get_db)):
+async def signup(
+    request: SignupRequest,
+    db: Session = Depends(get_read_db),
+    writer: Session = Depends(get_db),
+):
     """Register a new user account.
     Args:
         request: Signup credentials
-        db: Database session
+        db: Read-only session for the username check
+        writer: Session for the insert, only connected once hashed
     Returns:
         UserResponse: Created user details
     Raises:
-        HTTPException: 400 if username is taken
+        HTTPException: 400 if username is taken, 503 if hashing is busy
     """
-    user = get_user_by_username(db, request.username)
+    user = await run_in_threadpool(get_user_by_username, db, request.username)
     if user:
         raise HTTPException(status_code=400, detail="Username already exists")
-    new_user = create_user(db, request.username, request.password)
+    try:
+        password_hash = await get_password_hash_async(request.password)
+    except HashingBusyError:
+        raise hashing_busy_exception()
+    new_user = await run_in_threadpool(
+        add_user, writer, request.username, password_hash
+    )
     return {
         "message": "User created successfully",
         "username": new_user.username,
@@ -45,19 +71,39 @@ def signup(request: SignupRequest, db: Session = Depends(get_db)):
 
 
 @router.post("/login")
-def login(request: LoginRequest, db: Session = Depends(get_db)):
+async def login(
+    request: LoginRequest,
+    db: Session = Depends(get_read_db),
+    writer: Session = Depends(get_db),
+):
     """Authenticate user and return JWT access token.
+
+    Hashes made with an outdated bcrypt work factor are replaced on a
+    successful login.
     Args:
         request: Login credentials
-        db: Database session
+        db: Read-only session for the user lookup
+        writer: Session for a rehash, only connected when one is needed
     Returns:
         TokenResponse: JWT access token
     Raises:
-        HTTPException: 401 for invalid credentials
+        HTTPException: 401 for invalid credentials, 503 if hashing is busy
     """
-    user = authenticate_user(db, request.username, request.password)
+    user = await run_in_threadpool(get_user_by_username, db, request.username)
     if not user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
+    try:
+        verified, new_hash = await verify_and_update_password_async(
+            request.password, user.password_hash
+        )
+    except HashingBusyError:
+        raise hashing_busy_exception()
+    if not verified:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    if new_hash:
+        await run_in_threadpool(
+            lambda: update_password_hash(writer, writer.merge(user), new_hash)
+        )
     access_token = create_access_token(data={"sub": user.username})
     return {
         "access_token": access_token,
@@ -66,7 +112,7 @@ def login(request: LoginRequest, db: Session = Depends(get_db)):
 
 
 @router.get("/me")
-def get_current_user_info(current_user=Depends(get_current_user)):
+def get_current_user_info(current_user=Depends(get_current_principal)):
     """Retrieve details for the authenticated user.
     Args:
         current_user: Authenticated user from JWT
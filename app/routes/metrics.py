@@ -0,0 +1,82 @@
+import hmac
+import os
+from fastapi import APIRouter, HTTPException, Request, Response, status
+from app.auth.principals import principal_cache
+from app.database.group_commit import group_committer
+from app.metrics import registry
+from app.security.hashing import hash_executor
+from app.services.translation_backends import translation_backend
+from app.services.translation_cache import translation_cache
+from app.services.translation_jobs import job_queue
+
+# Bearer token scrapers must send; /metrics is not served without one.
+# The client address is not checked: behind a reverse proxy every
+# request would appear to come from the proxy.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+router = APIRouter()
+
+
+@registry.register_collector
+def collect_components():
+    """Counters kept by the caches, queues and pools themselves."""
+    caches = {"translation": translation_cache.stats(),
+              "principal": principal_cache.stats()}
+    for field in ("hits", "misses", "evictions", "expirations"):
+        yield (f"cache_{field}_total", "counter", f"Cache {field}",
+               [({"cache": name}, stats[field])
+                for name, stats in caches.items()])
+    yield ("cache_entries", "gauge", "Entries held in memory",
+           [({"cache": name}, stats["size"])
+            for name, stats in caches.items()])
+    commits = group_committer.stats()
+    yield ("group_commit_batches_total", "counter",
+           "Transactions committed by the group committer",
+           [({}, commits["batches"])])
+    yield ("group_commit_writes_total", "counter",
+           "Writes committed by the group committer",
+           [({}, commits["writes"])])
+    yield ("group_commit_queued", "gauge",
+           "Writes waiting for the next group commit",
+           [({}, commits["queued"])])
+    yield ("password_hash_pending", "gauge",
+           "bcrypt jobs running or waiting for a thread",
+           [({}, hash_executor.pending)])
+    breakers = translation_backend.breakers()
+    yield ("translation_circuit_open", "gauge",
+           "1 while the backend's circuit breaker rejects calls",
+           [({"backend": name}, int(breaker.state == breaker.OPEN))
+            for name, breaker in breakers.items()])
+    yield ("translation_circuit_rejected_total", "counter",
+           "Translation calls rejected by an open circuit",
+           [({"backend": name}, breaker.rejected)
+            for name, breaker in breakers.items()])
+    yield ("translation_jobs_queued", "gauge",
+           "Background translation jobs waiting for a worker",
+           [({}, job_queue.qsize())])
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics(request: Request):
+    """Serve all metrics in the Prometheus text format.
+
+    Scrapers authenticate with ``Authorization: Bearer <METRICS_TOKEN>``.
+
+    Raises:
+        HTTPException: 404 while ``METRICS_TOKEN`` is unset, 401 for a
+        missing or wrong token
+    """
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail="Not Found")
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(
+        token.encode(), METRICS_TOKEN.encode()
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid metrics token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return Response(registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
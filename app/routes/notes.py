@@ -1,19 +1,83 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
+from fastapi.responses import JSONResponse, StreamingResponse
 from app.database import crud
-from app.services.translate import TranslationService
+from app.database.fts import search_notes as fts_search_notes
+from app.database.group_commit import group_committer
+from app.services.translation_cache import translator
+from app.services.translation_pipeline import (
+    translate_document,
+    translate_many,
+)
+from app.services.translation_jobs import job_queue, QueueFullError
 from app.auth.dependencies import (
-    get_current_user,
+    get_current_principal,
 )  # JWT tokens
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, ValidationError
 from sqlalchemy.orm import Session
-from app.database.database import get_db
-from typing import List, Optional
-from datetime import datetime
+from starlette.concurrency import run_in_threadpool
+from app.database.database import get_db, get_read_db
+from app.routes.responses import FastJSONResponse, dumps
+from app.routes.schemas import TranslationJobResponse
+from typing import List, Literal, Optional, Union
+from datetime import datetime, timedelta
+import base64
+import binascii
+import hashlib
+import json
+import re
 
 router = APIRouter()
 
+# Maximum number of operations accepted by POST /batch
+NOTE_BATCH_LIMIT = 1000
+
+# Notes per fetch of GET /export and per transaction of POST /import
+NOTE_STREAM_CHUNK = 1000
+
+# Longest line accepted by POST /import
+NOTE_IMPORT_MAX_LINE = 1024 * 1024
+
+# Limits of one POST /translate request; without note ids it translates
+# the user's most recently updated notes
+TRANSLATE_FANOUT_MAX_NOTES = 100
+TRANSLATE_FANOUT_MAX_TARGETS = 10
+
+# Clients may store responses but must revalidate them with the ETag
+NOTE_CACHE_CONTROL = "private, no-cache"
+
+_EPOCH = datetime(1970, 1, 1)
+_NOTE_ETAG = re.compile(r'"(\d+)-([0-9a-f]+)"')
+
 
 # --------------- Helper Functions ---------------
+def note_access_exception(status_code: int) -> HTTPException:
+    """Build the error for a note that is missing (404), not owned (403)
+    or no longer at the version the client expected (412)."""
+    if status_code == status.HTTP_404_NOT_FOUND:
+        return HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Note resource not found"
+        )
+    if status_code == status.HTTP_412_PRECONDITION_FAILED:
+        return HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail="Note has been modified"
+        )
+    return HTTPException(
+        status_code=status.HTTP_403_FORBIDDEN,
+        detail="Unauthorized note access"
+    )
+
+
 def verify_note_ownership(note_id: int,
                           user_id: int,
                           db: Session
@@ -33,16 +97,167 @@ def verify_note_ownership(note_id: int,
     """
     note = crud.get_note_by_id(db, note_id)
     if not note:
+        raise note_access_exception(status.HTTP_404_NOT_FOUND)
+    if note.user_id != user_id:
+        raise note_access_exception(status.HTTP_403_FORBIDDEN)
+    return note
+
+
+def _update_owned_note(db: Session, note_id: int, user_id: int,
+                       title: Optional[str], content: Optional[str],
+                       versions: Optional[list] = None):
+    # Staged inside a group commit; raising rolls back only this write
+    note, status_code = crud.apply_note_update(
+        db, note_id, user_id, title=title, content=content,
+        versions=versions
+    )
+    if note is None:
+        raise note_access_exception(status_code)
+    return note
+
+
+def note_etag(note_id: int, updated_at: datetime) -> str:
+    """Strong ETag for one version of a note."""
+    micros = (updated_at - _EPOCH) // timedelta(microseconds=1)
+    return f'"{note_id}-{micros:x}"'
+
+
+def notes_list_etag(user_id: int, version: int, params: tuple) -> str:
+    """Strong ETag for a listing, from the user's notes version.
+
+    ``version`` comes from ``crud.get_user_notes_version``; ``params``
+    are the listing's query parameters, since every page is its own
+    representation.
+    """
+    key = repr((user_id, version, params)).encode()
+    return f'"l-{hashlib.sha256(key).hexdigest()[:32]}"'
+
+
+def _etag_list(header: str) -> List[str]:
+    return [tag.strip() for tag in header.split(",") if tag.strip()]
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison used for If-None-Match."""
+    return any(
+        tag == "*" or tag.removeprefix("W/") == etag
+        for tag in _etag_list(if_none_match)
+    )
+
+
+def parse_if_match(if_match: Optional[str], note_id: int):
+    """Turn an If-Match header into the note versions a write requires.
+
+    Returns:
+        Optional[list]: updated_at values named by the header's ETags for
+        this note (possibly none, which fails the precondition), or None
+        when there is no precondition (header absent or ``*``)
+    """
+    if if_match is None:
+        return None
+    versions = []
+    for tag in _etag_list(if_match):
+        if tag == "*":
+            return None
+        # Weak tags never satisfy If-Match (strong comparison)
+        match = _NOTE_ETAG.fullmatch(tag)
+        if match and int(match.group(1)) == note_id:
+            versions.append(
+                _EPOCH + timedelta(microseconds=int(match.group(2), 16))
+            )
+    return versions
+
+
+def validator_headers(etag: str) -> dict:
+    return {"ETag": etag, "Cache-Control": NOTE_CACHE_CONTROL}
+
+
+def set_validator(response: Response, etag: str):
+    response.headers.update(validator_headers(etag))
+
+
+def not_modified(etag: str) -> Response:
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers=validator_headers(etag),
+    )
+
+
+def encode_cursor(position: tuple, order: str) -> str:
+    """Build an opaque pagination cursor from a (updated_at, id) pair."""
+    updated_at, note_id = position
+    raw = json.dumps([updated_at, note_id, order]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, order: str) -> tuple:
+    """Parse a cursor produced by ``encode_cursor``.
+
+    Raises:
+        HTTPException: 400 if the cursor is malformed or was issued
+        for a different ordering
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        updated_at, note_id, cursor_order = json.loads(raw)
+        if not isinstance(updated_at, str) or not isinstance(note_id, int):
+            raise ValueError(cursor)
+    except (ValueError, TypeError, binascii.Error):
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Note resource not found"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
         )
-    if note.user_id != user_id:
+    if cursor_order != order:
         raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Unauthorized note access"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor does not match the requested order"
         )
-    return note
+    return updated_at, note_id
+
+
+def list_fields(view: str, fields: Optional[str]) -> tuple:
+    """Resolve which fields a listing returns.
+
+    ``fields`` is a comma separated list of ``crud.NOTE_LIST_FIELDS``
+    names and takes precedence over ``view``; ``id`` is always included.
+
+    Raises:
+        HTTPException: 400 for unknown field names
+    """
+    if fields is None:
+        if view == "summary":
+            return crud.NOTE_SUMMARY_FIELDS
+        return tuple(column.key for column in crud.NOTE_COLUMNS)
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = sorted(set(names) - crud.NOTE_LIST_FIELDS.keys())
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(unknown)}"
+        )
+    return tuple(dict.fromkeys(["id", *names]))
+
+
+async def ndjson_lines(request: Request):
+    """Split a streamed request body into lines without buffering it.
+
+    Raises:
+        HTTPException: 413 if a line exceeds ``NOTE_IMPORT_MAX_LINE``
+    """
+    pending = b""
+    async for data in request.stream():
+        *lines, pending = (pending + data).split(b"\n")
+        if len(pending) > NOTE_IMPORT_MAX_LINE or any(
+            len(line) > NOTE_IMPORT_MAX_LINE for line in lines
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail="NDJSON line too long"
+            )
+        for line in lines:
+            yield line
+    if pending:
+        yield pending
 
 
 # --------------- Pydantic Models ---------------
@@ -70,88 +285,511 @@ class NoteResponse(NoteBase):
         from_attributes = True
 
 
+class NoteSearchResult(BaseModel):
+    id: int
+    title: str
+    title_highlight: str
+    snippet: str
+    rank: float
+    created_at: datetime
+    updated_at: datetime
+
+
+class NotePage(BaseModel):
+    items: List[NoteResponse]
+    next_cursor: Optional[str] = None
+
+
+class NoteSummary(BaseModel):
+    id: int
+    user_id: int
+    title: str
+    created_at: datetime
+    updated_at: datetime
+    content_length: int
+    snippet: str
+
+
+class NoteSummaryPage(BaseModel):
+    items: List[NoteSummary]
+    next_cursor: Optional[str] = None
+
+
+# Documents the shapes of GET /; fields= can return any subset
+NOTE_LIST_RESPONSE = Union[
+    List[NoteResponse], NotePage, List[NoteSummary], NoteSummaryPage
+]
+
+
+class NoteBatchOperation(BaseModel):
+    op: Literal["create", "update", "delete"]
+    id: Optional[int] = None
+    title: Optional[str] = None
+    content: Optional[str] = None
+
+
+class NoteBatchRequest(BaseModel):
+    operations: List[NoteBatchOperation] = Field(
+        ..., min_length=1, max_length=NOTE_BATCH_LIMIT
+    )
+
+
+class NoteBatchResult(BaseModel):
+    op: str
+    status: int
+    id: Optional[int] = None
+    note: Optional[NoteResponse] = None
+    error: Optional[str] = None
+
+
 class TranslateNoteResponse(BaseModel):
     translated_text: str
 
 
+class NotesTranslateRequest(BaseModel):
+    target_langs: List[str] = Field(
+        ..., min_length=1, max_length=TRANSLATE_FANOUT_MAX_TARGETS
+    )
+    note_ids: Optional[List[int]] = Field(
+        None, min_length=1, max_length=TRANSLATE_FANOUT_MAX_NOTES
+    )
+    source_lang: str = "ru"
+
+
+class NoteTranslation(BaseModel):
+    note_id: int
+    target_lang: str
+    status: int
+    translated_text: Optional[str] = None
+    error: Optional[str] = None
+
+
 # --------------- Route Handlers ---------------
 @router.post("/", response_model=NoteResponse)
 def create_note(
     note: NoteCreate,
+    response: Response,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_principal),
+):
+    """Create a new note for the authenticated user.
+
+    With group commit enabled the insert shares a transaction with other
+    concurrent writes.
+    """
+    if group_committer.enabled:
+        created = group_committer.run(
+            crud.add_note, note.title, note.content, current_user.id
+        )
+    else:
+        created = crud.create_note(
+            db, note.title, note.content, current_user.id
+        )
+    set_validator(response, note_etag(created.id, created.updated_at))
+    return created
+
+
+@router.post("/batch", response_model=List[NoteBatchResult])
+def batch_notes(
+    batch: NoteBatchRequest,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_principal),
+):
+    """Create, update and delete many notes in one transaction.
+
+    Intended for offline-sync uploads. Results are returned per operation
+    in request order; an operation that fails validation or ownership
+    (``status`` 404/403/409/422) does not stop the others.
+    """
+    return crud.apply_note_batch(
+        db, current_user.id, [op.model_dump() for op in batch.operations]
+    )
+
+
+@router.get("/group-commit/stats")
+def group_commit_stats(current_user=Depends(get_current_principal)):
+    """Batch size and commit latency counters of the group committer."""
+    return group_committer.stats()
+
+
+@router.get("/export")
+def export_notes(
+    db: Session = Depends(get_read_db),
+    current_user=Depends(get_current_principal),
+):
+    """Stream all of the user's notes as NDJSON, one note per line.
+
+    Notes are read in chunks of ``NOTE_STREAM_CHUNK`` from a server-side
+    cursor, so memory use is the same for ten notes or a million.
+    """
+    # The request's session is closed before the body is sent; stream
+    # from a session of our own on the same engine
+    bind = db.get_bind()
+    user_id = current_user.id
+
+    def lines():
+        with Session(bind=bind) as export_db:
+            for chunk in crud.iter_user_note_chunks(
+                export_db, user_id, NOTE_STREAM_CHUNK
+            ):
+                yield b"".join(dumps(note) + b"\n" for note in chunk)
+
+    return StreamingResponse(
+        lines(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="notes.ndjson"'},
+    )
+
+
+@router.post("/import")
+async def import_notes(
+    request: Request,
     db: Session = Depends(get_db),
-    current_user=Depends(get_current_user),
+    current_user=Depends(get_current_principal),
 ):
-    """Create a new note for the authenticated user."""
-    return crud.create_note(db, note.title, note.content, current_user.id)
+    """Create notes from an NDJSON body of ``{"title", "content"}`` lines.
+
+    The body is read as a stream and committed every
+    ``NOTE_STREAM_CHUNK`` notes. Other fields, such as those of
+    ``GET /export``, are ignored; ids and timestamps are assigned anew.
+    A malformed line stops the import with ``422``: the notes on earlier
+    lines are kept and their count is in the error detail.
+    """
+    imported = 0
+    line_number = 0
+    chunk = []
+    async for line in ndjson_lines(request):
+        line_number += 1
+        if not line.strip():
+            continue
+        try:
+            chunk.append(NoteCreate.model_validate_json(line).model_dump())
+        except ValidationError as exc:
+            imported += await run_in_threadpool(
+                crud.import_notes, db, current_user.id, chunk
+            )
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail={
+                    "line": line_number,
+                    "imported": imported,
+                    "error": exc.errors(include_url=False,
+                                        include_context=False)[0]["msg"],
+                },
+            )
+        if len(chunk) >= NOTE_STREAM_CHUNK:
+            imported += await run_in_threadpool(
+                crud.import_notes, db, current_user.id, chunk
+            )
+            chunk = []
+    imported += await run_in_threadpool(
+        crud.import_notes, db, current_user.id, chunk
+    )
+    return {"imported": imported}
+
+
+@router.get("/search", response_model=List[NoteSearchResult])
+def search_notes(
+    q: str = Query(..., min_length=1, max_length=256),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_read_db),
+    current_user=Depends(get_current_principal),
+):
+    """Full-text search over the authenticated user's notes.
+
+    Results are ranked by BM25 with title matches weighted above content
+    matches; matched terms are wrapped in ``<mark>`` tags in
+    ``title_highlight`` and ``snippet``.
+    """
+    return fts_search_notes(
+        db, current_user.id, q, limit=limit, offset=offset
+    )
 
 
 @router.get("/{note_id}", response_model=NoteResponse)
 def get_note(
     note_id: int,
-    db: Session = Depends(get_db),
-    current_user=Depends(get_current_user)
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_read_db),
+    current_user=Depends(get_current_principal)
 ):
-    """Retrieve a specific note with authorization check."""
-    return verify_note_ownership(note_id, current_user.id, db)
+    """Retrieve a specific note with authorization check.
+
+    The response carries an ``ETag``. When ``If-None-Match`` matches it,
+    only the note's owner and version are read and ``304`` is returned
+    without a body.
+    """
+    if if_none_match:
+        version = crud.get_note_version(db, note_id)
+        if version is None:
+            raise note_access_exception(status.HTTP_404_NOT_FOUND)
+        if version.user_id != current_user.id:
+            raise note_access_exception(status.HTTP_403_FORBIDDEN)
+        etag = note_etag(note_id, version.updated_at)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+    note = verify_note_ownership(note_id, current_user.id, db)
+    set_validator(response, note_etag(note.id, note.updated_at))
+    return note
 
 
 @router.put("/{note_id}", response_model=NoteResponse)
 def update_note(
     note_id: int,
     note_update: NoteUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
-    current_user=Depends(get_current_user),
+    current_user=Depends(get_current_principal),
 ):
-    """Update note details with partial data."""
-    verify_note_ownership(note_id, current_user.id, db)
-    return crud.update_note(
-        db, note_id,
-        title=note_update.title,
-        content=note_update.content
-    )
+    """Update note details with partial data.
+
+    With ``If-Match`` the update only applies if the note is still at
+    that version, otherwise ``412`` is returned.
+    """
+    versions = parse_if_match(if_match, note_id)
+    if group_committer.enabled:
+        note = group_committer.run(
+            _update_owned_note, note_id, current_user.id,
+            note_update.title, note_update.content, versions,
+        )
+    else:
+        note, status_code = crud.update_note(
+            db, note_id, current_user.id,
+            title=note_update.title,
+            content=note_update.content,
+            versions=versions
+        )
+        if note is None:
+            raise note_access_exception(status_code)
+    set_validator(response, note_etag(note.id, note.updated_at))
+    return note
 
 
 @router.delete("/{note_id}")
 def delete_note(
     note_id: int,
+    if_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
-    current_user=Depends(get_current_user)
+    current_user=Depends(get_current_principal)
 ):
-    """Permanently delete a note."""
-    verify_note_ownership(note_id, current_user.id, db)
-    crud.delete_note(db, note_id)
+    """Permanently delete a note.
+
+    With ``If-Match`` the note is only deleted if it is still at that
+    version, otherwise ``412`` is returned.
+    """
+    status_code = crud.delete_note(
+        db, note_id, current_user.id,
+        versions=parse_if_match(if_match, note_id)
+    )
+    if status_code != status.HTTP_200_OK:
+        raise note_access_exception(status_code)
     return {"message": "Note deleted successfully"}
 
 
-@router.get("/", response_model=List[NoteResponse])
+@router.get("/", response_model=NOTE_LIST_RESPONSE)
 def list_notes(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
-    current_user=Depends(get_current_user),
+    cursor: Optional[str] = None,
+    order: Optional[Literal["asc", "desc"]] = None,
+    view: Literal["full", "summary"] = "full",
+    fields: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_read_db),
+    current_user=Depends(get_current_principal),
 ):
-    """List all notes for the authenticated user."""
-    return crud.get_user_notes(db, current_user.id, skip=skip, limit=limit)
+    """List all notes for the authenticated user.
+
+    Without ``cursor`` this keeps the original ``skip``/``limit`` list
+    response. Passing ``cursor`` (empty for the first page) switches to
+    keyset pagination ordered by ``updated_at`` (``order``, newest first
+    by default) and returns ``{"items": [...], "next_cursor": ...}``;
+    ``next_cursor`` is null on the last page.
+
+    The ``ETag`` changes whenever any of the user's notes is created,
+    updated or deleted; a matching ``If-None-Match`` gets ``304`` without
+    the page being fetched.
 
+    ``view=summary`` replaces ``content`` with ``content_length`` (UTF-8
+    bytes) and a ``snippet`` of its first characters, both computed in
+    SQL, so full bodies are neither decoded nor sent; fetch them one at
+    a time from ``GET /{note_id}``. ``fields`` selects any other subset,
+    e.g. ``fields=title,updated_at``.
 
-@router.post("/{note_id}/translate", response_model=TranslateNoteResponse)
-def translate_note(
+    Rows come straight from a Core query and are encoded without
+    response model validation; ``response_model`` only documents them.
+    """
+    names = list_fields(view, fields)
+    etag = notes_list_etag(
+        current_user.id,
+        crud.get_user_notes_version(db, current_user.id),
+        (skip, limit, cursor, order, names),
+    )
+    if if_none_match and etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    columns = crud.note_list_columns(names)
+    if cursor is None:
+        content = crud.get_user_note_rows(
+            db, current_user.id, skip=skip, limit=limit, order=order,
+            columns=columns
+        )
+    else:
+        order = order or "desc"
+        after = decode_cursor(cursor, order) if cursor else None
+        rows, position = crud.get_user_note_rows_keyset(
+            db, current_user.id, limit=limit, after=after, order=order,
+            columns=columns
+        )
+        content = {
+            "items": rows,
+            "next_cursor": (
+                encode_cursor(position, order) if position else None
+            ),
+        }
+    return FastJSONResponse(content, headers=validator_headers(etag))
+
+
+@router.post(
+    "/{note_id}/translate",
+    response_model=TranslateNoteResponse,
+    responses={202: {"model": TranslationJobResponse}},
+)
+async def translate_note(
     note_id: int,
-    db: Session = Depends(get_db),
-    current_user=Depends(get_current_user),
+    background: bool = False,
+    db: Session = Depends(get_read_db),
+    current_user=Depends(get_current_principal),
 ):
-    """Translate note content using external service."""
-    note = verify_note_ownership(note_id, current_user.id, db)
-    translated_text = TranslationService.translate_text(
+    """Translate note content using external service.
+
+    The upstream call is awaited on the event loop, so slow translations
+    do not hold threadpool workers needed by the sync routes. Repeated
+    translations of the same text are served from the translation cache,
+    and long notes are translated as concurrent, individually retried
+    segments.
+
+    With ``background=true`` the translation is queued instead and a
+    ``202`` with the job id is returned right away; poll
+    ``GET /api/translation/jobs/{job_id}`` for the result.
+
+    Raises:
+        HTTPException: 429 with Retry-After if the job queue is full
+    """
+    note = await run_in_threadpool(
+        _read_and_close, db,
+        lambda db: verify_note_ownership(note_id, current_user.id, db),
+    )
+    if background:
+        try:
+            job = await job_queue.submit(note.id, current_user.id)
+        except QueueFullError:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Translation queue is full",
+                headers={"Retry-After": str(job_queue.retry_after)},
+            )
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content=TranslationJobResponse(
+                job_id=job.id, note_id=job.note_id, status=job.status
+            ).model_dump(),
+        )
+
+    translated_text = await translate_document(
         note.content,
+        translator.translate_text,
         source_lang="ru",
         target_lang="en",
     )
     if not translated_text:
         raise HTTPException(status_code=502, detail="Translation failed")
 
-    # Fix: If the translation returns a list, join it into a string
-    if isinstance(translated_text, list):
-        translated_text = " ".join(translated_text)
-
     return TranslateNoteResponse(translated_text=translated_text)
+
+
+def _translation_sources(db: Session, user_id: int,
+                         note_ids: Optional[List[int]]) -> list:
+    """(note id, content, status) of each note to translate.
+
+    Content is None for notes that are missing (404) or not owned (403).
+    """
+    if note_ids is None:
+        notes = crud.get_user_notes(
+            db, user_id, limit=TRANSLATE_FANOUT_MAX_NOTES, order="desc"
+        )
+        return [(note.id, note.content, status.HTTP_200_OK)
+                for note in notes]
+    owned = crud.get_user_notes_by_ids(db, user_id, note_ids)
+    others = [note_id for note_id in note_ids if note_id not in owned]
+    existing = crud.get_existing_note_ids(db, others) if others else set()
+    sources = []
+    for note_id in dict.fromkeys(note_ids):
+        if note_id in owned:
+            sources.append((note_id, owned[note_id].content,
+                            status.HTTP_200_OK))
+        elif note_id in existing:
+            sources.append((note_id, None, status.HTTP_403_FORBIDDEN))
+        else:
+            sources.append((note_id, None, status.HTTP_404_NOT_FOUND))
+    return sources
+
+
+def _read_and_close(db: Session, read, *args):
+    """Run ``read(db, *args)`` and close ``db`` before returning.
+
+    For routes that read a little and then await slow upstream calls:
+    the session's connection goes back to the pool instead of being held
+    for the whole translation.
+    """
+    try:
+        return read(db, *args)
+    finally:
+        db.close()
+
+
+@router.post("/translate", response_model=List[NoteTranslation])
+async def translate_notes(
+    request: NotesTranslateRequest,
+    db: Session = Depends(get_read_db),
+    current_user=Depends(get_current_principal),
+):
+    """Translate notes into several languages in one request.
+
+    Without ``note_ids`` the user's most recently updated notes are
+    translated. All (note, language) pairs are translated concurrently,
+    identical texts and segments only once, with upstream calls bounded
+    by ``TRANSLATE_FANOUT_CONCURRENCY`` across all such requests.
+
+    Results are returned per note and language, in request order; a
+    note that is missing or not owned (``status`` 404/403) or a failed
+    translation (502) does not affect the others.
+    """
+    target_langs = list(dict.fromkeys(request.target_langs))
+    sources = await run_in_threadpool(
+        _read_and_close, db, _translation_sources, current_user.id,
+        request.note_ids
+    )
+    translations = await translate_many(
+        [content for _, content, _ in sources if content is not None],
+        target_langs,
+        translator.translate_text,
+        source_lang=request.source_lang,
+    )
+    results = []
+    for note_id, content, code in sources:
+        for target in target_langs:
+            result = NoteTranslation(
+                note_id=note_id, target_lang=target, status=code
+            )
+            if content is None:
+                result.error = note_access_exception(code).detail
+            else:
+                result.translated_text = translations[(content, target)]
+                if not result.translated_text:
+                    result.status = status.HTTP_502_BAD_GATEWAY
+                    result.error = "Translation failed"
+            results.append(result)
+    return results
@@ -0,0 +1,178 @@
+"""Async variants of the note CRUD routes.
+
+Mounted in front of ``app.routes.notes`` when ``DB_ASYNC=1``: the routes
+below then shadow their sync counterparts and run entirely on the event
+loop through the aiosqlite engine, while every other note route keeps
+being served by the sync router.
+"""
+
+from fastapi import APIRouter, Depends, Header, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Literal, Optional
+from app.auth.dependencies import get_current_principal_async
+from app.database import crud
+from app.database.database import get_async_db
+from app.routes.notes import (
+    NOTE_LIST_RESPONSE,
+    NoteCreate,
+    NoteResponse,
+    NoteUpdate,
+    decode_cursor,
+    encode_cursor,
+    etag_matches,
+    list_fields,
+    not_modified,
+    note_access_exception,
+    note_etag,
+    notes_list_etag,
+    parse_if_match,
+    set_validator,
+    validator_headers,
+)
+from app.routes.responses import FastJSONResponse
+
+router = APIRouter()
+
+
+# --------------- Helper Functions ---------------
+async def verify_note_ownership(note_id: int,
+                                user_id: int,
+                                db: AsyncSession
+                                ) -> crud.Note:
+    """Verify note exists and user has ownership.
+
+    Raises:
+        HTTPException: 404 if not found, 403 if unauthorized
+    """
+    note = await crud.get_note_by_id_async(db, note_id)
+    if not note:
+        raise note_access_exception(status.HTTP_404_NOT_FOUND)
+    if note.user_id != user_id:
+        raise note_access_exception(status.HTTP_403_FORBIDDEN)
+    return note
+
+
+# --------------- Route Handlers ---------------
+@router.post("/", response_model=NoteResponse)
+async def create_note(
+    note: NoteCreate,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(get_current_principal_async),
+):
+    """Create a new note for the authenticated user."""
+    created = await crud.create_note_async(
+        db, note.title, note.content, current_user.id
+    )
+    set_validator(response, note_etag(created.id, created.updated_at))
+    return created
+
+
+@router.get("/{note_id:int}", response_model=NoteResponse)
+async def get_note(
+    note_id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(get_current_principal_async)
+):
+    """Retrieve a specific note; answers ``304`` like the sync route."""
+    if if_none_match:
+        version = await crud.get_note_version_async(db, note_id)
+        if version is None:
+            raise note_access_exception(status.HTTP_404_NOT_FOUND)
+        if version.user_id != current_user.id:
+            raise note_access_exception(status.HTTP_403_FORBIDDEN)
+        etag = note_etag(note_id, version.updated_at)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+    note = await verify_note_ownership(note_id, current_user.id, db)
+    set_validator(response, note_etag(note.id, note.updated_at))
+    return note
+
+
+@router.put("/{note_id:int}", response_model=NoteResponse)
+async def update_note(
+    note_id: int,
+    note_update: NoteUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(get_current_principal_async),
+):
+    """Update note details with partial data, honouring ``If-Match``."""
+    note, status_code = await crud.update_note_async(
+        db, note_id, current_user.id,
+        title=note_update.title,
+        content=note_update.content,
+        versions=parse_if_match(if_match, note_id)
+    )
+    if note is None:
+        raise note_access_exception(status_code)
+    set_validator(response, note_etag(note.id, note.updated_at))
+    return note
+
+
+@router.delete("/{note_id:int}")
+async def delete_note(
+    note_id: int,
+    if_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(get_current_principal_async)
+):
+    """Permanently delete a note, honouring ``If-Match``."""
+    status_code = await crud.delete_note_async(
+        db, note_id, current_user.id,
+        versions=parse_if_match(if_match, note_id)
+    )
+    if status_code != status.HTTP_200_OK:
+        raise note_access_exception(status_code)
+    return {"message": "Note deleted successfully"}
+
+
+@router.get("/", response_model=NOTE_LIST_RESPONSE)
+async def list_notes(
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    order: Optional[Literal["asc", "desc"]] = None,
+    view: Literal["full", "summary"] = "full",
+    fields: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(get_current_principal_async),
+):
+    """List notes for the authenticated user.
+
+    Same contract as the sync route: ``skip``/``limit`` lists by default,
+    keyset pages when ``cursor`` is given, ``view``/``fields``
+    projections and the same list ETag.
+    """
+    names = list_fields(view, fields)
+    etag = notes_list_etag(
+        current_user.id,
+        await crud.get_user_notes_version_async(db, current_user.id),
+        (skip, limit, cursor, order, names),
+    )
+    if if_none_match and etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    columns = crud.note_list_columns(names)
+    if cursor is None:
+        content = await crud.get_user_note_rows_async(
+            db, current_user.id, skip=skip, limit=limit, order=order,
+            columns=columns
+        )
+    else:
+        order = order or "desc"
+        after = decode_cursor(cursor, order) if cursor else None
+        rows, position = await crud.get_user_note_rows_keyset_async(
+            db, current_user.id, limit=limit, after=after, order=order,
+            columns=columns
+        )
+        content = {
+            "items": rows,
+            "next_cursor": (
+                encode_cursor(position, order) if position else None
+            ),
+        }
+    return FastJSONResponse(content, headers=validator_headers(etag))
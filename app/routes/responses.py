@@ -0,0 +1,39 @@
+"""JSON responses for data the server produced itself.
+
+Routes returning rows straight from the database do not need FastAPI's
+response model validation and ``jsonable_encoder`` pass; they hand plain
+dicts to ``FastJSONResponse``, which encodes them with orjson when it is
+installed and with the standard library otherwise.
+"""
+
+import json
+from datetime import date, datetime
+from fastapi import Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speed-up
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def dumps(content) -> bytes:
+    """Encode to compact JSON; datetimes use ISO 8601 like FastAPI."""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content, default=_default, ensure_ascii=False,
+        separators=(",", ":"),
+    ).encode()
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
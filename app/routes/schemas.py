@@ -0,0 +1,12 @@
+"""Response models shared by more than one router."""
+
+from typing import Optional
+from pydantic import BaseModel
+
+
+class TranslationJobResponse(BaseModel):
+    job_id: str
+    note_id: int
+    status: str
+    translated_text: Optional[str] = None
+    error: Optional[str] = None
@@ -0,0 +1,42 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from app.auth.dependencies import get_current_principal
+from app.database import crud
+from app.database.database import get_read_db
+from app.routes.schemas import TranslationJobResponse
+from app.services.translation_cache import translation_cache
+
+router = APIRouter()
+
+
+@router.get("/cache/stats")
+def translation_cache_stats(current_user=Depends(get_current_principal)):
+    """Report hit, miss and eviction counters of the translation cache."""
+    return translation_cache.stats()
+
+
+@router.get("/jobs/{job_id}", response_model=TranslationJobResponse)
+def get_translation_job(
+    job_id: str,
+    db: Session = Depends(get_read_db),
+    current_user=Depends(get_current_principal),
+):
+    """Poll the status and result of a background translation job.
+
+    Raises:
+        HTTPException: 404 if the job does not exist or belongs to
+        another user
+    """
+    job = crud.get_translation_job(db, job_id)
+    if not job or job.user_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Translation job not found"
+        )
+    return TranslationJobResponse(
+        job_id=job.id,
+        note_id=job.note_id,
+        status=job.status,
+        translated_text=job.result,
+        error=job.error,
+    )
@@ -1,11 +1,121 @@
+import asyncio
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
 from passlib.context import CryptContext
+from app.metrics import password_hash_duration, timed_call
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt work factor; hashes made with another factor are upgraded on login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+HASH_WORKERS = int(
+    os.getenv("HASH_WORKERS", str(min(4, os.cpu_count() or 1)))
+)
+HASH_QUEUE_LIMIT = int(os.getenv("HASH_QUEUE_LIMIT", "32"))
+HASH_RETRY_AFTER = int(os.getenv("HASH_RETRY_AFTER", "1"))
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
 
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    with timed_call("get_password_hash", password_hash_duration,
+                    operation="hash"):
+        return pwd_context.hash(password)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    with timed_call("verify_password", password_hash_duration,
+                    operation="verify"):
+        return pwd_context.verify(plain_password, hashed_password)
+
+
+def verify_and_update_password(
+    plain_password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    """Verify a password and rehash it if the work factor changed.
+
+    Returns:
+        Tuple: (whether the password matches, new hash or None)
+    """
+    with timed_call("verify_password", password_hash_duration,
+                    operation="verify"):
+        return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+class HashingBusyError(Exception):
+    """Raised when too many hashing jobs are already waiting."""
+
+
+class HashingExecutor:
+    """Dedicated, size-limited thread pool for bcrypt.
+
+    Keeps password hashing off the shared threadpool used by sync routes
+    and fails fast once ``workers + queue_limit`` jobs are in flight, so a
+    login storm cannot build an unbounded backlog.
+
+    Args:
+        workers: Number of hashing threads
+        queue_limit: Jobs allowed to wait for a free thread
+        retry_after: Seconds suggested to clients when busy
+    """
+
+    def __init__(
+        self,
+        workers: int = HASH_WORKERS,
+        queue_limit: int = HASH_QUEUE_LIMIT,
+        retry_after: int = HASH_RETRY_AFTER,
+    ):
+        self.max_pending = workers + queue_limit
+        self.retry_after = retry_after
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="bcrypt"
+        )
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _release(self, future):
+        with self._lock:
+            self._pending -= 1
+
+    async def run(self, func, *args):
+        """Run a hashing function on the pool and await its result.
+
+        Raises:
+            HashingBusyError: If the queue-depth limit is reached
+        """
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise HashingBusyError()
+            self._pending += 1
+        # Like run_in_threadpool, so per-request stats follow the job
+        context = contextvars.copy_context()
+        future = self._executor.submit(context.run, func, *args)
+        # Released when the thread finishes, even if the caller goes away
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+
+hash_executor = HashingExecutor()
+
+
+async def get_password_hash_async(password: str) -> str:
+    return await hash_executor.run(get_password_hash, password)
+
+
+async def verify_and_update_password_async(
+    plain_password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    return await hash_executor.run(
+        verify_and_update_password, plain_password, hashed_password
+    )
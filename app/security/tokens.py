@@ -1,7 +1,11 @@
 from datetime import datetime, timedelta, timezone
 from jose import jwt, JWTError
 from dotenv import load_dotenv
+from app.services.cache import TTLCache
+import hashlib
+import hmac
 import os
+import time
 
 load_dotenv()
 
@@ -10,6 +14,13 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY", "fallback_secret_key")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "4096"))
+
+# Verified payloads keyed by an HMAC of the whole token; each entry
+# expires together with the token it was decoded from
+token_cache = TTLCache(
+    maxsize=TOKEN_CACHE_SIZE, ttl=ACCESS_TOKEN_EXPIRE_MINUTES * 60
+)
 
 
 def create_access_token(data: dict):
@@ -22,9 +33,37 @@ def create_access_token(data: dict):
     return jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
 
 
-def verify_access_token(token: str):
+def decode_access_token(token: str):
+    """Verify the signature and claims of a token without caching."""
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         return payload
     except JWTError:
         return None
+
+
+def _token_cache_key(token: str) -> bytes:
+    # Header, payload and signature are all hashed, so any change to the
+    # token (or a rotated secret) produces a different key
+    return hmac.new(
+        SECRET_KEY.encode(), token.encode(), hashlib.sha256
+    ).digest()
+
+
+def verify_access_token(token: str):
+    """Verify a token, reusing the payload of a token seen before.
+
+    Only successfully verified tokens are cached, and only until their
+    ``exp`` claim, so a cache hit never outlives the token.
+    """
+    key = _token_cache_key(token)
+    payload = token_cache.get(key)
+    if payload is not None:
+        return dict(payload)
+    payload = decode_access_token(token)
+    if payload is None:
+        return None
+    exp = payload.get("exp")
+    if isinstance(exp, (int, float)):
+        token_cache.set(key, dict(payload), ttl=exp - time.time())
+    return payload
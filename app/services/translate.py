@@ -1,32 +1,190 @@
+import asyncio
+import httpx
 import requests
 from typing import Optional
 import os
-from tenacity import retry, stop_after_attempt, wait_fixed
+import time
+from tenacity import (
+    AsyncRetrying,
+    retry,
+    stop_after_attempt,
+    wait_exponential,
+    wait_fixed,
+)
+from app.metrics import record_call, translation_duration
 
-TRANSLATE_URL = "https://deep-translate1.p.rapidapi.com/language/translate/v2"
+TRANSLATE_URL = os.getenv(
+    "TRANSLATE_URL",
+    "https://deep-translate1.p.rapidapi.com/language/translate/v2",
+)
 HEADERS = {
     "x-rapidapi-key": os.getenv("RAPIDAPI_KEY"),
     "x-rapidapi-host": "deep-translate1.p.rapidapi.com",
     "Content-Type": "application/json",
 }
 
+# Async client tuning
+TRANSLATE_TIMEOUT = float(os.getenv("TRANSLATE_TIMEOUT", "5"))
+TRANSLATE_DEADLINE = float(os.getenv("TRANSLATE_DEADLINE", "10"))
+TRANSLATE_MAX_CONNECTIONS = int(os.getenv("TRANSLATE_MAX_CONNECTIONS", "20"))
+TRANSLATE_MAX_ATTEMPTS = 3
+
+# Names of the two clients in per-request stats and profiles
+SYNC_CALL = "TranslationService.translate_text"
+ASYNC_CALL = "AsyncTranslationClient.translate_text"
+
 
 def return_none(retry_state):
     return None
 
 
+def extract_translation(data: dict) -> str:
+    """Pull the translated text out of an upstream response body.
+
+    The provider returns either a single string or a list of strings.
+    """
+    translated = data["data"]["translations"]["translatedText"]
+    if isinstance(translated, list):
+        translated = " ".join(translated)
+    return translated
+
+
+def observe_translation(name: str, client: str, started: float, result,
+                        outcome=None):
+    """Record one translation call, retries included, in the metrics."""
+    if outcome is None:
+        outcome = "failed" if result is None else "ok"
+    elapsed = time.perf_counter() - started
+    translation_duration.observe(elapsed, client=client, outcome=outcome)
+    record_call(name, elapsed)
+
+
+@retry(stop=stop_after_attempt(3),
+       wait=wait_fixed(2),
+       retry_error_callback=return_none
+       )
+def _post_with_retry(payload: dict) -> Optional[str]:
+    response = requests.post(
+        TRANSLATE_URL, json=payload, headers=HEADERS, timeout=5
+    )
+    response.raise_for_status()
+    return response.json()["data"]["translations"]["translatedText"]
+
+
 class TranslationService:
     @staticmethod
-    @retry(stop=stop_after_attempt(3),
-           wait=wait_fixed(2),
-           retry_error_callback=return_none
-           )
     def translate_text(
         text: str, source_lang: str = "ru", target_lang: str = "en"
     ) -> Optional[str]:
         payload = {"q": text, "source": source_lang, "target": target_lang}
-        response = requests.post(
-            TRANSLATE_URL, json=payload, headers=HEADERS, timeout=5
-        )
+        started = time.perf_counter()
+        result = _post_with_retry(payload)
+        observe_translation(SYNC_CALL, "sync", started, result)
+        return result
+
+
+class AsyncTranslationClient:
+    """Non-blocking translation client backed by a shared connection pool.
+
+    One ``httpx.AsyncClient`` is created lazily and reused for every call,
+    so connections to the provider are kept alive between requests.
+    Retries back off with ``asyncio.sleep`` instead of blocking a worker
+    thread, and every call is bounded by an overall deadline.
+
+    Args:
+        url: Translation endpoint
+        headers: Headers sent with every request
+        timeout: Per-attempt network timeout in seconds
+        deadline: Default upper bound for one call, retries included
+        max_connections: Size of the shared connection pool
+        max_attempts: Attempts per call before giving up
+        backoff: Multiplier for the exponential backoff between attempts
+        transport: Optional httpx transport (used by tests)
+    """
+
+    def __init__(
+        self,
+        url: str = TRANSLATE_URL,
+        headers: Optional[dict] = None,
+        timeout: float = TRANSLATE_TIMEOUT,
+        deadline: float = TRANSLATE_DEADLINE,
+        max_connections: int = TRANSLATE_MAX_CONNECTIONS,
+        max_attempts: int = TRANSLATE_MAX_ATTEMPTS,
+        backoff: float = 0.5,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.url = url
+        self.headers = HEADERS if headers is None else headers
+        self.timeout = timeout
+        self.deadline = deadline
+        self.max_connections = max_connections
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                headers={k: v for k, v in self.headers.items() if v},
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+                transport=self._transport,
+            )
+        return self._client
+
+    async def aclose(self):
+        """Close the shared pool; the next call opens a fresh one."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _post(self, payload: dict) -> str:
+        response = await self._get_client().post(self.url, json=payload)
         response.raise_for_status()
-        return response.json()["data"]["translations"]["translatedText"]
+        return extract_translation(response.json())
+
+    async def translate_text(
+        self,
+        text: str,
+        source_lang: str = "ru",
+        target_lang: str = "en",
+        deadline: Optional[float] = None,
+    ) -> Optional[str]:
+        """Translate text without blocking the event loop.
+
+        Args:
+            text: Text to translate
+            source_lang: Source language code
+            target_lang: Target language code
+            deadline: Seconds allowed for the call, retries included
+
+        Returns:
+            Optional[str]: Translated text, or None if every attempt
+            failed or the deadline expired
+        """
+        payload = {"q": text, "source": source_lang, "target": target_lang}
+        retrying = AsyncRetrying(
+            stop=stop_after_attempt(self.max_attempts),
+            wait=wait_exponential(multiplier=self.backoff, max=4),
+            retry_error_callback=return_none,
+        )
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(
+                retrying(self._post, payload),
+                timeout=deadline or self.deadline,
+            )
+        except asyncio.TimeoutError:
+            observe_translation(ASYNC_CALL, "async", started, None,
+                                "timeout")
+            return None
+        observe_translation(ASYNC_CALL, "async", started, result)
+        return result
+
+
+# Shared client; closed on application shutdown
+translation_client = AsyncTranslationClient()
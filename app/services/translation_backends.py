@@ -0,0 +1,366 @@
+"""Interchangeable translation backends and the resilience around them.
+
+A backend is any object with the ``translate_text`` coroutine of
+``AsyncTranslationClient`` (returning None on failure) and ``aclose``.
+``TRANSLATION_BACKEND`` selects one:
+
+- ``http``: the translation provider at ``TRANSLATE_URL`` (default)
+- ``fake``: answers ``[<target>] <text>`` in-process, for tests and
+  development without network access
+- ``stub``: the HTTP client against a local stub server started in this
+  process, which answers like the provider after
+  ``TRANSLATION_STUB_LATENCY_MS``; benchmarks the real client and pool
+  without calling the provider
+
+Every backend sits behind a ``CircuitBreaker``: once the failure ratio
+of recent calls crosses a threshold, calls fail immediately instead of
+spending the client's timeouts and retries, and after a cool-down a
+single probe call decides whether to close the circuit again. With
+``TRANSLATION_HEDGE_BACKEND`` set, a call the primary has not answered
+within ``TRANSLATION_HEDGE_DELAY`` seconds, or has failed, is also sent
+to that backend and the first translation wins.
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from app.services.translate import AsyncTranslationClient, translation_client
+
+TRANSLATION_BACKEND = os.getenv("TRANSLATION_BACKEND", "http")
+TRANSLATION_HEDGE_BACKEND = os.getenv("TRANSLATION_HEDGE_BACKEND", "")
+TRANSLATION_HEDGE_DELAY = float(os.getenv("TRANSLATION_HEDGE_DELAY", "0.5"))
+TRANSLATION_STUB_LATENCY_MS = float(
+    os.getenv("TRANSLATION_STUB_LATENCY_MS", "50")
+)
+# Failure ratio that opens the circuit; 0 disables the breaker
+BREAKER_THRESHOLD = float(os.getenv("TRANSLATION_BREAKER_THRESHOLD", "0.5"))
+BREAKER_MIN_CALLS = int(os.getenv("TRANSLATION_BREAKER_MIN_CALLS", "10"))
+BREAKER_WINDOW = float(os.getenv("TRANSLATION_BREAKER_WINDOW", "30"))
+BREAKER_RESET_TIMEOUT = float(os.getenv("TRANSLATION_BREAKER_RESET", "15"))
+
+
+class FakeTranslationBackend:
+    """In-process backend answering ``[<target>] <text>``.
+
+    Args:
+        latency: Seconds to wait before answering
+        fail: Return None instead of a translation
+    """
+
+    def __init__(self, latency: float = 0.0, fail: bool = False):
+        self.latency = latency
+        self.fail = fail
+        self.calls = 0
+
+    async def translate_text(
+        self,
+        text: str,
+        source_lang: str = "ru",
+        target_lang: str = "en",
+        deadline: Optional[float] = None,
+    ) -> Optional[str]:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return None if self.fail else f"[{target_lang}] {text}"
+
+    async def aclose(self):
+        pass
+
+
+class StubTranslationHandler(BaseHTTPRequestHandler):
+    """Answers like the translation provider after a fixed delay."""
+
+    latency = 0.0
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        time.sleep(self.latency)
+        payload = json.dumps({"data": {"translations": {
+            "translatedText": f"[{body['target']}] {body['q']}"
+        }}}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(latency_ms: float = TRANSLATION_STUB_LATENCY_MS,
+                      host: str = "127.0.0.1",
+                      port: int = 0) -> ThreadingHTTPServer:
+    """Serve the stub provider from a daemon thread.
+
+    Returns:
+        ThreadingHTTPServer: The running server; its URL is
+        ``http://<host>:<server_port>/``
+    """
+    handler = type("StubHandler", (StubTranslationHandler,),
+                   {"latency": latency_ms / 1000})
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class StubTranslationBackend(AsyncTranslationClient):
+    """HTTP client talking to a stub server it starts on first use."""
+
+    def __init__(self, latency_ms: float = TRANSLATION_STUB_LATENCY_MS,
+                 **kwargs):
+        super().__init__(headers={}, **kwargs)
+        self.latency_ms = latency_ms
+        self.server: Optional[ThreadingHTTPServer] = None
+
+    def _get_client(self):
+        if self.server is None:
+            self.server = start_stub_server(self.latency_ms)
+            self.url = f"http://127.0.0.1:{self.server.server_port}/"
+        return super()._get_client()
+
+    async def aclose(self):
+        await super().aclose()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+class CircuitBreaker:
+    """Failure-ratio circuit breaker with a timed half-open probe.
+
+    Closed, it counts the outcomes of the calls that finished within the
+    last ``window`` seconds and opens once at least ``min_calls`` of them
+    were seen and the failed share reaches ``threshold``. Open, every
+    call is rejected until ``reset_timeout`` has passed; then one probe
+    call is let through (half-open), and its outcome closes or re-opens
+    the circuit.
+
+    Args:
+        threshold: Failure ratio that opens the circuit; 0 never opens
+        min_calls: Calls in the window needed before it may open
+        window: Length of the rolling window in seconds
+        reset_timeout: Seconds an open circuit waits before a probe
+        clock: Monotonic time source (replaced in tests)
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        threshold: float = BREAKER_THRESHOLD,
+        min_calls: int = BREAKER_MIN_CALLS,
+        window: float = BREAKER_WINDOW,
+        reset_timeout: float = BREAKER_RESET_TIMEOUT,
+        clock=time.monotonic,
+    ):
+        self.threshold = threshold
+        self.min_calls = min_calls
+        self.window = window
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = self.CLOSED
+        self._outcomes: deque = deque()
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        """Whether a call may go out now; counts rejections."""
+        with self._lock:
+            if self.state == self.OPEN:
+                if self.clock() - self._opened_at < self.reset_timeout:
+                    self.rejected += 1
+                    return False
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN:
+                if self._probing:
+                    self.rejected += 1
+                    return False
+                self._probing = True
+            return True
+
+    def record(self, ok: bool):
+        """Record the outcome of an allowed call."""
+        with self._lock:
+            now = self.clock()
+            if self.state == self.HALF_OPEN:
+                self._probing = False
+                if ok:
+                    self.state = self.CLOSED
+                    self._outcomes.clear()
+                else:
+                    self._open(now)
+                return
+            if self.state == self.OPEN or not self.threshold:
+                return
+            self._outcomes.append((now, ok))
+            while self._outcomes and self._outcomes[0][0] <= now - self.window:
+                self._outcomes.popleft()
+            failures = sum(1 for _, passed in self._outcomes if not passed)
+            if (len(self._outcomes) >= self.min_calls
+                    and failures / len(self._outcomes) >= self.threshold):
+                self._open(now)
+
+    def release(self):
+        """Forget an allowed call that was cancelled before finishing."""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probing = False
+
+    def _open(self, now: float):
+        self.state = self.OPEN
+        self._opened_at = now
+        self._outcomes.clear()
+        self.opened += 1
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
+
+
+class BreakerBackend:
+    """Backend wrapper that fails fast while its circuit is open."""
+
+    def __init__(self, name: str, backend, breaker: CircuitBreaker):
+        self.name = name
+        self.backend = backend
+        self.breaker = breaker
+
+    async def translate_text(
+        self,
+        text: str,
+        source_lang: str = "ru",
+        target_lang: str = "en",
+        deadline: Optional[float] = None,
+    ) -> Optional[str]:
+        if not self.breaker.allow():
+            return None
+        try:
+            result = await self.backend.translate_text(
+                text, source_lang, target_lang, deadline=deadline
+            )
+        except BaseException:
+            self.breaker.release()
+            raise
+        self.breaker.record(bool(result))
+        return result
+
+    async def aclose(self):
+        await self.backend.aclose()
+
+    def breakers(self) -> dict:
+        return {self.name: self.breaker}
+
+
+class HedgedBackend:
+    """Races a second backend against a slow or failed primary.
+
+    The secondary is only called when the primary has not answered
+    within ``delay`` seconds or answered without a translation, so in
+    the common case each text is translated once. The losing call is
+    cancelled.
+
+    Args:
+        primary: Backend asked first
+        secondary: Backend asked when the primary is slow or failed
+        delay: Seconds to wait for the primary before hedging
+    """
+
+    def __init__(self, primary, secondary,
+                 delay: float = TRANSLATION_HEDGE_DELAY):
+        self.primary = primary
+        self.secondary = secondary
+        self.delay = delay
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    async def translate_text(
+        self,
+        text: str,
+        source_lang: str = "ru",
+        target_lang: str = "en",
+        deadline: Optional[float] = None,
+    ) -> Optional[str]:
+        args = (text, source_lang, target_lang)
+        primary = asyncio.ensure_future(
+            self.primary.translate_text(*args, deadline=deadline)
+        )
+        pending = {primary}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=self.delay)
+            if done and primary.result():
+                return primary.result()
+            self.hedged += 1
+            pending.add(asyncio.ensure_future(
+                self.secondary.translate_text(*args, deadline=deadline)
+            ))
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.result():
+                        if task is not primary:
+                            self.hedge_wins += 1
+                        return task.result()
+            return None
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def aclose(self):
+        await self.primary.aclose()
+        await self.secondary.aclose()
+
+    def breakers(self) -> dict:
+        return {**self.primary.breakers(), **self.secondary.breakers()}
+
+
+def build_backend(name: str):
+    """Create the backend called ``name``, without a circuit breaker.
+
+    Raises:
+        ValueError: For an unknown backend name
+    """
+    if name == "http":
+        return translation_client
+    if name == "fake":
+        return FakeTranslationBackend()
+    if name == "stub":
+        return StubTranslationBackend()
+    raise ValueError(f"Unknown translation backend: {name!r}")
+
+
+def create_translation_backend(
+    name: str = TRANSLATION_BACKEND,
+    hedge: str = TRANSLATION_HEDGE_BACKEND,
+    hedge_delay: float = TRANSLATION_HEDGE_DELAY,
+):
+    """Backend ``name`` behind its breaker, hedged with ``hedge`` if set."""
+    backend = BreakerBackend(name, build_backend(name), CircuitBreaker())
+    if not hedge:
+        return backend
+    return HedgedBackend(
+        backend,
+        BreakerBackend(hedge, build_backend(hedge), CircuitBreaker()),
+        delay=hedge_delay,
+    )
+
+
+# Shared backend; closed on application shutdown
+translation_backend = create_translation_backend()
@@ -0,0 +1,188 @@
+import hashlib
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy.dialects import sqlite
+from starlette.concurrency import run_in_threadpool
+from app.database.database import SessionLocal
+from app.database.models import TranslationCacheEntry
+from app.services.cache import TTLCache
+from app.services.translation_backends import translation_backend
+
+TRANSLATION_CACHE_SIZE = int(os.getenv("TRANSLATION_CACHE_SIZE", "1024"))
+TRANSLATION_CACHE_TTL = float(os.getenv("TRANSLATION_CACHE_TTL", "3600"))
+TRANSLATION_CACHE_PERSIST = os.getenv("TRANSLATION_CACHE_PERSIST", "0") == "1"
+# Lifetime of persisted entries in seconds; 0 keeps them forever
+TRANSLATION_CACHE_DB_TTL = float(os.getenv("TRANSLATION_CACHE_DB_TTL", "0"))
+
+logger = logging.getLogger(__name__)
+
+
+def translation_key(text: str, source_lang: str, target_lang: str) -> str:
+    """Content address of a translation request."""
+    digest = hashlib.sha256()
+    for part in (source_lang, target_lang, text):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class TranslationCache:
+    """Two-tier cache of translations keyed by content hash.
+
+    The first tier is an in-process LRU with TTL; the optional second tier
+    is the ``translation_cache`` table, which survives restarts and is
+    shared between workers. Persistent hits are promoted to memory.
+    Database errors are logged and treated as misses, so the cache never
+    fails a translation.
+
+    Args:
+        maxsize: Maximum number of in-memory entries
+        ttl: Lifetime of in-memory entries in seconds
+        persistent: Whether to read and write the database tier
+        db_ttl: Lifetime of persisted entries in seconds (0 = forever)
+        session_factory: Factory for database sessions
+    """
+
+    def __init__(
+        self,
+        maxsize: int = TRANSLATION_CACHE_SIZE,
+        ttl: float = TRANSLATION_CACHE_TTL,
+        persistent: bool = TRANSLATION_CACHE_PERSIST,
+        db_ttl: float = TRANSLATION_CACHE_DB_TTL,
+        session_factory=SessionLocal,
+    ):
+        self.memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.persistent = persistent
+        self.db_ttl = db_ttl
+        self.session_factory = session_factory
+        self.persistent_hits = 0
+
+    def _load(self, key: str) -> Optional[str]:
+        # Reads go to the read pool in the production profile
+        db = self.session_factory(info={"writing": False})
+        try:
+            entry = db.get(TranslationCacheEntry, key)
+            if entry is None:
+                return None
+            if self.db_ttl and entry.created_at is not None:
+                age = datetime.utcnow() - entry.created_at
+                if age > timedelta(seconds=self.db_ttl):
+                    return None
+            return entry.translated_text
+        finally:
+            db.close()
+
+    def _store(self, key: str, source_lang: str, target_lang: str,
+               translated_text: str):
+        values = {
+            "key": key,
+            "source_lang": source_lang,
+            "target_lang": target_lang,
+            "translated_text": translated_text,
+            "created_at": datetime.utcnow(),
+        }
+        # An upsert, since workers translating the same text race to
+        # store it
+        statement = sqlite.insert(TranslationCacheEntry).values(values)
+        statement = statement.on_conflict_do_update(
+            index_elements=[TranslationCacheEntry.key],
+            set_={name: statement.excluded[name]
+                  for name in values if name != "key"},
+        )
+        db = self.session_factory()
+        try:
+            db.execute(statement)
+            db.commit()
+        finally:
+            db.close()
+
+    def get(self, text: str, source_lang: str,
+            target_lang: str) -> Optional[str]:
+        """Look a translation up in memory, then in the database."""
+        key = translation_key(text, source_lang, target_lang)
+        cached = self.memory.get(key)
+        if cached is not None or not self.persistent:
+            return cached
+        try:
+            cached = self._load(key)
+        except Exception:
+            logger.exception("Reading the translation cache failed")
+            return None
+        if cached is not None:
+            self.persistent_hits += 1
+            self.memory.set(key, cached)
+        return cached
+
+    def set(self, text: str, source_lang: str, target_lang: str,
+            translated_text: str):
+        """Store a translation in every enabled tier."""
+        key = translation_key(text, source_lang, target_lang)
+        self.memory.set(key, translated_text)
+        if self.persistent:
+            try:
+                self._store(key, source_lang, target_lang, translated_text)
+            except Exception:
+                logger.exception("Storing a translation failed")
+
+    async def aget(self, text: str, source_lang: str,
+                   target_lang: str) -> Optional[str]:
+        if not self.persistent:
+            return self.get(text, source_lang, target_lang)
+        return await run_in_threadpool(
+            self.get, text, source_lang, target_lang
+        )
+
+    async def aset(self, text: str, source_lang: str, target_lang: str,
+                   translated_text: str):
+        if not self.persistent:
+            return self.set(text, source_lang, target_lang, translated_text)
+        await run_in_threadpool(
+            self.set, text, source_lang, target_lang, translated_text
+        )
+
+    def clear(self):
+        """Drop the in-memory tier and reset counters."""
+        self.memory.clear()
+        self.persistent_hits = 0
+
+    def stats(self) -> dict:
+        stats = self.memory.stats()
+        stats["persistent"] = self.persistent
+        stats["persistent_hits"] = self.persistent_hits
+        return stats
+
+
+class CachedTranslator:
+    """Translation backend wrapper that consults a cache first.
+
+    Only successful translations are cached, so upstream failures are
+    retried on the next request. Cache errors are logged by the cache,
+    never raised, so a translation is returned even if storing it fails.
+    """
+
+    def __init__(self, client, cache: TranslationCache):
+        self.client = client
+        self.cache = cache
+
+    async def translate_text(
+        self,
+        text: str,
+        source_lang: str = "ru",
+        target_lang: str = "en",
+        deadline: Optional[float] = None,
+    ) -> Optional[str]:
+        cached = await self.cache.aget(text, source_lang, target_lang)
+        if cached is not None:
+            return cached
+        translated = await self.client.translate_text(
+            text, source_lang, target_lang, deadline=deadline
+        )
+        if translated:
+            await self.cache.aset(text, source_lang, target_lang, translated)
+        return translated
+
+
+translation_cache = TranslationCache()
+translator = CachedTranslator(translation_backend, translation_cache)
@@ -0,0 +1,182 @@
+import asyncio
+import logging
+import os
+import uuid
+from typing import List, Optional
+from starlette.concurrency import run_in_threadpool
+from app.database import crud
+from app.database.database import SessionLocal
+from app.services.translation_cache import translator
+from app.services.translation_pipeline import translate_document
+
+TRANSLATION_JOB_WORKERS = int(os.getenv("TRANSLATION_JOB_WORKERS", "2"))
+TRANSLATION_JOB_QUEUE_SIZE = int(
+    os.getenv("TRANSLATION_JOB_QUEUE_SIZE", "100")
+)
+TRANSLATION_JOB_RETRY_AFTER = int(
+    os.getenv("TRANSLATION_JOB_RETRY_AFTER", "5")
+)
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue cannot accept more work."""
+
+
+class TranslationJobQueue:
+    """In-process worker pool translating notes in the background.
+
+    Jobs are persisted in the ``translation_jobs`` table before they are
+    queued, so their status can be polled from any request and unfinished
+    jobs are picked up again when the application restarts.
+
+    Args:
+        workers: Number of concurrent worker tasks
+        maxsize: Maximum number of queued jobs before submissions fail
+        retry_after: Seconds suggested to clients when the queue is full
+        session_factory: Factory for database sessions
+    """
+
+    def __init__(
+        self,
+        workers: int = TRANSLATION_JOB_WORKERS,
+        maxsize: int = TRANSLATION_JOB_QUEUE_SIZE,
+        retry_after: int = TRANSLATION_JOB_RETRY_AFTER,
+        session_factory=SessionLocal,
+    ):
+        self.workers = workers
+        self.maxsize = maxsize
+        self.retry_after = retry_after
+        self.session_factory = session_factory
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def _run(self, func, *args, **kwargs):
+        db = self.session_factory()
+        try:
+            return func(db, *args, **kwargs)
+        finally:
+            db.close()
+
+    def _recover(self) -> List[str]:
+        db = self.session_factory()
+        try:
+            return [job.id for job in crud.get_unfinished_translation_jobs(db)]
+        finally:
+            db.close()
+
+    async def start(self):
+        """Start the workers and re-queue jobs left over from a restart."""
+        self._queue = asyncio.Queue()
+        for job_id in await run_in_threadpool(self._recover):
+            self._queue.put_nowait(job_id)
+        self._tasks = [
+            asyncio.create_task(self._worker()) for _ in range(self.workers)
+        ]
+
+    async def stop(self):
+        """Cancel the workers; queued jobs stay pending in the database."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    def qsize(self) -> int:
+        """Number of jobs waiting for a worker (0 while stopped)."""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def is_full(self) -> bool:
+        return self._queue is None or self._queue.qsize() >= self.maxsize
+
+    async def submit(
+        self,
+        note_id: int,
+        user_id: int,
+        source_lang: str = "ru",
+        target_lang: str = "en",
+    ):
+        """Persist a new job and queue it for the workers.
+
+        Returns:
+            TranslationJob: The pending job
+
+        Raises:
+            QueueFullError: If the queue is at capacity
+        """
+        if self.is_full():
+            raise QueueFullError()
+        job_id = uuid.uuid4().hex
+        job = await run_in_threadpool(
+            self._run, crud.create_translation_job,
+            job_id, note_id, user_id, source_lang, target_lang,
+        )
+        # The queue may have filled up while the job was being stored
+        if self.is_full():
+            await run_in_threadpool(
+                self._run, crud.delete_translation_job, job_id
+            )
+            raise QueueFullError()
+        self._queue.put_nowait(job_id)
+        return job
+
+    def _load(self, db, job_id: str):
+        job = crud.get_translation_job(db, job_id)
+        if job is None:
+            return None
+        note = crud.get_note_by_id(db, job.note_id)
+        crud.update_translation_job(db, job_id, "running")
+        return (
+            note.content if note else None,
+            job.source_lang,
+            job.target_lang,
+        )
+
+    async def _process(self, job_id: str):
+        loaded = await run_in_threadpool(self._run, self._load, job_id)
+        if loaded is None:
+            return
+        content, source_lang, target_lang = loaded
+        if content is None:
+            await run_in_threadpool(
+                self._run, crud.update_translation_job,
+                job_id, "failed", error="Note resource not found",
+            )
+            return
+        translated_text = await translate_document(
+            content,
+            translator.translate_text,
+            source_lang=source_lang,
+            target_lang=target_lang,
+        )
+        if translated_text:
+            await run_in_threadpool(
+                self._run, crud.update_translation_job,
+                job_id, "done", result=translated_text,
+            )
+        else:
+            await run_in_threadpool(
+                self._run, crud.update_translation_job,
+                job_id, "failed", error="Translation failed",
+            )
+
+    async def _worker(self):
+        queue = self._queue
+        while True:
+            job_id = await queue.get()
+            try:
+                await self._process(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Translation job %s crashed", job_id)
+                await run_in_threadpool(
+                    self._run, crud.update_translation_job,
+                    job_id, "failed", error="Internal error",
+                )
+            finally:
+                queue.task_done()
+
+
+job_queue = TranslationJobQueue()
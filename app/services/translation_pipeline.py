@@ -0,0 +1,194 @@
+import asyncio
+import os
+import re
+import weakref
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+TRANSLATE_SEGMENT_CHARS = int(os.getenv("TRANSLATE_SEGMENT_CHARS", "2000"))
+TRANSLATE_CONCURRENCY = int(os.getenv("TRANSLATE_CONCURRENCY", "4"))
+# Upstream calls in flight across all multi-target translations
+TRANSLATE_FANOUT_CONCURRENCY = int(
+    os.getenv("TRANSLATE_FANOUT_CONCURRENCY", "8")
+)
+
+# Whitespace after sentence punctuation, or a blank line between paragraphs
+_BOUNDARY = re.compile(r"((?<=[.!?…])\s+|\s*\n\s*\n\s*)")
+_WHITESPACE = re.compile(r"(\s+)")
+
+Translate = Callable[[str, str, str], Awaitable[Optional[str]]]
+
+# asyncio primitives belong to one event loop, so there is one shared
+# limiter per running loop
+_fanout_limiters: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def fanout_limiter() -> asyncio.Semaphore:
+    """The running loop's ``TRANSLATE_FANOUT_CONCURRENCY`` semaphore."""
+    loop = asyncio.get_running_loop()
+    limiter = _fanout_limiters.get(loop)
+    if limiter is None:
+        limiter = asyncio.Semaphore(TRANSLATE_FANOUT_CONCURRENCY)
+        _fanout_limiters[loop] = limiter
+    return limiter
+
+
+def _units(text: str, max_chars: int) -> List[Tuple[str, str]]:
+    """Break text into (piece, separator) pairs no longer than max_chars.
+
+    Pieces are sentences or paragraphs; oversized ones fall back to word
+    boundaries and, for a single huge word, to a hard cut.
+    """
+    parts = _BOUNDARY.split(text)
+    units = []
+    for i in range(0, len(parts), 2):
+        piece = parts[i]
+        sep = parts[i + 1] if i + 1 < len(parts) else ""
+        if len(piece) <= max_chars:
+            units.append((piece, sep))
+            continue
+        words = _WHITESPACE.split(piece)
+        for j in range(0, len(words), 2):
+            word = words[j]
+            word_sep = words[j + 1] if j + 1 < len(words) else sep
+            while len(word) > max_chars:
+                units.append((word[:max_chars], ""))
+                word = word[max_chars:]
+            units.append((word, word_sep))
+    return units
+
+
+def split_segments(
+    text: str, max_chars: int = TRANSLATE_SEGMENT_CHARS
+) -> Tuple[str, List[Tuple[str, str]]]:
+    """Split text into size-bounded segments on natural boundaries.
+
+    Consecutive sentences are packed together until ``max_chars`` would
+    be exceeded, so short notes still go out as a single segment.
+
+    Args:
+        text: Text to split
+        max_chars: Upper bound for the length of one segment
+
+    Returns:
+        Tuple: (leading whitespace, list of (segment, separator) pairs);
+        joining them back together reproduces the original text
+    """
+    body = text.lstrip()
+    prefix = text[:len(text) - len(body)]
+    segments = []
+    current, current_sep = "", ""
+    for piece, sep in _units(body, max_chars):
+        if not piece:
+            current_sep += sep
+            continue
+        if current and len(current) + len(current_sep) + len(piece) \
+                > max_chars:
+            segments.append((current, current_sep))
+            current, current_sep = "", ""
+        current = current + current_sep + piece if current else piece
+        current_sep = sep
+    if current:
+        segments.append((current, current_sep))
+    return prefix, segments
+
+
+async def translate_document(
+    text: str,
+    translate: Translate,
+    source_lang: str = "ru",
+    target_lang: str = "en",
+    max_chars: int = TRANSLATE_SEGMENT_CHARS,
+    max_concurrency: int = TRANSLATE_CONCURRENCY,
+) -> Optional[str]:
+    """Translate a long text segment by segment.
+
+    Duplicate segments are translated once, at most ``max_concurrency``
+    segments are in flight at a time, and the results are reassembled in
+    their original order. Each segment is retried on its own by the
+    translator, so a failure never re-sends the whole document.
+
+    Args:
+        text: Text to translate
+        translate: Coroutine function ``(text, source, target)``
+        source_lang: Source language code
+        target_lang: Target language code
+        max_chars: Upper bound for the length of one segment
+        max_concurrency: Maximum number of concurrent upstream calls
+
+    Returns:
+        Optional[str]: Translated text, or None if any segment failed
+    """
+    prefix, segments = split_segments(text, max_chars)
+    if not segments:
+        return text
+    unique = list(dict.fromkeys(segment for segment, _ in segments))
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(segment: str) -> Optional[str]:
+        async with semaphore:
+            return await translate(segment, source_lang, target_lang)
+
+    results = await asyncio.gather(*(run(segment) for segment in unique))
+    if any(not result for result in results):
+        return None
+    translated = dict(zip(unique, results))
+    return prefix + "".join(
+        translated[segment] + sep for segment, sep in segments
+    )
+
+
+async def translate_many(
+    texts: List[str],
+    target_langs: List[str],
+    translate: Translate,
+    source_lang: str = "ru",
+    limiter: Optional[asyncio.Semaphore] = None,
+) -> Dict[Tuple[str, str], Optional[str]]:
+    """Translate several texts into several languages at once.
+
+    Every distinct (text, target) pair is translated once, and so is
+    every distinct segment across all of them. Upstream calls share
+    ``limiter`` (by default ``fanout_limiter()``), which bounds them
+    across concurrent requests. A failed pair does not affect the others.
+
+    Args:
+        texts: Texts to translate; duplicates are translated once
+        target_langs: Target language codes
+        translate: Coroutine function ``(text, source, target)``
+        source_lang: Source language code
+        limiter: Semaphore bounding the concurrent upstream calls
+
+    Returns:
+        Dict: Translation, or None on failure, per (text, target) pair
+    """
+    limiter = fanout_limiter() if limiter is None else limiter
+    in_flight: Dict[Tuple[str, str, str], asyncio.Future] = {}
+
+    async def limited(segment: str, source: str, target: str):
+        async with limiter:
+            return await translate(segment, source, target)
+
+    def translate_once(segment: str, source: str, target: str):
+        key = (segment, source, target)
+        if key not in in_flight:
+            in_flight[key] = asyncio.ensure_future(
+                limited(segment, source, target)
+            )
+        return in_flight[key]
+
+    pairs = list(dict.fromkeys(
+        (text, target) for text in texts for target in target_langs
+    ))
+    try:
+        results = await asyncio.gather(
+            *(translate_document(text, translate_once, source_lang, target)
+              for text, target in pairs),
+            return_exceptions=True,
+        )
+    finally:
+        for future in in_flight.values():
+            future.cancel()
+    return {
+        pair: None if isinstance(result, BaseException) else result
+        for pair, result in zip(pairs, results)
+    }
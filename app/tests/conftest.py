@@ -4,17 +4,24 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
-from app.database.database import Base, get_db
+from app.database.compression import register_functions
+from app.database.database import Base, get_db, get_read_db
+from app.auth.principals import principal_cache
+from app.database.fts import sync_index
+from app.database.group_commit import group_committer
 from app.main import app
 from app.security.hashing import get_password_hash
+from app.services.translation_backends import FakeTranslationBackend
+from app.services.translation_cache import translation_cache, translator
+from app.services.translation_jobs import job_queue
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
 
-engine = create_engine(
+engine = sync_index(register_functions(create_engine(
     SQLALCHEMY_DATABASE_URL,
     connect_args={"check_same_thread": False},
     poolclass=StaticPool,
-)
+)))
 TestingSessionLocal = sessionmaker(
     autocommit=False,
     autoflush=False,
@@ -43,14 +50,20 @@ def db(db_engine):
 
 
 @pytest.fixture(scope="function")
-def client(db):
+def client(db, monkeypatch):
     def override_get_db():
         try:
             yield db
         finally:
             pass
 
+    def session_factory():
+        return TestingSessionLocal(bind=db.get_bind())
+
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
+    monkeypatch.setattr(job_queue, "session_factory", session_factory)
+    monkeypatch.setattr(group_committer, "session_factory", session_factory)
     with TestClient(app) as test_client:
         yield test_client
     app.dependency_overrides.clear()
@@ -67,3 +80,17 @@ def test_user(db):
     db.commit()
     db.refresh(user)
     return user
+
+
+@pytest.fixture(autouse=True)
+def fake_translation_backend(monkeypatch):
+    backend = FakeTranslationBackend()
+    monkeypatch.setattr(translator, "client", backend)
+    return backend
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    translation_cache.clear()
+    principal_cache.clear()
+    yield
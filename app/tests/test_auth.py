@@ -7,6 +7,8 @@ Comprehensive test suite for authentication endpoints covering:
 """
 
 from fastapi import status
+from app.auth.principals import Principal, principal_cache
+from app.security.hashing import hash_executor, pwd_context
 
 
 # Test successful user signup and token response
@@ -79,3 +81,59 @@ def test_get_current_user_invalid_token(client):
                           headers={"Authorization": "Bearer invalid_token"}
                           )
     assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+# Test repeated requests resolve the user from the principal cache
+def test_get_current_user_uses_principal_cache(client, test_user):
+    login_response = client.post(
+        "/auth/login", json={"username": "testuser", "password": "testpass"}
+    )
+    token = login_response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    client.get("/auth/me", headers=headers)
+    client.get("/auth/me", headers=headers)
+    assert principal_cache.get("testuser") == Principal(
+        id=test_user.id, username="testuser"
+    )
+    assert principal_cache.stats()["hits"] >= 2
+
+
+# Test deleting a user evicts the cached principal
+def test_principal_cache_invalidated_on_delete(client, db, test_user):
+    login_response = client.post(
+        "/auth/login", json={"username": "testuser", "password": "testpass"}
+    )
+    token = login_response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.get("/auth/me", headers=headers).status_code == 200
+    db.delete(test_user)
+    db.commit()
+    response = client.get("/auth/me", headers=headers)
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+# Test login upgrades a hash made with an outdated work factor
+def test_login_rehashes_outdated_work_factor(client, db):
+    from app.database.models import User
+
+    user = User(username="olduser",
+                password_hash=pwd_context.hash("oldpass", rounds=4))
+    db.add(user)
+    db.commit()
+    response = client.post(
+        "/auth/login", json={"username": "olduser", "password": "oldpass"}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    db.refresh(user)
+    assert not pwd_context.needs_update(user.password_hash)
+    assert pwd_context.verify("oldpass", user.password_hash)
+
+
+# Test a saturated hashing executor fails fast with 503 and Retry-After
+def test_login_hashing_busy(client, test_user, monkeypatch):
+    monkeypatch.setattr(hash_executor, "max_pending", 0)
+    response = client.post(
+        "/auth/login", json={"username": "testuser", "password": "testpass"}
+    )
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert "Retry-After" in response.headers
@@ -0,0 +1,172 @@
+"""
+Benchmarks of the request hot paths:
+- Note creation and listing in the CRUD layer at growing table sizes
+- Authentication dependencies
+- Encoding of note listings at several page sizes
+- End-to-end routes through TestClient, with the translation backend
+  stubbed under the cache
+
+Table sizes come from ``BENCHMARK_ROWS`` (default ``1000``); run the full
+matrix with ``BENCHMARK_ROWS=1000,100000,1000000``. Compare a run with
+the committed baseline using ``benchmarks/compare.py``.
+"""
+
+import os
+import pytest
+from fastapi import status
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.auth.dependencies import get_current_principal, get_current_user
+from app.auth.principals import principal_cache
+from app.database import crud
+from app.database.database import Base, apply_pragmas
+from app.routes.responses import FastJSONResponse
+from app.security.tokens import create_access_token
+
+BENCHMARK_ROWS = [
+    int(size) for size in os.getenv("BENCHMARK_ROWS", "1000").split(",")
+]
+# Notes are spread over this many users, so a listing reads one user's
+# share of the table through the (user_id, updated_at, id) index
+BENCHMARK_USERS = 10
+PAGE_SIZES = [10, 100, 1000]
+NOTE_CONTENT = "lorem ipsum dolor sit amet " * 8
+
+
+@pytest.fixture(scope="module", params=BENCHMARK_ROWS,
+                ids=lambda rows: f"{rows}-rows")
+def seeded_session_factory(request, tmp_path_factory):
+    """File-backed database with ``rows`` notes, shared by a module."""
+    path = tmp_path_factory.mktemp("bench") / "notes.db"
+    engine = apply_pragmas(create_engine(f"sqlite:///{path}"))
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+    with factory() as db:
+        for user_id in range(1, BENCHMARK_USERS + 1):
+            crud.add_user(db, f"bench{user_id}", "x")
+        per_user = request.param // BENCHMARK_USERS
+        for user_id in range(1, BENCHMARK_USERS + 1):
+            for start in range(0, per_user, 10000):
+                crud.import_notes(db, user_id, [
+                    {"title": f"Note {i}", "content": NOTE_CONTENT}
+                    for i in range(start, min(start + 10000, per_user))
+                ])
+    yield factory
+    engine.dispose()
+
+
+@pytest.fixture
+def bench_db(seeded_session_factory):
+    with seeded_session_factory() as db:
+        yield db
+
+
+@pytest.fixture
+def auth_headers(client, test_user):
+    response = client.post(
+        "/auth/login", json={"username": "testuser", "password": "testpass"}
+    )
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+# Benchmark creating one note (one INSERT and commit)
+@pytest.mark.benchmark(group="crud")
+def test_benchmark_create_note(benchmark, bench_db):
+    note = benchmark(crud.create_note, bench_db, "Title", NOTE_CONTENT, 1)
+    assert note.id is not None
+
+
+# Benchmark the first page of a user's notes as ORM objects
+@pytest.mark.benchmark(group="crud")
+def test_benchmark_get_user_notes(benchmark, bench_db):
+    notes = benchmark(crud.get_user_notes, bench_db, 1, limit=100)
+    assert len(notes) == 100
+
+
+# Benchmark resolving the user on every request (no cache)
+@pytest.mark.benchmark(group="auth-dependency")
+def test_benchmark_get_current_user(benchmark, db, test_user):
+    token = create_access_token({"sub": test_user.username})
+    user = benchmark(get_current_user, token=token, db=db)
+    assert user.id == test_user.id
+
+
+# Benchmark resolving the principal through the principal cache
+@pytest.mark.benchmark(group="auth-dependency")
+def test_benchmark_get_current_principal_cached(benchmark, db, test_user):
+    token = create_access_token({"sub": test_user.username})
+    principal = benchmark(get_current_principal, token=token, db=db)
+    assert principal.id == test_user.id
+
+
+# Benchmark a principal cache miss, which reads the users table
+@pytest.mark.benchmark(group="auth-dependency")
+def test_benchmark_get_current_principal_uncached(benchmark, db, test_user):
+    token = create_access_token({"sub": test_user.username})
+    principal = benchmark.pedantic(
+        get_current_principal, kwargs={"token": token, "db": db},
+        setup=principal_cache.clear, rounds=200,
+    )
+    assert principal.id == test_user.id
+
+
+# Benchmark encoding a listing page as the list route does
+@pytest.mark.benchmark(group="list-serialization")
+@pytest.mark.parametrize("page_size", PAGE_SIZES)
+def test_benchmark_list_serialization(benchmark, db, test_user, page_size):
+    crud.import_notes(db, test_user.id, [
+        {"title": f"Note {i}", "content": NOTE_CONTENT}
+        for i in range(page_size)
+    ])
+    rows = crud.get_user_note_rows(db, test_user.id, limit=page_size)
+    response = benchmark(FastJSONResponse, rows)
+    assert response.body.startswith(b"[{")
+
+
+# Benchmark GET /api/notes/ end to end
+@pytest.mark.benchmark(group="routes")
+@pytest.mark.parametrize("page_size", PAGE_SIZES)
+def test_benchmark_route_list_notes(benchmark, client, db, test_user,
+                                    auth_headers, page_size):
+    crud.import_notes(db, test_user.id, [
+        {"title": f"Note {i}", "content": NOTE_CONTENT}
+        for i in range(page_size)
+    ])
+    response = benchmark(client.get, f"/api/notes/?limit={page_size}",
+                         headers=auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.json()) == page_size
+
+
+# Benchmark GET /api/notes/{note_id} end to end
+@pytest.mark.benchmark(group="routes")
+def test_benchmark_route_get_note(benchmark, client, db, test_user,
+                                  auth_headers):
+    note = crud.create_note(db, "Title", NOTE_CONTENT, test_user.id)
+    response = benchmark(client.get, f"/api/notes/{note.id}",
+                         headers=auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+
+
+# Benchmark POST /api/notes/ end to end
+@pytest.mark.benchmark(group="routes")
+def test_benchmark_route_create_note(benchmark, client, auth_headers):
+    response = benchmark(client.post, "/api/notes/",
+                         json={"title": "Title", "content": NOTE_CONTENT},
+                         headers=auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+
+
+# Benchmark POST /api/notes/{note_id}/translate with a stubbed backend
+# under the translation cache; after the first round every call is a
+# cache hit
+@pytest.mark.benchmark(group="routes")
+def test_benchmark_route_translate_note(benchmark, client, db, test_user,
+                                        auth_headers,
+                                        fake_translation_backend):
+    note = crud.create_note(db, "Title", NOTE_CONTENT, test_user.id)
+    response = benchmark(client.post, f"/api/notes/{note.id}/translate",
+                         headers=auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["translated_text"].startswith("[en]")
+    assert fake_translation_backend.calls == 1
@@ -0,0 +1,347 @@
+"""
+Tests for the database layer:
+- Pragmas applied to writer and read-only connections
+- Read/write routing of sessions between the two pools
+- Group commit of concurrent writes
+- Compressed note bodies and their search index
+"""
+
+import sqlite3
+import pytest
+from sqlalchemy import create_engine, insert, inspect, select, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+from app.database import compression, crud, database
+from app.database.database import Base, RoutingSession, apply_pragmas
+from app.database.fts import drop_fts, ensure_fts, search_notes, sync_index
+from app.database.group_commit import GroupCommitter
+from app.database.models import Note, User
+
+
+@pytest.fixture
+def production_engines(tmp_path, monkeypatch):
+    url = f"sqlite:///{tmp_path / 'profile.db'}"
+    monkeypatch.setattr(database, "DB_JOURNAL_MODE", "WAL")
+    monkeypatch.setattr(database, "DB_SYNCHRONOUS", "NORMAL")
+    monkeypatch.setattr(database, "DB_CACHE_SIZE_KB", "2048")
+    monkeypatch.setattr(database, "DB_MMAP_SIZE", str(2**20))
+    writer = apply_pragmas(create_engine(url, pool_size=1, max_overflow=0))
+    reader = apply_pragmas(create_engine(url), read_only=True)
+    Base.metadata.create_all(bind=writer)
+    monkeypatch.setattr(database, "engine", writer)
+    monkeypatch.setattr(database, "read_engine", reader)
+    yield writer, reader
+    writer.dispose()
+    reader.dispose()
+
+
+# Test the writer switches the file to WAL and applies the tuning pragmas
+def test_writer_pragmas(production_engines):
+    writer, reader = production_engines
+    with writer.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert conn.exec_driver_sql("PRAGMA synchronous").scalar() == 1
+        assert conn.exec_driver_sql("PRAGMA cache_size").scalar() == -2048
+        assert conn.exec_driver_sql("PRAGMA mmap_size").scalar() == 2**20
+    with reader.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+
+
+# Test read-only connections reject writes
+def test_reader_is_read_only(production_engines):
+    _, reader = production_engines
+    with reader.connect() as conn:
+        with pytest.raises(OperationalError):
+            conn.execute(text(
+                "INSERT INTO users (username, password_hash) "
+                "VALUES ('x', 'y')"
+            ))
+
+
+# Test sessions stay on the pool chosen when they were opened
+def test_routing_session(production_engines):
+    writer, reader = production_engines
+    with RoutingSession(info={"writing": False}) as db:
+        assert db.get_bind(clause=select(User)) is reader
+        with pytest.raises(OperationalError):
+            db.execute(insert(User).values(username="x", password_hash="x"))
+    with RoutingSession(info={"writing": True}) as db:
+        assert db.get_bind(clause=select(User)) is writer
+    # Sessions opened outside the dependencies default to the writer
+    with RoutingSession() as db:
+        assert db.get_bind(clause=select(User)) is writer
+
+
+# Test a text() write before an ORM write both reach the writer
+def test_routing_session_text_write(production_engines):
+    with RoutingSession(info={"writing": True}) as db:
+        db.execute(text(
+            "INSERT INTO users (username, password_hash) VALUES ('alice', 'x')"
+        ))
+        db.add(User(username="bob", password_hash="x"))
+        db.commit()
+    with RoutingSession(info={"writing": False}) as db:
+        assert db.scalars(
+            select(User.username).order_by(User.username)
+        ).all() == ["alice", "bob"]
+
+
+@pytest.fixture
+def group_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'group.db'}",
+                           connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User).values(id=1, username="u",
+                                         password_hash="x"))
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def committer(group_engine):
+    committer = GroupCommitter(enabled=True, window=0.05, max_batch=64,
+                               session_factory=sessionmaker(bind=group_engine))
+    yield committer
+    committer.stop()
+
+
+# Test concurrent writes share one transaction and get their own rows
+def test_group_commit_batches_writes(committer):
+    futures = [
+        committer.submit(crud.add_note, f"Note {i}", "Content", 1)
+        for i in range(10)
+    ]
+    notes = [future.result(timeout=5) for future in futures]
+    assert len({note.id for note in notes}) == 10
+    assert [note.title for note in notes] == [f"Note {i}" for i in range(10)]
+    assert all(note.created_at is not None for note in notes)
+    stats = committer.stats()
+    assert stats["batches"] == 1
+    assert stats["writes"] == 10
+    assert stats["batch_size_histogram"]["16"] == 1
+
+
+# Test a failing write is rolled back alone
+def test_group_commit_isolates_failures(committer, group_engine):
+    def fail(db):
+        crud.add_note(db, "Doomed", "Content", 1)
+        raise ValueError("boom")
+
+    first = committer.submit(crud.add_note, "First", "Content", 1)
+    failed = committer.submit(fail)
+    last = committer.submit(crud.add_note, "Last", "Content", 1)
+    assert first.result(timeout=5).title == "First"
+    assert last.result(timeout=5).title == "Last"
+    with pytest.raises(ValueError):
+        failed.result(timeout=5)
+    with group_engine.connect() as conn:
+        titles = conn.execute(select(Note.title).order_by(Note.id)).scalars()
+        assert list(titles) == ["First", "Last"]
+
+
+@pytest.fixture
+def notes_engine(tmp_path):
+    engine = sync_index(compression.register_functions(
+        create_engine(f"sqlite:///{tmp_path / 'notes.db'}")
+    ))
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User).values(id=1, username="u",
+                                         password_hash="x"))
+    yield engine
+    engine.dispose()
+
+
+def _assert_index_matches_notes(engine):
+    """Compare every posting with an index built from the inflated text."""
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "CREATE VIRTUAL TABLE reference USING fts5(title, content, "
+            "user_id, tokenize='unicode61 remove_diacritics 2')"
+        )
+        rows = conn.exec_driver_sql(
+            "SELECT id, title, content, user_id FROM notes"
+        ).all()
+        if rows:
+            conn.exec_driver_sql(
+                "INSERT INTO reference(rowid, title, content, user_id) "
+                "VALUES (?, ?, ?, ?)",
+                [(note_id, title, compression.decompress_content(content),
+                  user_id) for note_id, title, content, user_id in rows],
+            )
+        postings = {}
+        for table in ("notes_fts", "reference"):
+            conn.exec_driver_sql(
+                f"CREATE VIRTUAL TABLE {table}_terms "
+                f"USING fts5vocab({table}, 'instance')"
+            )
+            postings[table] = set(conn.exec_driver_sql(
+                f"SELECT term, doc, col, offset FROM {table}_terms"
+            ).all())
+            conn.exec_driver_sql(f"DROP TABLE {table}_terms")
+        conn.exec_driver_sql("DROP TABLE reference")
+        # Internal consistency only: the stored bodies are compressed
+        conn.exec_driver_sql(
+            "INSERT INTO notes_fts(notes_fts, rank) "
+            "VALUES ('integrity-check', 0)"
+        )
+    assert postings["notes_fts"] == postings["reference"]
+
+
+def _stored(engine, note_id):
+    with engine.connect() as conn:
+        return conn.exec_driver_sql(
+            "SELECT content FROM notes WHERE id = ?", (note_id,)
+        ).scalar()
+
+
+# Test large bodies are stored compressed and read back transparently
+def test_compressed_content_round_trip(notes_engine):
+    large = "Compressible words repeat. " * 200
+    with sessionmaker(bind=notes_engine)() as db:
+        big = crud.create_note(db, "Big", large, 1)
+        small = crud.create_note(db, "Small", "short", 1)
+        assert big.content == large
+
+    assert compression.is_compressed(_stored(notes_engine, big.id))
+    assert _stored(notes_engine, small.id) == "short"
+    # Stored level 0 output only grows, so the text is kept as is
+    assert compression.compress_content(large, level=0) == large
+
+    with sessionmaker(bind=notes_engine)() as db:
+        assert crud.get_note_by_id(db, big.id).content == large
+        row = crud.get_user_note_rows(
+            db, 1, columns=crud.note_list_columns(crud.NOTE_SUMMARY_FIELDS)
+        )[0]
+        assert row["content_length"] == len(large)
+        assert row["snippet"] == large[:crud.NOTE_SNIPPET_LENGTH]
+        results = search_notes(db, 1, "repeat")
+        assert [r["id"] for r in results] == [big.id]
+        assert "<mark>repeat</mark>" in results[0]["snippet"]
+
+
+# Test compressed bodies are re-indexed when their text changes, and
+# clients without the application's SQL functions can still write notes
+def test_search_index_without_app_functions(notes_engine):
+    with sessionmaker(bind=notes_engine)() as db:
+        note_id = crud.create_note(db, "Big", "Original wording. " * 100,
+                                   1).id
+        crud.update_note(db, note_id, 1, content="Revised phrasing. " * 100)
+        assert [r["id"] for r in search_notes(db, 1, "revised")] == [note_id]
+        assert search_notes(db, 1, "original") == []
+        crud.update_note(db, note_id, 1, title="Retitled")
+        shrunk = crud.create_note(db, "Shrinks", "Long body. " * 200, 1)
+        crud.update_note(db, shrunk.id, 1, content="short body")
+        doomed = crud.create_note(db, "Doomed", "Deleted body. " * 200, 1)
+        crud.delete_note(db, doomed.id, 1)
+    _assert_index_matches_notes(notes_engine)
+
+    path = notes_engine.url.database
+    with sqlite3.connect(path) as conn:
+        conn.execute("INSERT INTO notes (user_id, title, content) "
+                     "VALUES (1, 'Shell', 'typed in the shell')")
+        conn.execute("UPDATE notes SET title = 'Renamed' WHERE id = ?",
+                     (note_id,))
+    with sqlite3.connect(path) as conn:
+        conn.execute("DELETE FROM notes WHERE title = 'Renamed'")
+    with sessionmaker(bind=notes_engine)() as db:
+        assert len(search_notes(db, 1, "shell")) == 1
+    # The deleted compressed body left its values for the application
+    ensure_fts(notes_engine)
+    _assert_index_matches_notes(notes_engine)
+    with sessionmaker(bind=notes_engine)() as db:
+        assert search_notes(db, 1, "revised") == []
+
+
+# Test loading notes leaves compressed bodies alone until they are read
+def test_note_content_is_deferred(notes_engine):
+    body = "Deferred body. " * 200
+    with sessionmaker(bind=notes_engine)() as db:
+        created = crud.create_note(db, "Big", body, 1)
+        assert created.content == body
+    with sessionmaker(bind=notes_engine)() as db:
+        note = db.scalars(select(Note)).one()
+        assert "content" in inspect(note).unloaded
+        assert note.content == body
+
+
+# Test the recompression command rewrites legacy rows without touching
+# versions, and re-indexes them so search still finds them
+def test_recompress_legacy_rows(notes_engine):
+    body = "Legacy body stored as plain text. " * 100
+    with notes_engine.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO notes (user_id, title, content) VALUES (?, ?, ?)",
+            [(1, f"Legacy {i}", body) for i in range(5)]
+            + [(1, "Tiny", "tiny")],
+        )
+        before = conn.exec_driver_sql(
+            "SELECT id, updated_at FROM notes ORDER BY id"
+        ).all()
+    with sessionmaker(bind=notes_engine)() as db:
+        version = crud.get_user_notes_version(db, 1)
+
+    stats = compression.recompress(notes_engine, batch_size=2)
+    assert stats["scanned"] == 6
+    assert stats["rewritten"] == 5
+    assert stats["bytes_after"] < stats["bytes_before"] / 5
+    assert compression.recompress(notes_engine)["rewritten"] == 0
+
+    with notes_engine.begin() as conn:
+        after = conn.exec_driver_sql(
+            "SELECT id, updated_at FROM notes ORDER BY id"
+        ).all()
+    assert after == before
+    with sessionmaker(bind=notes_engine)() as db:
+        assert crud.get_user_notes_version(db, 1) == version
+    _assert_index_matches_notes(notes_engine)
+    assert compression.storage_stats(notes_engine)["compressed"] == 5
+    with sessionmaker(bind=notes_engine)() as db:
+        assert crud.get_note_by_id(db, before[0].id).content == body
+        assert len(search_notes(db, 1, "legacy")) == 5
+
+
+# Test every write to notes moves the owners' list versions, including
+# writes from other clients and on databases that predate the counters
+def test_user_notes_version(notes_engine):
+    with notes_engine.begin() as conn:
+        conn.exec_driver_sql("DROP TABLE note_list_versions")
+        for trigger in ("ai", "ad", "au"):
+            conn.exec_driver_sql(f"DROP TRIGGER notes_version_{trigger}")
+        conn.exec_driver_sql("INSERT INTO notes (user_id, title, content) "
+                             "VALUES (1, 'Old', 'x')")
+    Base.metadata.create_all(notes_engine)
+
+    def versions():
+        with sessionmaker(bind=notes_engine)() as db:
+            return tuple(crud.get_user_notes_version(db, user_id)
+                         for user_id in (1, 2))
+
+    assert versions() == (0, 0)
+    with sessionmaker(bind=notes_engine)() as db:
+        note_id = crud.create_note(db, "New", "body", 1).id
+        assert versions() == (1, 0)
+        crud.update_note(db, note_id, 1, content="changed")
+        assert versions() == (2, 0)
+    with sqlite3.connect(notes_engine.url.database) as conn:
+        conn.execute("UPDATE notes SET user_id = 2 WHERE id = ?", (note_id,))
+    assert versions() == (3, 1)
+    with sqlite3.connect(notes_engine.url.database) as conn:
+        conn.execute("DELETE FROM notes WHERE user_id = 1")
+    assert versions() == (4, 1)
+
+
+# Test an index of an older schema is dropped and rebuilt
+def test_ensure_fts_upgrades_old_index(notes_engine):
+    with notes_engine.begin() as conn:
+        drop_fts(conn)
+        conn.exec_driver_sql(
+            "CREATE VIRTUAL TABLE notes_fts USING fts5(title, content, "
+            "user_id, content='notes', content_rowid='id')"
+        )
+    with sessionmaker(bind=notes_engine)() as db:
+        crud.create_note(db, "Old", "Indexed after the upgrade " * 50, 1)
+    ensure_fts(notes_engine)
+    with sessionmaker(bind=notes_engine)() as db:
+        assert len(search_notes(db, 1, "upgrade")) == 1
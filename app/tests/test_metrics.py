@@ -0,0 +1,92 @@
+import pytest
+from fastapi import status
+from app.metrics import Histogram, registry
+from app.routes import metrics
+
+
+@pytest.fixture
+def scrape(client, monkeypatch):
+    """Fetch /metrics with the scrape token and return its text."""
+    monkeypatch.setattr(metrics, "METRICS_TOKEN", "scrape-secret")
+    registry.reset()
+
+    def fetch() -> str:
+        response = client.get(
+            "/metrics", headers={"Authorization": "Bearer scrape-secret"}
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"].startswith("text/plain")
+        return response.text
+
+    return fetch
+
+
+def sample(text: str, prefix: str) -> float:
+    """Value of the first sample line starting with ``prefix``."""
+    for line in text.splitlines():
+        if line.startswith(prefix):
+            return float(line.rsplit(" ", 1)[1])
+    raise AssertionError(f"no sample {prefix!r}")
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("demo_seconds", "Demo", ("op",), buckets=(1, 2))
+    for value in (0.5, 1.5, 1.7, 5):
+        histogram.observe(value, op="x")
+    assert histogram.samples() == [
+        'demo_seconds_bucket{op="x",le="1"} 1',
+        'demo_seconds_bucket{op="x",le="2"} 3',
+        'demo_seconds_bucket{op="x",le="+Inf"} 4',
+        'demo_seconds_sum{op="x"} 8.7',
+        'demo_seconds_count{op="x"} 4',
+    ]
+
+
+def test_metrics_record_routes_queries_and_hashing(client, test_user,
+                                                   scrape):
+    response = client.post(
+        "/auth/login", json={"username": "testuser", "password": "testpass"}
+    )
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    client.get("/api/notes/", headers=headers)
+    client.get("/api/notes/999", headers=headers)
+    client.get("/no/such/path")
+
+    text = scrape()
+    assert sample(text, 'http_requests_total{method="GET",'
+                        'route="/api/notes/",status="200"}') == 1
+    # Labelled by the route template, not the requested path
+    assert sample(text, 'http_requests_total{method="GET",'
+                        'route="/api/notes/{note_id}",status="404"}') == 1
+    assert sample(text, 'http_requests_total{method="GET",'
+                        'route="<unmatched>",status="404"}') == 1
+    assert sample(text, 'http_request_duration_seconds_count{method="POST",'
+                        'route="/auth/login"}') == 1
+    assert sample(text, 'http_request_db_queries_sum{method="GET",'
+                        'route="/api/notes/"}') >= 1
+    assert sample(text, "db_queries_total") >= 3
+    assert sample(text, 'password_hash_duration_seconds_count'
+                        '{operation="verify"}') == 1
+    # Only the scrape itself is in flight
+    assert sample(text, "http_requests_in_flight") == 1
+    assert sample(text, 'cache_hits_total{cache="principal"}') >= 0
+    assert "translation_jobs_queued 0" in text
+
+
+def test_metrics_not_served_without_token(client):
+    response = client.get("/metrics")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_metrics_require_scrape_token(client, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_TOKEN", "scrape-secret")
+    assert client.get("/metrics").status_code == (
+        status.HTTP_401_UNAUTHORIZED
+    )
+    response = client.get("/metrics",
+                          headers={"Authorization": "Bearer wrong"})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    # Forwarded addresses do not grant access
+    response = client.get("/metrics",
+                          headers={"X-Forwarded-For": "127.0.0.1"})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
@@ -1,6 +1,13 @@
+import json
+import time
 import pytest
 from fastapi import status
-from app.database.models import Note
+from sqlalchemy import event, text
+from app.database.group_commit import group_committer
+from app.database.models import Note, User
+from app.routes import notes, responses
+from app.services.translation_cache import translator
+from app.services.translation_jobs import job_queue
 
 
 # Fixture to provide auth headers for a logged-in user
@@ -83,6 +90,155 @@ def test_delete_note_success(client, auth_headers, test_note):
     assert response.status_code == status.HTTP_200_OK
 
 
+@pytest.fixture
+def note_statements(db):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if "notes" in statement:
+            statements.append(statement.split()[0])
+
+    engine = db.get_bind().engine
+    event.listen(engine, "before_cursor_execute", record)
+    yield statements
+    event.remove(engine, "before_cursor_execute", record)
+
+
+# Test a create is a single INSERT ... RETURNING without a refresh
+def test_create_note_single_statement(client, auth_headers,
+                                      note_statements):
+    response = client.post("/api/notes/",
+                           json={"title": "New", "content": "Body"},
+                           headers=auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["created_at"] is not None
+    assert note_statements == ["INSERT"]
+
+
+# Test an update is a single ownership-scoped UPDATE ... RETURNING
+def test_update_note_single_statement(client, auth_headers, test_note,
+                                      note_statements):
+    response = client.put(f"/api/notes/{test_note.id}",
+                          json={"title": "Updated"}, headers=auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["content"] == "Test Content"
+    assert note_statements == ["UPDATE"]
+
+
+# Test a delete is a single ownership-scoped DELETE ... RETURNING
+def test_delete_note_single_statement(client, auth_headers, test_note,
+                                      note_statements):
+    response = client.delete(f"/api/notes/{test_note.id}",
+                             headers=auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert note_statements == ["DELETE"]
+
+
+# Test writes to missing or foreign notes still tell 404 from 403
+def test_update_delete_access_errors(client, auth_headers, db):
+    other = User(username="other", password_hash="x")
+    db.add(other)
+    db.commit()
+    foreign = Note(user_id=other.id, title="Theirs", content="Private")
+    db.add(foreign)
+    db.commit()
+
+    for note_id, expected in ((foreign.id, status.HTTP_403_FORBIDDEN),
+                              (9999, status.HTTP_404_NOT_FOUND)):
+        response = client.put(f"/api/notes/{note_id}",
+                              json={"title": "Mine"}, headers=auth_headers)
+        assert response.status_code == expected
+        response = client.delete(f"/api/notes/{note_id}",
+                                 headers=auth_headers)
+        assert response.status_code == expected
+    db.refresh(foreign)
+    assert foreign.title == "Theirs"
+
+
+# Test a matching If-None-Match gets 304 after a version-only lookup
+def test_get_note_not_modified(client, auth_headers, test_note,
+                               note_statements):
+    response = client.get(f"/api/notes/{test_note.id}",
+                          headers=auth_headers)
+    etag = response.headers["ETag"]
+
+    del note_statements[:]
+    response = client.get(f"/api/notes/{test_note.id}",
+                          headers={**auth_headers, "If-None-Match": etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+    assert len(note_statements) == 1
+
+    client.put(f"/api/notes/{test_note.id}", json={"title": "Changed"},
+               headers=auth_headers)
+    response = client.get(f"/api/notes/{test_note.id}",
+                          headers={**auth_headers, "If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["ETag"] != etag
+
+
+# Test If-Match makes PUT and DELETE fail with 412 on a stale version
+def test_note_if_match(client, auth_headers, test_note):
+    url = f"/api/notes/{test_note.id}"
+    etag = client.get(url, headers=auth_headers).headers["ETag"]
+
+    response = client.put(url, json={"title": "First"},
+                          headers={**auth_headers, "If-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    new_etag = response.headers["ETag"]
+    assert new_etag != etag
+
+    response = client.put(url, json={"title": "Lost update"},
+                          headers={**auth_headers, "If-Match": etag})
+    assert response.status_code == status.HTTP_412_PRECONDITION_FAILED
+    response = client.delete(url, headers={**auth_headers, "If-Match": etag})
+    assert response.status_code == status.HTTP_412_PRECONDITION_FAILED
+    assert client.get(url, headers=auth_headers).json()["title"] == "First"
+
+    response = client.delete(url,
+                             headers={**auth_headers, "If-Match": new_etag})
+    assert response.status_code == status.HTTP_200_OK
+
+
+# Test If-Match works for rows stamped by CURRENT_TIMESTAMP (whole seconds)
+def test_note_if_match_legacy_timestamp(client, auth_headers, db,
+                                        test_user):
+    db.execute(text(
+        "INSERT INTO notes (id, user_id, title, content, updated_at) "
+        "VALUES (500, :user_id, 'Old', 'Body', '2024-01-01 10:00:00')"
+    ), {"user_id": test_user.id})
+    db.commit()
+    etag = client.get("/api/notes/500", headers=auth_headers).headers["ETag"]
+    response = client.put("/api/notes/500", json={"title": "New"},
+                          headers={**auth_headers, "If-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+
+
+# Test the list ETag changes on create and delete but not on reads
+def test_list_notes_etag(client, auth_headers, test_note):
+    etag = client.get("/api/notes/", headers=auth_headers).headers["ETag"]
+    response = client.get("/api/notes/",
+                          headers={**auth_headers, "If-None-Match": etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    created = client.post("/api/notes/", json={"title": "B", "content": "C"},
+                          headers=auth_headers).json()
+    response = client.get("/api/notes/",
+                          headers={**auth_headers, "If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    etag = response.headers["ETag"]
+
+    client.delete(f"/api/notes/{test_note.id}", headers=auth_headers)
+    response = client.get("/api/notes/",
+                          headers={**auth_headers, "If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert [n["id"] for n in response.json()] == [created["id"]]
+
+    page = client.get("/api/notes/?cursor=", headers=auth_headers)
+    assert page.headers["ETag"] != response.headers["ETag"]
+
+
 # Test listing notes for a user with valid authentication
 def test_list_notes_success(client, auth_headers, test_note):
     response = client.get("/api/notes/", headers=auth_headers)
@@ -92,6 +248,72 @@ def test_list_notes_success(client, auth_headers, test_note):
     assert data[0]["title"] == "Test Note"
 
 
+# Test the fast list encoding matches the validated single-note response,
+# with and without orjson
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_list_notes_fast_encoding(client, auth_headers, test_note,
+                                  monkeypatch, use_orjson):
+    if not use_orjson:
+        monkeypatch.setattr(responses, "orjson", None)
+    single = client.get(f"/api/notes/{test_note.id}", headers=auth_headers)
+    listed = client.get("/api/notes/", headers=auth_headers)
+    assert listed.headers["content-type"] == "application/json"
+    assert listed.json() == [single.json()]
+    page = client.get("/api/notes/?cursor=", headers=auth_headers).json()
+    assert page == {"items": [single.json()], "next_cursor": None}
+
+
+# Test summary listings return a SQL snippet and length instead of content
+def test_list_notes_summary(client, auth_headers, db, test_user,
+                            test_note):
+    body = "é" * 250
+    db.add(Note(user_id=test_user.id, title="Long", content=body))
+    db.commit()
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = db.get_bind().engine
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        response = client.get("/api/notes/?view=summary&order=asc",
+                              headers=auth_headers)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    assert response.status_code == status.HTTP_200_OK
+    long_note = response.json()[1]
+    assert set(long_note) == {"id", "user_id", "title", "created_at",
+                              "updated_at", "content_length", "snippet"}
+    # UTF-8 bytes
+    assert long_note["content_length"] == 500
+    assert long_note["snippet"] == "é" * 200
+    # content is only read by the SQL functions
+    listing = [sql for sql in statements
+               if "FROM notes" in sql and "LIMIT" in sql][0]
+    assert listing.count("notes.content") == 2
+    assert "note_content_length(notes.content)" in listing
+
+    page = client.get("/api/notes/?view=summary&cursor=&limit=1",
+                      headers=auth_headers).json()
+    assert "content" not in page["items"][0]
+    assert page["next_cursor"] is not None
+
+    response = client.get("/api/notes/?fields=title,content_length",
+                          headers=auth_headers)
+    assert {"id": long_note["id"], "title": "Long",
+            "content_length": 500} in response.json()
+    etags = {client.get(f"/api/notes/{query}",
+                        headers=auth_headers).headers["ETag"]
+             for query in ("", "?view=summary", "?fields=title")}
+    assert len(etags) == 3
+
+    response = client.get("/api/notes/?fields=title,secret",
+                          headers=auth_headers)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
 # Test translating a note with valid authentication
 def test_translate_note_success(client, auth_headers, test_note):
     response = client.post(
@@ -102,3 +324,309 @@ def test_translate_note_success(client, auth_headers, test_note):
     assert response.status_code == status.HTTP_200_OK
     data = response.json()
     assert "translated_text" in data
+
+
+# Test background translation returns a job that can be polled
+def test_translate_note_background(client, auth_headers, test_note,
+                                   monkeypatch):
+    async def fake_translate(text, source_lang="ru", target_lang="en",
+                             deadline=None):
+        return f"[{target_lang}] {text}"
+
+    monkeypatch.setattr(translator, "translate_text", fake_translate)
+    response = client.post(
+        f"/api/notes/{test_note.id}/translate?background=true",
+        headers=auth_headers,
+    )
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    job_id = response.json()["job_id"]
+
+    for _ in range(50):
+        job = client.get(
+            f"/api/translation/jobs/{job_id}", headers=auth_headers
+        ).json()
+        if job["status"] not in ("pending", "running"):
+            break
+        time.sleep(0.05)
+    assert job["status"] == "done"
+    assert job["translated_text"] == "[en] Test Content"
+
+
+# Test a full translation queue answers with 429 and Retry-After
+def test_translate_note_background_queue_full(client, auth_headers,
+                                              test_note, monkeypatch):
+    monkeypatch.setattr(job_queue, "maxsize", 0)
+    response = client.post(
+        f"/api/notes/{test_note.id}/translate?background=true",
+        headers=auth_headers,
+    )
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert "Retry-After" in response.headers
+
+
+# Test translating notes into several languages in one request
+def test_translate_notes_fan_out(client, auth_headers, db, test_user,
+                                 test_note, fake_translation_backend):
+    other = User(username="other", password_hash="x")
+    db.add(other)
+    db.commit()
+    twin = Note(user_id=test_user.id, title="Twin", content=test_note.content)
+    foreign = Note(user_id=other.id, title="Theirs", content="Private")
+    db.add_all([twin, foreign])
+    db.commit()
+    response = client.post(
+        "/api/notes/translate",
+        json={"target_langs": ["en", "de", "en"],
+              "note_ids": [test_note.id, twin.id, foreign.id, 99999]},
+        headers=auth_headers,
+    )
+    assert response.status_code == status.HTTP_200_OK
+    results = {(r["note_id"], r["target_lang"]): r for r in response.json()}
+    assert len(results) == 8
+    assert results[(twin.id, "de")]["translated_text"] == "[de] Test Content"
+    assert results[(test_note.id, "en")]["status"] == status.HTTP_200_OK
+    assert results[(foreign.id, "en")]["status"] == status.HTTP_403_FORBIDDEN
+    assert results[(99999, "de")]["status"] == status.HTTP_404_NOT_FOUND
+    # Identical content is translated once per language
+    assert fake_translation_backend.calls == 2
+
+    response = client.post("/api/notes/translate",
+                           json={"target_langs": ["fr"]},
+                           headers=auth_headers)
+    assert {r["note_id"] for r in response.json()} == {test_note.id, twin.id}
+
+
+# Test one failing language does not fail the others
+def test_translate_notes_partial_failure(client, auth_headers, test_note,
+                                         monkeypatch):
+    async def flaky_translate(text, source_lang="ru", target_lang="en",
+                              deadline=None):
+        return None if target_lang == "de" else f"[{target_lang}] {text}"
+
+    monkeypatch.setattr(translator, "translate_text", flaky_translate)
+    response = client.post(
+        "/api/notes/translate",
+        json={"target_langs": ["en", "de"], "note_ids": [test_note.id]},
+        headers=auth_headers,
+    )
+    assert response.status_code == status.HTTP_200_OK
+    en, de = response.json()
+    assert en["translated_text"] == "[en] Test Content"
+    assert de["status"] == status.HTTP_502_BAD_GATEWAY
+    assert de["translated_text"] is None
+
+
+# Test the sources are read in one query per kind of note, and the
+# session is closed before the upstream calls
+def test_translate_notes_reads_then_releases(client, auth_headers, db,
+                                             test_user, monkeypatch,
+                                             note_statements):
+    notes_ = [Note(user_id=test_user.id, title=f"N{i}", content=f"Body {i}")
+              for i in range(30)]
+    db.add_all(notes_)
+    db.commit()
+    note_ids = [note.id for note in notes_]
+    note_statements.clear()
+
+    async def checked_translate(text, source_lang="ru", target_lang="en",
+                                deadline=None):
+        assert not db.in_transaction()
+        return f"[{target_lang}] {text}"
+
+    monkeypatch.setattr(translator, "translate_text", checked_translate)
+    response = client.post(
+        "/api/notes/translate",
+        json={"target_langs": ["en"], "note_ids": note_ids + [99999]},
+        headers=auth_headers,
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert note_statements == ["SELECT", "SELECT"]
+    assert response.json()[29]["translated_text"] == "[en] Body 29"
+
+    response = client.post(f"/api/notes/{note_ids[0]}/translate",
+                           headers=auth_headers)
+    assert response.json()["translated_text"] == "[en] Body 0"
+
+
+# Test polling an unknown job returns not found
+def test_get_translation_job_not_found(client, auth_headers):
+    response = client.get("/api/translation/jobs/missing",
+                          headers=auth_headers)
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+# Test keyset pagination walks every note exactly once
+def test_list_notes_cursor_pagination(client, auth_headers, db, test_user):
+    for i in range(5):
+        db.add(Note(user_id=test_user.id, title=f"Note {i}", content="C"))
+    db.commit()
+
+    seen = []
+    cursor = ""
+    while cursor is not None:
+        response = client.get(
+            "/api/notes/",
+            params={"cursor": cursor, "limit": 2, "order": "asc"},
+            headers=auth_headers,
+        )
+        assert response.status_code == status.HTTP_200_OK
+        page = response.json()
+        seen.extend(note["title"] for note in page["items"])
+        cursor = page["next_cursor"]
+    assert seen == [f"Note {i}" for i in range(5)]
+
+
+# Test a malformed cursor is rejected
+def test_list_notes_invalid_cursor(client, auth_headers):
+    response = client.get(
+        "/api/notes/", params={"cursor": "garbage"}, headers=auth_headers
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+# Test full-text search ranks title matches first and highlights terms
+def test_search_notes(client, auth_headers, db, test_user):
+    db.add(Note(user_id=test_user.id, title="Shopping list",
+                content="Buy apples and bread"))
+    db.add(Note(user_id=test_user.id, title="Apples",
+                content="Green apples are sour"))
+    db.add(Note(user_id=test_user.id, title="Work", content="Meeting"))
+    db.commit()
+
+    response = client.get("/api/notes/search", params={"q": "apple*"},
+                          headers=auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    results = response.json()
+    assert [r["title"] for r in results] == ["Apples", "Shopping list"]
+    assert "<mark>apples</mark>" in results[1]["snippet"]
+
+
+# Test search only returns the caller's notes and follows updates
+def test_search_notes_scoped_and_incremental(client, auth_headers, db,
+                                             test_user, test_note):
+    from app.database.models import User
+
+    other = User(username="other", password_hash="x")
+    db.add(other)
+    db.commit()
+    db.add(Note(user_id=other.id, title="Secret", content="Test Content"))
+    client.put(f"/api/notes/{test_note.id}",
+               json={"content": "Renamed body"}, headers=auth_headers)
+
+    response = client.get("/api/notes/search", params={"q": "Test Content"},
+                          headers=auth_headers)
+    assert response.json() == []
+    response = client.get("/api/notes/search", params={"q": "renamed"},
+                          headers=auth_headers)
+    assert [r["id"] for r in response.json()] == [test_note.id]
+
+
+# Test a mixed batch is applied with per-item results
+def test_batch_notes(client, auth_headers, db, test_user, test_note):
+    from app.database.models import User
+
+    other = User(username="other", password_hash="x")
+    db.add(other)
+    db.commit()
+    foreign = Note(user_id=other.id, title="Foreign", content="Theirs")
+    doomed = Note(user_id=test_user.id, title="Doomed", content="Bye")
+    db.add_all([foreign, doomed])
+    db.commit()
+
+    response = client.post("/api/notes/batch", json={"operations": [
+        {"op": "create", "title": "A", "content": "First"},
+        {"op": "create", "title": "B", "content": "Second"},
+        {"op": "update", "id": test_note.id, "title": "Renamed"},
+        {"op": "delete", "id": doomed.id},
+        {"op": "delete", "id": foreign.id},
+        {"op": "update", "id": 999, "title": "Missing"},
+    ]}, headers=auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    results = response.json()
+    assert [r["status"] for r in results] == [200, 200, 200, 200, 403, 404]
+    assert results[0]["note"]["title"] == "A"
+    assert results[1]["id"] != results[0]["id"]
+    assert results[2]["note"]["title"] == "Renamed"
+    assert results[2]["note"]["content"] == "Test Content"
+
+    titles = sorted(n["title"] for n in client.get(
+        "/api/notes/", headers=auth_headers).json())
+    assert titles == ["A", "B", "Renamed"]
+
+
+# Test create and update go through the group committer when enabled
+def test_group_commit_routes(client, auth_headers, test_note, monkeypatch):
+    monkeypatch.setattr(group_committer, "enabled", True)
+    group_committer.reset_stats()
+    try:
+        created = client.post(
+            "/api/notes/", json={"title": "Grouped", "content": "Body"},
+            headers=auth_headers,
+        )
+        assert created.status_code == status.HTTP_200_OK
+        assert created.json()["title"] == "Grouped"
+
+        updated = client.put(f"/api/notes/{test_note.id}",
+                             json={"title": "Renamed"}, headers=auth_headers)
+        assert updated.status_code == status.HTTP_200_OK
+        assert updated.json()["title"] == "Renamed"
+        assert updated.json()["content"] == "Test Content"
+
+        missing = client.put("/api/notes/9999", json={"title": "X"},
+                             headers=auth_headers)
+        assert missing.status_code == status.HTTP_404_NOT_FOUND
+
+        stats = client.get("/api/notes/group-commit/stats",
+                           headers=auth_headers).json()
+        assert stats["writes"] == 3
+    finally:
+        group_committer.stop()
+
+
+# Test notes round-trip through the streamed NDJSON export and import
+def test_export_import_notes(client, auth_headers, test_note, monkeypatch):
+    monkeypatch.setattr(notes, "NOTE_STREAM_CHUNK", 2)
+
+    def body():
+        # Split across body chunks mid-line
+        yield b'{"title": "A", "content": "First"}\n{"title": "B", '
+        yield b'"content": "Second"}\n\n{"title": "C", "content": "Third"}'
+
+    response = client.post("/api/notes/import", content=body(),
+                           headers=auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"imported": 3}
+
+    response = client.get("/api/notes/export", headers=auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/x-ndjson"
+    exported = [json.loads(line) for line in response.text.splitlines()]
+    assert [n["title"] for n in exported] == ["Test Note", "A", "B", "C"]
+    assert exported[0]["id"] == test_note.id
+    assert exported[3]["content"] == "Third"
+
+    # An export can be imported again as is
+    response = client.post("/api/notes/import", content=response.content,
+                           headers=auth_headers)
+    assert response.json() == {"imported": 4}
+    assert len(client.get("/api/notes/", headers=auth_headers).json()) == 8
+
+
+# Test a malformed line stops the import after keeping earlier lines
+def test_import_notes_invalid_line(client, auth_headers, monkeypatch):
+    response = client.post("/api/notes/import", content=(
+        b'{"title": "A", "content": "First"}\n'
+        b'{"title": "B"}\n'
+        b'{"title": "C", "content": "Third"}\n'
+    ), headers=auth_headers)
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert response.json()["detail"]["line"] == 2
+    assert response.json()["detail"]["imported"] == 1
+    titles = [n["title"] for n in client.get(
+        "/api/notes/", headers=auth_headers).json()]
+    assert titles == ["A"]
+
+    monkeypatch.setattr(notes, "NOTE_IMPORT_MAX_LINE", 16)
+    response = client.post("/api/notes/import", content=b"x" * 32,
+                           headers=auth_headers)
+    assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
@@ -0,0 +1,152 @@
+"""
+Tests for the async note routes served through the aiosqlite engine.
+"""
+
+import httpx
+import pytest
+import pytest_asyncio
+from fastapi import FastAPI, status
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.auth.dependencies import get_current_principal_async
+from app.auth.principals import Principal
+from app.database.compression import register_functions
+from app.database.database import Base, get_async_db
+from app.database.fts import search_notes, sync_index
+from app.database.models import User
+from app.routes import notes_async
+
+
+@pytest_asyncio.fixture
+async def async_app():
+    engine = create_async_engine(
+        "sqlite+aiosqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    sync_index(register_functions(engine.sync_engine))
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    async with session_factory() as db:
+        db.add(User(id=1, username="testuser", password_hash="x"))
+        await db.commit()
+
+    async def override_get_async_db():
+        async with session_factory() as db:
+            yield db
+
+    app = FastAPI()
+    app.state.session_factory = session_factory
+    app.include_router(notes_async.router, prefix="/api/notes")
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    app.dependency_overrides[get_current_principal_async] = (
+        lambda: Principal(id=1, username="testuser")
+    )
+    yield app
+    await engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def async_client(async_app):
+    async with httpx.AsyncClient(app=async_app,
+                                 base_url="http://test") as client:
+        yield client
+
+
+# Test the async routes cover create, read, update, list and delete
+@pytest.mark.asyncio
+async def test_async_note_crud(async_client):
+    response = await async_client.post(
+        "/api/notes/", json={"title": "Async", "content": "Body"}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    note_id = response.json()["id"]
+
+    response = await async_client.put(
+        f"/api/notes/{note_id}", json={"title": "Renamed"}
+    )
+    assert response.json()["title"] == "Renamed"
+    assert response.json()["content"] == "Body"
+
+    response = await async_client.get("/api/notes/", params={"cursor": ""})
+    assert [n["id"] for n in response.json()["items"]] == [note_id]
+
+    response = await async_client.get("/api/notes/",
+                                      params={"view": "summary"})
+    assert response.json()[0]["snippet"] == "Body"
+    assert response.json()[0]["content_length"] == 4
+    assert "content" not in response.json()[0]
+
+    response = await async_client.delete(f"/api/notes/{note_id}")
+    assert response.status_code == status.HTTP_200_OK
+    response = await async_client.get(f"/api/notes/{note_id}")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+# Test ownership-scoped writes still tell 404 from 403
+@pytest.mark.asyncio
+async def test_async_note_access_errors(async_app, async_client):
+    response = await async_client.put("/api/notes/999", json={"title": "X"})
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    response = await async_client.delete("/api/notes/999")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    response = await async_client.post(
+        "/api/notes/", json={"title": "Mine", "content": "Body"}
+    )
+    note_id = response.json()["id"]
+    async_app.dependency_overrides[get_current_principal_async] = (
+        lambda: Principal(id=2, username="intruder")
+    )
+    response = await async_client.put(f"/api/notes/{note_id}",
+                                      json={"title": "Theirs"})
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+    response = await async_client.delete(f"/api/notes/{note_id}")
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+# Test the async routes honour If-None-Match and If-Match
+@pytest.mark.asyncio
+async def test_async_note_conditional_requests(async_client):
+    response = await async_client.post(
+        "/api/notes/", json={"title": "Async", "content": "Body"}
+    )
+    url = f"/api/notes/{response.json()['id']}"
+    etag = response.headers["ETag"]
+
+    response = await async_client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    response = await async_client.put(url, json={"title": "New"},
+                                      headers={"If-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    response = await async_client.delete(url, headers={"If-Match": etag})
+    assert response.status_code == status.HTTP_412_PRECONDITION_FAILED
+
+    list_etag = (await async_client.get("/api/notes/")).headers["ETag"]
+    response = await async_client.get("/api/notes/",
+                                      headers={"If-None-Match": list_etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+
+# Test compressed bodies written through aiosqlite are searchable
+@pytest.mark.asyncio
+async def test_async_compressed_note_search(async_app, async_client):
+    response = await async_client.post(
+        "/api/notes/", json={"title": "Big", "content": "Original. " * 200}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    note_id = response.json()["id"]
+    response = await async_client.put(
+        f"/api/notes/{note_id}", json={"content": "Revised. " * 200}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["content"] == "Revised. " * 200
+
+    async with async_app.state.session_factory() as db:
+        revised = await db.run_sync(search_notes, 1, "revised")
+        original = await db.run_sync(search_notes, 1, "original")
+    assert [row["id"] for row in revised] == [note_id]
+    assert original == []
@@ -0,0 +1,80 @@
+import time
+import pytest
+from app import profiling
+from app.database import crud
+
+
+@pytest.fixture
+def profile_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def auth_headers(client, test_user):
+    response = client.post(
+        "/auth/login", json={"username": "testuser", "password": "testpass"}
+    )
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def test_profile_on_request(client, auth_headers, profile_dir, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", "secret")
+    rows = crud.get_user_note_rows
+
+    def slow_note_rows(*args, **kwargs):
+        time.sleep(0.05)
+        return rows(*args, **kwargs)
+
+    monkeypatch.setattr(crud, "get_user_note_rows", slow_note_rows)
+
+    response = client.get("/api/notes/", headers=auth_headers)
+    assert "x-profile" not in response.headers
+    # The token is only accepted in the header
+    response = client.get("/api/notes/?profile=secret", headers=auth_headers)
+    assert "x-profile" not in response.headers
+    response = client.get(
+        "/api/notes/", headers={**auth_headers, "X-Profile-Token": "wrong"}
+    )
+    assert "x-profile" not in response.headers
+    assert not list(profile_dir.iterdir())
+
+    token_headers = {**auth_headers, "X-Profile-Token": "secret"}
+    response = client.get("/api/notes/", headers=token_headers)
+    assert response.status_code == 200
+    name = response.headers["x-profile"]
+    assert (profile_dir / f"{name}.prof").exists()
+    summary = (profile_dir / f"{name}.txt").read_text()
+    assert summary.startswith("GET /api/notes/ -> 200")
+    assert "SELECT" in summary
+    # The sync route ran in a worker thread and was sampled there
+    assert "slow_note_rows" in summary
+    stacks = (profile_dir / f"{name}.stacks").read_text()
+    assert any(line.startswith("AnyIO worker thread;")
+               and "slow_note_rows" in line for line in stacks.splitlines())
+
+    response = client.get("/api/notes/?profile=1", headers=token_headers)
+    assert "x-profile" in response.headers
+    response = client.get("/api/notes/?profile=0", headers=token_headers)
+    assert "x-profile" not in response.headers
+
+
+def test_profile_sampling(client, test_user, profile_dir, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_SAMPLE_RATE", 1)
+    monkeypatch.setattr(profiling, "PROFILE_KEEP", 2)
+
+    for _ in range(3):
+        response = client.post(
+            "/auth/login",
+            json={"username": "testuser", "password": "testpass"},
+        )
+        assert response.status_code == 200
+        assert "x-profile" not in response.headers
+
+    profiles = sorted(profile_dir.glob("*.prof"))
+    assert len(profiles) == 2
+    assert len(list(profile_dir.glob("*.txt"))) == 2
+    assert len(list(profile_dir.glob("*.stacks"))) == 2
+    summary = profiles[-1].with_suffix(".txt").read_text()
+    assert "(route /auth/login, sampled)" in summary
+    assert "verify_password" in summary
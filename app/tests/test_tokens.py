@@ -0,0 +1,61 @@
+"""
+Tests and micro-benchmarks for JWT verification:
+- Cached verification of previously seen tokens
+- Rejection of tampered tokens
+- Per-request auth cost with and without the token cache
+"""
+
+import pytest
+from app.security.tokens import (
+    create_access_token,
+    decode_access_token,
+    token_cache,
+    verify_access_token,
+)
+
+
+@pytest.fixture(autouse=True)
+def clear_token_cache():
+    token_cache.clear()
+    yield
+    token_cache.clear()
+
+
+# Test a verified token is served from the cache the second time
+def test_verify_access_token_cached():
+    token = create_access_token({"sub": "testuser"})
+    assert verify_access_token(token)["sub"] == "testuser"
+    assert verify_access_token(token)["sub"] == "testuser"
+    assert token_cache.stats()["hits"] == 1
+
+
+# Test a tampered token never hits the cache entry of the original
+def test_verify_access_token_rejects_tampered_token():
+    token = create_access_token({"sub": "testuser"})
+    assert verify_access_token(token) is not None
+    header, payload, signature = token.split(".")
+    tampered = ".".join([header, payload, signature[::-1]])
+    assert verify_access_token(tampered) is None
+    assert token_cache.stats()["hits"] == 0
+
+
+# Test mutating a returned payload does not corrupt the cache
+def test_verify_access_token_returns_copy():
+    token = create_access_token({"sub": "testuser"})
+    verify_access_token(token)["sub"] = "intruder"
+    assert verify_access_token(token)["sub"] == "testuser"
+
+
+# Benchmark full HS256 verification on every request
+@pytest.mark.benchmark(group="auth-token")
+def test_benchmark_verify_token_uncached(benchmark):
+    token = create_access_token({"sub": "testuser"})
+    assert benchmark(decode_access_token, token)["sub"] == "testuser"
+
+
+# Benchmark verification through the token cache
+@pytest.mark.benchmark(group="auth-token")
+def test_benchmark_verify_token_cached(benchmark):
+    token = create_access_token({"sub": "testuser"})
+    verify_access_token(token)
+    assert benchmark(verify_access_token, token)["sub"] == "testuser"
@@ -1,5 +1,28 @@
+import asyncio
+import json
+import time
+import httpx
+import pytest
 from unittest.mock import patch
-from app.services.translate import TranslationService
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.database.database import Base
+from app.services.cache import TTLCache
+from app.services.translate import AsyncTranslationClient, TranslationService
+from app.services.translation_backends import (
+    BreakerBackend,
+    CircuitBreaker,
+    FakeTranslationBackend,
+    HedgedBackend,
+    StubTranslationBackend,
+)
+from app.services.translation_cache import CachedTranslator, TranslationCache
+from app.services.translation_pipeline import (
+    split_segments,
+    translate_document,
+    translate_many,
+)
 
 
 # Test successful translation using the TranslationService class
@@ -19,3 +42,282 @@ def test_translate_text_failure(mock_post):
     mock_post.side_effect = Exception("API failure")
     result = TranslationService.translate_text("Привет")
     assert result is None
+
+
+def _translation_response(request):
+    return httpx.Response(
+        200, json={"data": {"translations": {"translatedText": "Hello"}}}
+    )
+
+
+# Test the async client returns the translated text
+@pytest.mark.asyncio
+async def test_async_translate_text_success():
+    client = AsyncTranslationClient(
+        transport=httpx.MockTransport(_translation_response)
+    )
+    result = await client.translate_text("Привет")
+    await client.aclose()
+    assert result == "Hello"
+
+
+# Test the async client retries failed attempts before succeeding
+@pytest.mark.asyncio
+async def test_async_translate_text_retries():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) < 3:
+            return httpx.Response(503)
+        return _translation_response(request)
+
+    client = AsyncTranslationClient(
+        transport=httpx.MockTransport(handler), backoff=0
+    )
+    result = await client.translate_text("Привет")
+    await client.aclose()
+    assert result == "Hello"
+    assert len(calls) == 3
+
+
+# Test the async client gives up when the deadline expires
+@pytest.mark.asyncio
+async def test_async_translate_text_deadline():
+    async def handler(request):
+        await asyncio.sleep(1)
+        return _translation_response(request)
+
+    client = AsyncTranslationClient(transport=httpx.MockTransport(handler))
+    result = await client.translate_text("Привет", deadline=0.05)
+    await client.aclose()
+    assert result is None
+
+
+# Test the LRU evicts the least recently used entry and counts it
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.stats()["evictions"] == 1
+
+
+# Test expired entries are treated as misses
+def test_ttl_cache_expires_entries():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1, ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+# Test repeated translations are served from the cache
+@pytest.mark.asyncio
+async def test_cached_translator_skips_upstream_on_hit():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return _translation_response(request)
+
+    client = AsyncTranslationClient(transport=httpx.MockTransport(handler))
+    translator = CachedTranslator(client, TranslationCache(persistent=False))
+    assert await translator.translate_text("Привет") == "Hello"
+    assert await translator.translate_text("Привет") == "Hello"
+    await client.aclose()
+    assert len(calls) == 1
+    assert translator.cache.stats()["hits"] == 1
+
+
+# Test persisted translations survive a cold in-memory tier
+def test_translation_cache_persistent_tier():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+    cache = TranslationCache(persistent=True, session_factory=factory)
+    cache.set("Привет", "ru", "en", "Hello")
+    cache.clear()
+    assert cache.get("Привет", "ru", "en") == "Hello"
+    assert cache.stats()["persistent_hits"] == 1
+    assert cache.get("Привет", "ru", "de") is None
+
+
+# Test storing a key twice, as racing workers do, keeps the latest value
+def test_translation_cache_store_upserts():
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    cache = TranslationCache(persistent=True,
+                             session_factory=sessionmaker(bind=engine))
+    cache.set("Привет", "ru", "en", "Hi")
+    cache.set("Привет", "ru", "en", "Hello")
+    cache.clear()
+    assert cache.get("Привет", "ru", "en") == "Hello"
+
+
+# Test a broken database tier never fails a translation
+@pytest.mark.asyncio
+async def test_translation_cache_errors_are_swallowed():
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    cache = TranslationCache(persistent=True,
+                             session_factory=sessionmaker(bind=engine))
+
+    class Backend:
+        async def translate_text(self, text, source_lang, target_lang,
+                                 deadline=None):
+            return "Hello"
+
+    translator = CachedTranslator(Backend(), cache)
+    assert await translator.translate_text("Привет") == "Hello"
+    assert await translator.translate_text("Привет") == "Hello"
+    assert cache.stats()["hits"] == 1
+
+
+# Test segments respect the size bound and reassemble to the original
+def test_split_segments_round_trip():
+    text = "  First sentence. Second one!\n\nNew paragraph here. " + "x" * 25
+    prefix, segments = split_segments(text, max_chars=20)
+    assert all(len(segment) <= 20 for segment, _ in segments)
+    assert prefix + "".join(seg + sep for seg, sep in segments) == text
+
+
+# Test duplicates are translated once and results keep their order
+@pytest.mark.asyncio
+async def test_translate_document_dedupes_and_orders():
+    calls = []
+
+    async def translate(text, source_lang, target_lang):
+        calls.append(text)
+        await asyncio.sleep(0.01 if text.startswith("A") else 0)
+        return text.upper()
+
+    text = "Alpha one.\n\nBeta two.\n\nAlpha one."
+    result = await translate_document(text, translate, max_chars=12)
+    assert result == "ALPHA ONE.\n\nBETA TWO.\n\nALPHA ONE."
+    assert sorted(calls) == ["Alpha one.", "Beta two."]
+
+
+# Test only the failing segment is retried, not the whole document
+@pytest.mark.asyncio
+async def test_translate_document_retries_failed_segment_only():
+    calls = []
+
+    def handler(request):
+        text = json.loads(request.content)["q"]
+        calls.append(text)
+        if text == "Beta two." and calls.count(text) == 1:
+            return httpx.Response(503)
+        return httpx.Response(
+            200, json={"data": {"translations": {"translatedText": text}}}
+        )
+
+    client = AsyncTranslationClient(
+        transport=httpx.MockTransport(handler), backoff=0
+    )
+    result = await translate_document(
+        "Alpha one. Beta two.", client.translate_text, max_chars=12
+    )
+    await client.aclose()
+    assert result == "Alpha one. Beta two."
+    assert calls.count("Alpha one.") == 1
+    assert calls.count("Beta two.") == 2
+
+
+# Test the circuit opens on failures, fails fast and closes after a probe
+@pytest.mark.asyncio
+async def test_circuit_breaker_fails_fast_and_recovers():
+    now = [0.0]
+    breaker = CircuitBreaker(threshold=0.5, min_calls=4, window=30,
+                             reset_timeout=10, clock=lambda: now[0])
+    upstream = FakeTranslationBackend(fail=True)
+    backend = BreakerBackend("fake", upstream, breaker)
+
+    for _ in range(4):
+        assert await backend.translate_text("Привет") is None
+    assert breaker.state == CircuitBreaker.OPEN
+    assert await backend.translate_text("Привет") is None
+    assert upstream.calls == 4
+    assert breaker.rejected == 1
+
+    now[0] = 10
+    upstream.fail = False
+    assert await backend.translate_text("Привет") == "[en] Привет"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+# Test a failed half-open probe re-opens the circuit
+def test_circuit_breaker_probe_failure_reopens():
+    now = [0.0]
+    breaker = CircuitBreaker(threshold=0.5, min_calls=1, window=30,
+                             reset_timeout=10, clock=lambda: now[0])
+    assert breaker.allow()
+    breaker.record(False)
+    now[0] = 10
+    assert breaker.allow()
+    # Only one probe at a time
+    assert not breaker.allow()
+    breaker.record(False)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.opened == 2
+
+
+# Test a slow primary is hedged and the faster backend wins
+@pytest.mark.asyncio
+async def test_hedged_backend_uses_faster_backend():
+    primary = FakeTranslationBackend(latency=1)
+    secondary = FakeTranslationBackend()
+    backend = HedgedBackend(primary, secondary, delay=0.01)
+    started = time.perf_counter()
+    assert await backend.translate_text("Привет", target_lang="de") == \
+        "[de] Привет"
+    assert time.perf_counter() - started < 0.5
+    assert backend.hedge_wins == 1
+
+    primary.latency = 0
+    assert await backend.translate_text("Привет") == "[en] Привет"
+    assert secondary.calls == 1
+
+
+# Test the stub backend answers over HTTP like the provider
+@pytest.mark.asyncio
+async def test_stub_backend_round_trip():
+    backend = StubTranslationBackend(latency_ms=0)
+    try:
+        assert await backend.translate_text("Привет", target_lang="fr") == \
+            "[fr] Привет"
+    finally:
+        await backend.aclose()
+
+
+# Test fan-out bounds concurrent calls and translates each pair once
+@pytest.mark.asyncio
+async def test_translate_many_limits_and_deduplicates():
+    calls = []
+    running = peak = 0
+
+    async def translate(text, source, target):
+        nonlocal running, peak
+        calls.append((text, target))
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return None if target == "xx" else f"[{target}] {text}"
+
+    texts = ["Alpha one.\n\nBeta two.", "Beta two.", "Gamma three."]
+    results = await translate_many(
+        texts + texts[:1], ["en", "de", "xx"], translate,
+        limiter=asyncio.Semaphore(2),
+    )
+    assert peak == 2
+    assert len(calls) == len(set(calls)) == 9
+    assert results[(texts[1], "de")] == "[de] Beta two."
+    assert results[(texts[0], "xx")] is None
+    assert len(results) == 9
@@ -0,0 +1,154 @@
+"""Compare the sync (threadpool) and async (aiosqlite) note stacks.
+
+Both stacks are served in-process from the same seeded SQLite file and
+driven by the same number of concurrent clients issuing a mix of note
+reads and listings. Authentication is stubbed so only the data path is
+measured.
+
+    python -m benchmarks.async_vs_sync --requests 5000 --concurrency 64
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from app.auth.dependencies import (
+    get_current_principal,
+    get_current_principal_async,
+)
+from app.auth.principals import Principal
+from app.database.database import Base, get_async_db, get_db
+from app.routes import notes, notes_async
+
+PRINCIPAL = Principal(id=1, username="bench")
+
+
+def seed(path: str, count: int):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO users (id, username, password_hash) "
+            "VALUES (1, 'bench', 'x')"
+        )
+        conn.exec_driver_sql(
+            "INSERT INTO notes (user_id, title, content) VALUES (?, ?, ?)",
+            [(1, f"Note {i}", "lorem ipsum " * 50) for i in range(count)],
+        )
+    engine.dispose()
+
+
+def build_app(path: str, async_mode: bool, pool_size: int):
+    # Pools match the client concurrency; with the default 5 + 10
+    # connections the sync stack deadlocks once every threadpool worker
+    # is blocked waiting for a connection
+    pool = {"pool_size": pool_size, "max_overflow": 0}
+    app = FastAPI()
+    if async_mode:
+        app.include_router(notes_async.router, prefix="/api/notes")
+        engine = create_async_engine(
+            f"sqlite+aiosqlite:///{path}",
+            poolclass=AsyncAdaptedQueuePool,
+            **pool,
+        )
+        factory = async_sessionmaker(engine, expire_on_commit=False)
+
+        async def override_get_async_db():
+            async with factory() as db:
+                yield db
+
+        app.dependency_overrides[get_async_db] = override_get_async_db
+        app.dependency_overrides[get_current_principal_async] = (
+            lambda: PRINCIPAL
+        )
+    else:
+        engine = create_engine(
+            f"sqlite:///{path}",
+            connect_args={"check_same_thread": False},
+            **pool,
+        )
+        factory = sessionmaker(bind=engine)
+
+        def override_get_db():
+            db = factory()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        app.dependency_overrides[get_db] = override_get_db
+        app.dependency_overrides[get_current_principal] = lambda: PRINCIPAL
+    app.include_router(notes.router, prefix="/api/notes")
+    return app, engine
+
+
+async def drive(app, total: int, concurrency: int, note_count: int):
+    rng = random.Random(1)
+    paths = [
+        "/api/notes/?limit=20" if rng.random() < 0.3
+        else f"/api/notes/{rng.randint(1, note_count)}"
+        for _ in range(total)
+    ]
+    latencies = []
+    queue = iter(paths)
+
+    async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+        async def worker():
+            for path in queue:
+                started = time.perf_counter()
+                response = await client.get(path)
+                latencies.append(time.perf_counter() - started)
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "rps": total / elapsed,
+        "p50": statistics.median(latencies) * 1000,
+        "p95": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "p99": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+async def measure(app, engine, total: int, concurrency: int,
+                  note_count: int):
+    try:
+        return await drive(app, total, concurrency, note_count)
+    finally:
+        # aiosqlite connection threads keep the process alive otherwise
+        result = engine.dispose()
+        if asyncio.iscoroutine(result):
+            await result
+
+
+def run(total: int, concurrency: int, note_count: int):
+    path = os.path.join(tempfile.mkdtemp(), "async_bench.db")
+    seed(path, note_count)
+    for name, async_mode in (("sync", False), ("async", True)):
+        app, engine = build_app(path, async_mode, concurrency)
+        stats = asyncio.run(measure(app, engine, total, concurrency,
+                                    note_count))
+        print(f"{name:>5}: {stats['rps']:.0f} req/s  "
+              f"p50 {stats['p50']:.1f} ms  p95 {stats['p95']:.1f} ms  "
+              f"p99 {stats['p99']:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--notes", type=int, default=1000)
+    args = parser.parse_args()
+    run(args.requests, args.concurrency, args.notes)
@@ -0,0 +1,164 @@
+"""Fail when a benchmark regressed against the committed baseline.
+
+Runs the pytest-benchmark suite (``app/tests/test_benchmarks.py`` and the
+token benchmarks) unless a results file is given, then compares every
+benchmark present in both runs. Exits with status 1 if any of them got
+slower than the baseline by more than ``--threshold`` percent
+(``BENCHMARK_MAX_REGRESSION``, default 25) on the chosen statistic.
+Benchmarks found in only one of the two are listed, not compared: a run
+of fewer table sizes than the baseline holds, or a renamed or new
+benchmark that needs ``--update``.
+
+    python -m benchmarks.compare
+    python -m benchmarks.compare results.json --threshold 10 --stat median
+    python -m benchmarks.compare --update --runs 3
+
+Timings only compare on the same machine: regenerate the baseline with
+``--update`` where the comparison runs, e.g. on the CI runner. On a busy
+or shared machine, ``--runs N`` repeats the suite and keeps each
+benchmark's fastest run, which filters out bursts of outside load.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+BASELINE = Path(__file__).with_name("baseline.json")
+SUITE = ["app/tests/test_benchmarks.py", "app/tests/test_tokens.py"]
+MAX_REGRESSION = float(os.getenv("BENCHMARK_MAX_REGRESSION", "25"))
+
+
+def run_suite(output: Path):
+    """Run the benchmarks and write pytest-benchmark's JSON to ``output``."""
+    subprocess.run(
+        [sys.executable, "-m", "pytest", *SUITE, "-q", "--no-cov",
+         "-p", "no:cacheprovider", "--benchmark-only",
+         f"--benchmark-json={output}"],
+        check=True,
+    )
+
+
+def load(path: Path) -> dict:
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def best_of(runs: list, stat: str) -> dict:
+    """Merge runs, keeping each benchmark's result with the lowest stat."""
+    best = {}
+    for run in runs:
+        for bench in run["benchmarks"]:
+            kept = best.get(bench["fullname"])
+            if kept is None or bench["stats"][stat] < kept["stats"][stat]:
+                best[bench["fullname"]] = bench
+    return {**runs[0], "benchmarks": list(best.values())}
+
+
+def compare(baseline: dict, current: dict, threshold: float,
+            stat: str = "min") -> list:
+    """Relative change of each benchmark found in both runs.
+
+    Returns:
+        list: ``(name, baseline, current, change_percent, regressed)``
+        tuples, slowest change first
+    """
+    before = {bench["fullname"]: bench["stats"][stat]
+              for bench in baseline["benchmarks"]}
+    results = []
+    for bench in current["benchmarks"]:
+        name = bench["fullname"]
+        if name not in before:
+            continue
+        now = bench["stats"][stat]
+        change = (now - before[name]) / before[name] * 100
+        results.append((name, before[name], now, change, change > threshold))
+    return sorted(results, key=lambda result: -result[3])
+
+
+def unmatched(baseline: dict, current: dict) -> tuple:
+    """Names found in only one of the runs.
+
+    Returns:
+        tuple: Sorted names missing from ``current`` and sorted names
+        without a baseline
+    """
+    before = {bench["fullname"] for bench in baseline["benchmarks"]}
+    now = {bench["fullname"] for bench in current["benchmarks"]}
+    return sorted(before - now), sorted(now - before)
+
+
+def machine(data: dict) -> tuple:
+    info = data.get("machine_info", {})
+    return (info.get("cpu", {}).get("brand_raw"), info.get("python_version"))
+
+
+def report(results: list, threshold: float, stat: str):
+    print(f"{'benchmark':<64} {'baseline':>10} {'current':>10} {'change':>8}"
+          f"  ({stat}, us; fail above +{threshold:g}%)")
+    for name, before, now, change, regressed in results:
+        flag = "  REGRESSED" if regressed else ""
+        print(f"{name.rsplit('/', 1)[-1]:<64} {before * 1e6:10.1f} "
+              f"{now * 1e6:10.1f} {change:+7.1f}%{flag}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("results", nargs="?", type=Path,
+                        help="pytest-benchmark JSON; runs the suite if "
+                             "omitted")
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--threshold", type=float, default=MAX_REGRESSION,
+                        help="allowed slowdown in percent")
+    # The minimum is the least disturbed by other load on the machine
+    parser.add_argument("--stat", default="min",
+                        choices=("min", "median", "mean"))
+    parser.add_argument("--runs", type=int, default=1,
+                        help="suite runs; the fastest result of each "
+                             "benchmark is used")
+    parser.add_argument("--update", action="store_true",
+                        help="store the results as the new baseline")
+    args = parser.parse_args(argv)
+
+    if args.results is not None:
+        current = load(args.results)
+    else:
+        directory = Path(tempfile.mkdtemp())
+        runs = []
+        for run in range(args.runs):
+            output = directory / f"run{run}.json"
+            run_suite(output)
+            runs.append(load(output))
+        current = best_of(runs, args.stat)
+    if args.update:
+        with open(args.baseline, "w", encoding="utf-8") as file:
+            json.dump(current, file, indent=4)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    baseline = load(args.baseline)
+    if machine(baseline) != machine(current):
+        print("warning: baseline was recorded on "
+              f"{machine(baseline)}, this run on {machine(current)}")
+    changes = compare(baseline, current, args.threshold, args.stat)
+    report(changes, args.threshold, args.stat)
+    missing, new = unmatched(baseline, current)
+    for title, names in (("Not in this run", missing),
+                         ("No baseline (add with --update)", new)):
+        if names:
+            print(f"{title}: {len(names)}")
+            for name in names:
+                print(f"  {name.rsplit('/', 1)[-1]}")
+    regressed = [change for change in changes if change[4]]
+    if regressed:
+        print(f"{len(regressed)} benchmark(s) regressed by more than "
+              f"{args.threshold:g}%")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
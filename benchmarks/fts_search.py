@@ -0,0 +1,116 @@
+"""Benchmark full-text note search against a LIKE scan.
+
+Seeds a throw-away SQLite database with synthetic notes (indexed by the
+FTS triggers while inserting), then times per-user searches through
+``app.database.fts.search_notes`` and the equivalent ``LIKE`` query.
+
+    python -m benchmarks.fts_search --notes 1000000 --users 100
+"""
+
+import argparse
+import itertools
+import os
+import random
+import statistics
+import tempfile
+import time
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+from app.database.database import Base
+from app.database.fts import search_notes
+
+# Synthetic vocabulary with Zipf-distributed word frequencies, which is
+# much closer to real text than uniformly drawn words
+VOCABULARY = [f"w{i:x}" for i in range(20000)]
+CUM_WEIGHTS = list(itertools.accumulate(
+    1 / (rank + 1) for rank in range(len(VOCABULARY))
+))
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    return " ".join(
+        rng.choices(VOCABULARY, cum_weights=CUM_WEIGHTS, k=words)
+    )
+
+
+def seed(engine, notes: int, users: int, batch: int = 10000) -> float:
+    """Insert users and notes in bulk; returns elapsed seconds."""
+    rng = random.Random(42)
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO users (id, username, password_hash) VALUES (?, ?, ?)",
+            [(i, f"user{i}", "x") for i in range(1, users + 1)],
+        )
+        for start in range(0, notes, batch):
+            rows = [
+                (rng.randint(1, users), _sentence(rng, 4),
+                 _sentence(rng, 60))
+                for _ in range(min(batch, notes - start))
+            ]
+            conn.exec_driver_sql(
+                "INSERT INTO notes (user_id, title, content) "
+                "VALUES (?, ?, ?)",
+                rows,
+            )
+    return time.perf_counter() - started
+
+
+def _percentiles(samples):
+    samples = sorted(samples)
+    return {
+        "p50": statistics.median(samples) * 1000,
+        "p95": samples[int(len(samples) * 0.95) - 1] * 1000,
+        "max": samples[-1] * 1000,
+    }
+
+
+def run(notes: int, users: int, queries: int):
+    path = os.path.join(tempfile.mkdtemp(), "fts_bench.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+
+    elapsed = seed(engine, notes, users)
+    print(f"seeded {notes} notes for {users} users in {elapsed:.1f}s "
+          f"({notes / elapsed:.0f} notes/s with FTS triggers)")
+    print(f"database size: {os.path.getsize(path) / 2**20:.1f} MiB")
+
+    rng = random.Random(7)
+    # Two mid-frequency words, like a typical "find that note" query
+    workload = [
+        (rng.randint(1, users),
+         " ".join(rng.sample(VOCABULARY[20:2000], 2)))
+        for _ in range(queries)
+    ]
+    like_sql = text(
+        "SELECT id, title FROM notes WHERE user_id = :user_id AND "
+        "(title LIKE :a OR content LIKE :a) AND "
+        "(title LIKE :b OR content LIKE :b) LIMIT 20"
+    )
+    fts_times, like_times = [], []
+    with Session(engine) as db:
+        for user_id, query in workload:
+            started = time.perf_counter()
+            search_notes(db, user_id, query)
+            fts_times.append(time.perf_counter() - started)
+
+            a, b = query.split()
+            started = time.perf_counter()
+            db.execute(like_sql, {
+                "user_id": user_id, "a": f"%{a}%", "b": f"%{b}%",
+            }).all()
+            like_times.append(time.perf_counter() - started)
+
+    for name, samples in (("fts5", fts_times), ("like", like_times)):
+        stats = _percentiles(samples)
+        print(f"{name:>5}: p50 {stats['p50']:.2f} ms  "
+              f"p95 {stats['p95']:.2f} ms  max {stats['max']:.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--notes", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+    run(args.notes, args.users, args.queries)
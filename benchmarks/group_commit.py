@@ -0,0 +1,97 @@
+"""Compare commit-per-note inserts with group commit.
+
+Concurrent writer threads create notes in a throw-away SQLite file, once
+with ``crud.create_note`` (one transaction and fsync per note) and once
+through a ``GroupCommitter``.
+
+    python -m benchmarks.group_commit --writers 64 --notes 5000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.database import crud
+from app.database.database import Base
+from app.database.group_commit import GroupCommitter
+
+
+def build_factory(path: str, journal_mode: str, pool_size: int):
+    engine = create_engine(
+        f"sqlite:///{path}",
+        connect_args={"check_same_thread": False, "timeout": 60},
+        pool_size=pool_size,
+        max_overflow=0,
+    )
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"PRAGMA journal_mode = {journal_mode}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO users (id, username, password_hash) "
+            "VALUES (1, 'bench', 'x')"
+        )
+    return engine, sessionmaker(bind=engine)
+
+
+def run_direct(factory, writers: int, notes: int) -> float:
+    def create(i):
+        db = factory()
+        try:
+            crud.create_note(db, f"Note {i}", "lorem ipsum", 1)
+        finally:
+            db.close()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(writers) as pool:
+        list(pool.map(create, range(notes)))
+    return time.perf_counter() - started
+
+
+def run_grouped(factory, writers: int, notes: int, window: float):
+    committer = GroupCommitter(enabled=True, window=window,
+                               session_factory=factory)
+    committer.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(writers) as pool:
+        list(pool.map(
+            lambda i: committer.run(crud.add_note, f"Note {i}",
+                                    "lorem ipsum", 1),
+            range(notes),
+        ))
+    elapsed = time.perf_counter() - started
+    committer.stop()
+    return elapsed, committer.stats()
+
+
+def run(writers: int, notes: int, window: float, journal_mode: str):
+    directory = tempfile.mkdtemp()
+    engine, factory = build_factory(
+        os.path.join(directory, "direct.db"), journal_mode, writers
+    )
+    elapsed = run_direct(factory, writers, notes)
+    engine.dispose()
+    print(f"  per-note commit: {notes / elapsed:.0f} notes/s")
+
+    engine, factory = build_factory(
+        os.path.join(directory, "grouped.db"), journal_mode, 1
+    )
+    elapsed, stats = run_grouped(factory, writers, notes, window)
+    engine.dispose()
+    print(f"     group commit: {notes / elapsed:.0f} notes/s  "
+          f"mean batch {stats['mean_batch_size']:.1f}  "
+          f"commit p50 {stats['commit_ms_p50']:.2f} ms  "
+          f"p99 {stats['commit_ms_p99']:.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--writers", type=int, default=64)
+    parser.add_argument("--notes", type=int, default=5000)
+    parser.add_argument("--window-ms", type=float, default=2)
+    parser.add_argument("--journal-mode", default="WAL")
+    args = parser.parse_args()
+    run(args.writers, args.notes, args.window_ms / 1000, args.journal_mode)
@@ -0,0 +1,118 @@
+"""Measure per-request CPU time of GET /api/notes/.
+
+Compares the current listing route (Core rows encoded by
+``FastJSONResponse``) with the previous implementation (ORM objects
+validated through ``NoteResponse`` and encoded by FastAPI) on the same
+seeded SQLite file. Both compute the list ETag; authentication is stubbed
+so only the listing is measured.
+
+    python -m benchmarks.list_serialization --limit 100 --content-size 4096
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from typing import List
+from fastapi import Depends, FastAPI, Response
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+from app.auth.dependencies import get_current_principal
+from app.auth.principals import Principal
+from app.database import crud
+from app.database.database import Base, get_read_db
+from app.routes import notes
+from app.routes.notes import NoteResponse, notes_list_etag, set_validator
+
+PRINCIPAL = Principal(id=1, username="bench")
+
+
+def seed(path: str, count: int, content_size: int):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    content = ("lorem ipsum dolor sit amet " * content_size)[:content_size]
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO users (id, username, password_hash) "
+            "VALUES (1, 'bench', 'x')"
+        )
+        conn.exec_driver_sql(
+            "INSERT INTO notes (user_id, title, content) VALUES (?, ?, ?)",
+            [(1, f"Note {i}", content) for i in range(count)],
+        )
+    engine.dispose()
+
+
+def build_app(path: str) -> FastAPI:
+    engine = create_engine(f"sqlite:///{path}",
+                           connect_args={"check_same_thread": False})
+    factory = sessionmaker(bind=engine)
+
+    def override_get_read_db():
+        db = factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+
+    # The listing as it was before the fast path
+    @app.get("/legacy/", response_model=List[NoteResponse])
+    def legacy_list_notes(response: Response, skip: int = 0,
+                          limit: int = 100,
+                          db: Session = Depends(get_read_db)):
+        set_validator(response, notes_list_etag(
+            PRINCIPAL.id, crud.get_user_notes_version(db, PRINCIPAL.id),
+            (skip, limit, None, None),
+        ))
+        return crud.get_user_notes(db, PRINCIPAL.id, skip=skip, limit=limit)
+
+    # Client and framework overhead shared by both routes
+    @app.get("/noop")
+    def noop():
+        return None
+
+    app.include_router(notes.router, prefix="/api/notes")
+    app.dependency_overrides[get_read_db] = override_get_read_db
+    app.dependency_overrides[get_current_principal] = lambda: PRINCIPAL
+    return app
+
+
+def measure(client: TestClient, url: str, requests: int) -> dict:
+    for _ in range(10):
+        client.get(url).raise_for_status()
+    samples = []
+    for _ in range(requests):
+        started = time.process_time()
+        response = client.get(url)
+        samples.append(time.process_time() - started)
+        response.raise_for_status()
+    return {
+        "mean": statistics.fmean(samples) * 1000,
+        "bytes": len(response.content),
+    }
+
+
+def run(requests: int, limit: int, content_size: int):
+    path = os.path.join(tempfile.mkdtemp(), "list_bench.db")
+    seed(path, max(limit, 1000), content_size)
+    with TestClient(build_app(path)) as client:
+        floor = measure(client, "/noop", requests)["mean"]
+        print(f"overhead: {floor:.2f} ms CPU/request (subtracted below)")
+        for name, url in (("before", f"/legacy/?limit={limit}"),
+                          ("after", f"/api/notes/?limit={limit}")):
+            stats = measure(client, url, requests)
+            print(f"{name:>8}: {stats['mean'] - floor:.2f} ms CPU/request "
+                  f"({stats['bytes'] / 1024:.0f} KiB)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--content-size", type=int, default=4096)
+    args = parser.parse_args()
+    run(args.requests, args.limit, args.content_size)
@@ -0,0 +1,282 @@
+"""Offline, reproducible load test of the running application.
+
+Seeds a fresh SQLite file with ``--users`` accounts and ``--notes``
+notes, starts a local stand-in for the translation provider and the
+application under uvicorn, then drives ``locustfile.py`` headlessly with
+a weighted mix of create, list, get, update, delete and translate
+requests. Every Locust user logs in as its own seeded account.
+
+Per-endpoint p50/p95/p99 latency and throughput are printed and written
+to ``summary.json`` and ``summary.txt`` in ``--output``, next to Locust's
+CSV and HTML reports and the seeded database. The run fails (exit
+status 1) when the aggregate p95 or p99 latency, the failure ratio or
+the throughput misses its threshold.
+
+    python -m benchmarks.loadtest --users 50 --notes 20000 --clients 20 \\
+        --duration 60 --max-p95-ms 300
+
+Threshold defaults come from ``LOADTEST_MAX_P95_MS``,
+``LOADTEST_MAX_P99_MS``, ``LOADTEST_MAX_FAIL_RATIO`` and
+``LOADTEST_MIN_RPS``, which ``locustfile.py`` also enforces when run on
+its own.
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+LOADTEST_USER_PREFIX = "loadtest"
+LOADTEST_PASSWORD = os.getenv("LOADTEST_PASSWORD", "loadtest-password")
+
+THRESHOLDS = {
+    "max_p95_ms": float(os.getenv("LOADTEST_MAX_P95_MS", "500")),
+    "max_p99_ms": float(os.getenv("LOADTEST_MAX_P99_MS", "1000")),
+    "max_fail_ratio": float(os.getenv("LOADTEST_MAX_FAIL_RATIO", "0.01")),
+    # 0 disables the throughput check
+    "min_rps": float(os.getenv("LOADTEST_MIN_RPS", "0")),
+}
+
+
+def loadtest_username(index: int) -> str:
+    return f"{LOADTEST_USER_PREFIX}{index}"
+
+
+def check_thresholds(summary: dict, thresholds: dict) -> list:
+    """Compare aggregate results with the thresholds.
+
+    Args:
+        summary: ``p95_ms``, ``p99_ms``, ``fail_ratio`` and ``rps``
+        thresholds: Limits as in ``THRESHOLDS``
+
+    Returns:
+        list: A message per threshold that was missed; empty on success
+    """
+    failures = []
+    if summary["p95_ms"] > thresholds["max_p95_ms"]:
+        failures.append(f"p95 {summary['p95_ms']:.0f} ms > "
+                        f"{thresholds['max_p95_ms']:g} ms")
+    if summary["p99_ms"] > thresholds["max_p99_ms"]:
+        failures.append(f"p99 {summary['p99_ms']:.0f} ms > "
+                        f"{thresholds['max_p99_ms']:g} ms")
+    if summary["fail_ratio"] > thresholds["max_fail_ratio"]:
+        failures.append(f"failure ratio {summary['fail_ratio']:.2%} > "
+                        f"{thresholds['max_fail_ratio']:.2%}")
+    if thresholds["min_rps"] and summary["rps"] < thresholds["min_rps"]:
+        failures.append(f"throughput {summary['rps']:.1f} req/s < "
+                        f"{thresholds['min_rps']:g} req/s")
+    return failures
+
+
+def seed(db_path: Path, users: int, notes: int):
+    """Create the schema and bulk-insert users and their notes."""
+    # Imported here so locustfile.py can use this module without the app
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from app.database import crud
+    from app.database.database import Base
+    from app.security.hashing import get_password_hash
+
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(bind=engine)
+    # Every account shares one password, so bcrypt runs once
+    password_hash = get_password_hash(LOADTEST_PASSWORD)
+    with sessionmaker(bind=engine)() as db:
+        user_ids = [
+            crud.add_user(db, loadtest_username(index), password_hash).id
+            for index in range(users)
+        ]
+        for position, user_id in enumerate(user_ids):
+            share = range(position, notes, users)
+            crud.import_notes(db, user_id, [
+                {"title": f"Seeded note {i}",
+                 "content": f"Привет, мир! Заметка номер {i}."}
+                for i in share
+            ])
+    engine.dispose()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_up(url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with urllib.request.urlopen(url, timeout=1):
+                return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.2)
+
+
+def summarize(entry) -> dict:
+    """Counts, throughput and latency percentiles of a Locust stats entry."""
+    count = entry.num_requests
+    return {
+        "method": entry.method or "",
+        "name": entry.name,
+        "requests": count,
+        "failures": entry.num_failures,
+        "fail_ratio": entry.num_failures / count if count else 0.0,
+        "rps": entry.total_rps,
+        "p50_ms": entry.get_response_time_percentile(0.5) or 0,
+        "p95_ms": entry.get_response_time_percentile(0.95) or 0,
+        "p99_ms": entry.get_response_time_percentile(0.99) or 0,
+    }
+
+
+def format_report(rows: list) -> str:
+    lines = [f"{'endpoint':<42} {'reqs':>7} {'fail':>5} {'req/s':>7} "
+             f"{'p50':>6} {'p95':>6} {'p99':>6}  (ms)"]
+    for row in rows:
+        endpoint = f"{row['method']} {row['name']}".strip()
+        lines.append(f"{endpoint[:42]:<42} {row['requests']:7d} "
+                     f"{row['failures']:5d} {row['rps']:7.1f} "
+                     f"{row['p50_ms']:6.0f} {row['p95_ms']:6.0f} "
+                     f"{row['p99_ms']:6.0f}")
+    return "\n".join(lines)
+
+
+def run(args) -> int:
+    output = Path(args.output or ROOT / "app" / "data" / "loadtest"
+                  / datetime.now().strftime("%Y%m%dT%H%M%S"))
+    output.mkdir(parents=True, exist_ok=True)
+    db_path = output / "loadtest.db"
+    print(f"Seeding {args.users} users and {args.notes} notes ...")
+    seed(db_path, args.users, args.notes)
+
+    # Served from this process, so it does not compete for the GIL of
+    # the server under test
+    from app.services.translation_backends import start_stub_server
+    stub = start_stub_server(args.translate_latency_ms)
+    results = output / "results.json"
+    # A reused --output must not report an earlier run's results
+    results.unlink(missing_ok=True)
+    port = free_port()
+    env = {
+        **os.environ,
+        "DB_PATH": str(db_path),
+        "DB_PROFILE": args.db_profile,
+        "DB_ECHO": "0",
+        "TRANSLATION_BACKEND": "http",
+        "TRANSLATION_HEDGE_BACKEND": "",
+        "TRANSLATE_URL": f"http://127.0.0.1:{stub.server_port}/translate",
+        "LOADTEST_USERS": str(args.users),
+        "LOADTEST_RESULTS": str(results),
+        "LOADTEST_MAX_P95_MS": str(args.max_p95_ms),
+        "LOADTEST_MAX_P99_MS": str(args.max_p99_ms),
+        "LOADTEST_MAX_FAIL_RATIO": str(args.max_fail_ratio),
+        "LOADTEST_MIN_RPS": str(args.min_rps),
+    }
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app",
+         "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=ROOT, env=env,
+    )
+    try:
+        wait_until_up(f"http://127.0.0.1:{port}/openapi.json")
+        print(f"Running {args.clients} clients for {args.duration}s ...")
+        locust = subprocess.run(
+            [sys.executable, "-m", "locust", "-f", str(ROOT / "locustfile.py"),
+             "--headless", "--only-summary",
+             "--users", str(args.clients),
+             "--spawn-rate", str(args.spawn_rate),
+             "--run-time", f"{args.duration}s",
+             "--host", f"http://127.0.0.1:{port}",
+             "--csv", str(output / "locust"),
+             "--html", str(output / "report.html")],
+            cwd=ROOT, env=env,
+        )
+    finally:
+        server.terminate()
+        server.wait()
+        stub.shutdown()
+        stub.server_close()
+
+    if not results.exists():
+        print(f"FAIL: Locust exited with status {locust.returncode} "
+              f"without writing {results}")
+        return 1
+    with open(results, encoding="utf-8") as file:
+        rows = json.load(file)
+    total = rows[-1]
+    thresholds = {
+        "max_p95_ms": args.max_p95_ms,
+        "max_p99_ms": args.max_p99_ms,
+        "max_fail_ratio": args.max_fail_ratio,
+        "min_rps": args.min_rps,
+    }
+    failures = check_thresholds(total, thresholds)
+    # Locust exits with 1 for failed requests or missed thresholds, both
+    # judged above; anything else means the run itself went wrong
+    if locust.returncode not in (0, 1):
+        failures.append(f"Locust exited with status {locust.returncode}")
+    report = format_report(rows)
+    print(report)
+    with open(output / "summary.json", "w", encoding="utf-8") as file:
+        json.dump({
+            "settings": vars(args) | {"output": str(output)},
+            "thresholds": thresholds,
+            "endpoints": rows,
+            "passed": not failures,
+            "failures": failures,
+        }, file, indent=2)
+    (output / "summary.txt").write_text(report + "\n", encoding="utf-8")
+    print(f"Reports in {output}")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if not failures:
+        print("PASS")
+    return 1 if failures else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--users", type=int, default=50,
+                        help="seeded accounts")
+    parser.add_argument("--notes", type=int, default=10000,
+                        help="seeded notes, spread over the accounts")
+    parser.add_argument("--clients", type=int, default=20,
+                        help="concurrent Locust users")
+    parser.add_argument("--spawn-rate", type=float, default=10)
+    parser.add_argument("--duration", type=int, default=60,
+                        help="seconds of load")
+    parser.add_argument("--db-profile", default="production",
+                        choices=("production", "development"))
+    parser.add_argument("--translate-latency-ms", type=float, default=50,
+                        help="delay of the translation stub")
+    parser.add_argument("--output", help="report directory")
+    parser.add_argument("--max-p95-ms", type=float,
+                        default=THRESHOLDS["max_p95_ms"])
+    parser.add_argument("--max-p99-ms", type=float,
+                        default=THRESHOLDS["max_p99_ms"])
+    parser.add_argument("--max-fail-ratio", type=float,
+                        default=THRESHOLDS["max_fail_ratio"])
+    parser.add_argument("--min-rps", type=float,
+                        default=THRESHOLDS["min_rps"])
+    args = parser.parse_args(argv)
+    if args.clients > args.users:
+        parser.error("--clients may not exceed --users: each client "
+                     "needs its own account")
+    return run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""Check that NDJSON export and import run in constant memory.
+
+Streams every note of a seeded user out of GET /api/notes/export and
+back into POST /api/notes/import over HTTP. Reports throughput and how
+far each direction raised the process's peak RSS. The server runs in a
+thread of this process; the TestClient is not used because it buffers
+whole bodies.
+
+    python -m benchmarks.ndjson_stream --notes 200000
+"""
+
+import argparse
+import os
+import resource
+import socket
+import tempfile
+import threading
+import time
+import httpx
+import uvicorn
+from fastapi import FastAPI
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.auth.dependencies import get_current_principal
+from app.auth.principals import Principal
+from app.database.database import Base, get_db, get_read_db
+from app.database.fts import ensure_fts
+from app.routes import notes
+
+PRINCIPAL = Principal(id=1, username="bench")
+
+
+def build_app(path: str, count: int, content_size: int) -> FastAPI:
+    engine = create_engine(f"sqlite:///{path}",
+                           connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    ensure_fts(engine)
+    content = ("lorem ipsum dolor sit amet " * content_size)[:content_size]
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO users (id, username, password_hash) "
+            "VALUES (1, 'bench', 'x')"
+        )
+        # In batches, so seeding does not set the peak RSS
+        for start in range(0, count, 10000):
+            conn.exec_driver_sql(
+                "INSERT INTO notes (user_id, title, content) "
+                "VALUES (?, ?, ?)",
+                [(1, f"Note {i}", content)
+                 for i in range(start, min(start + 10000, count))],
+            )
+    factory = sessionmaker(bind=engine)
+
+    def override_get_db():
+        db = factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+    app.include_router(notes.router, prefix="/api/notes")
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
+    app.dependency_overrides[get_current_principal] = lambda: PRINCIPAL
+    return app
+
+
+def peak_rss() -> float:
+    """Peak resident set size of this process in MiB (Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def serve(app: FastAPI) -> str:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(
+        app, host="127.0.0.1", port=port, log_level="warning"
+    ))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+def run(count: int, content_size: int):
+    directory = tempfile.mkdtemp()
+    export_path = os.path.join(directory, "notes.ndjson")
+    client = httpx.Client(base_url=serve(build_app(
+        os.path.join(directory, "stream.db"), count, content_size
+    )), timeout=None)
+
+    baseline = peak_rss()
+    started = time.perf_counter()
+    with client.stream("GET", "/api/notes/export") as response, \
+            open(export_path, "wb") as out:
+        for data in response.iter_bytes():
+            out.write(data)
+    elapsed = time.perf_counter() - started
+    size = os.path.getsize(export_path)
+    print(f"export: {count / elapsed:.0f} notes/s, {size / 2**20:.0f} MiB, "
+          f"peak RSS +{peak_rss() - baseline:.1f} MiB")
+
+    def body():
+        with open(export_path, "rb") as source:
+            while data := source.read(64 * 1024):
+                yield data
+
+    baseline = peak_rss()
+    started = time.perf_counter()
+    response = client.post("/api/notes/import", content=body())
+    elapsed = time.perf_counter() - started
+    response.raise_for_status()
+    print(f"import: {response.json()['imported'] / elapsed:.0f} notes/s, "
+          f"peak RSS +{peak_rss() - baseline:.1f} MiB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--notes", type=int, default=200000)
+    parser.add_argument("--content-size", type=int, default=512)
+    args = parser.parse_args()
+    run(args.notes, args.content_size)
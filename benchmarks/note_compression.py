@@ -0,0 +1,162 @@
+"""Storage size and throughput with and without compressed note bodies.
+
+Seeds the same prose-like notes into two SQLite files, one with
+compression disabled and one with the default threshold, then reports
+file size (split into the notes table and the search index), insert
+rate, full-body reads (the export path), summary listings and a scan of
+the table that does not read bodies. Finally the plain file is converted
+in place with the recompression command.
+
+    python -m benchmarks.note_compression --notes 20000 --mean-size 4096
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.database import compression, crud
+from app.database.database import Base
+from app.database.fts import ensure_fts, optimize_fts, sync_index
+
+
+def make_bodies(count: int, mean_size: int, seed: int = 42) -> list:
+    """Word soup with a Zipf-like vocabulary, which compresses like prose."""
+    rng = random.Random(seed)
+    vocabulary = [
+        "".join(rng.choice("etaoinshrdlucmfwypvbgkjqxz")
+                for _ in range(rng.randint(2, 10)))
+        for _ in range(5000)
+    ]
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    bodies = []
+    for _ in range(count):
+        size = int(rng.expovariate(1 / mean_size)) + 64
+        words = rng.choices(vocabulary, weights, k=size // 6 + 1)
+        bodies.append(" ".join(words)[:size])
+    return bodies
+
+
+def open_engine(path: str):
+    return sync_index(compression.register_functions(
+        create_engine(f"sqlite:///{path}")
+    ))
+
+
+def build(path: str):
+    engine = open_engine(path)
+    Base.metadata.create_all(bind=engine)
+    ensure_fts(engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO users (id, username, password_hash) "
+            "VALUES (1, 'bench', 'x')"
+        )
+    return engine
+
+
+def file_size(engine) -> int:
+    with engine.connect() as conn:
+        conn.exec_driver_sql("VACUUM")
+        pages = conn.exec_driver_sql("PRAGMA page_count").scalar()
+        page_size = conn.exec_driver_sql("PRAGMA page_size").scalar()
+    return pages * page_size
+
+
+def table_sizes(engine) -> dict:
+    """Bytes used by the notes table and by the search index."""
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(
+            "SELECT name, sum(pgsize) FROM dbstat GROUP BY name"
+        ).all()
+    sizes = {"notes": 0, "index": 0}
+    for name, size in rows:
+        if name == "notes":
+            sizes["notes"] += size
+        elif name.startswith("notes_fts"):
+            sizes["index"] += size
+    return sizes
+
+
+def timed(func) -> float:
+    started = time.perf_counter()
+    func()
+    return time.perf_counter() - started
+
+
+def measure(engine, bodies: list, threshold: int) -> dict:
+    factory = sessionmaker(bind=engine)
+    notes = [{"title": f"Note {i}", "content": body}
+             for i, body in enumerate(bodies)]
+    compression.NOTE_COMPRESS_THRESHOLD = threshold
+    with factory() as db:
+        insert = timed(lambda: [
+            crud.import_notes(db, 1, notes[start:start + 1000])
+            for start in range(0, len(notes), 1000)
+        ])
+
+        def read_all():
+            for _ in crud.iter_user_note_chunks(db, 1):
+                pass
+
+        summary_columns = crud.note_list_columns(crud.NOTE_SUMMARY_FIELDS)
+
+        def read_summaries():
+            for skip in range(0, len(notes), 100):
+                crud.get_user_note_rows(db, 1, skip=skip, limit=100,
+                                        columns=summary_columns)
+
+        read = timed(read_all)
+        summaries = timed(read_summaries)
+    with engine.connect() as conn:
+        scan = timed(lambda: conn.exec_driver_sql(
+            "SELECT count(*) FROM notes WHERE title LIKE '%9%'"
+        ).scalar())
+    return {
+        "size": file_size(engine),
+        **table_sizes(engine),
+        "insert": len(notes) / insert,
+        "read": len(notes) / read,
+        "summaries": len(notes) / summaries,
+        "scan_ms": scan * 1000,
+    }
+
+
+def run(count: int, mean_size: int):
+    bodies = make_bodies(count, mean_size)
+    content = sum(len(body.encode()) for body in bodies)
+    print(f"{count} notes, {content / 2**20:.1f} MiB of content")
+    directory = tempfile.mkdtemp()
+    threshold = compression.NOTE_COMPRESS_THRESHOLD or 1024
+    results = {}
+    for name, setting in (("plain", 0), ("compressed", threshold)):
+        engine = build(os.path.join(directory, f"{name}.db"))
+        results[name] = measure(engine, bodies, setting)
+        engine.dispose()
+        stats = results[name]
+        print(f"{name:>10}: {stats['size'] / 2**20:6.1f} MiB "
+              f"(notes {stats['notes'] / 2**20:.1f}, "
+              f"search index {stats['index'] / 2**20:.1f})  "
+              f"insert {stats['insert']:7.0f}/s  "
+              f"read {stats['read']:7.0f}/s  "
+              f"summary {stats['summaries']:7.0f}/s  "
+              f"title scan {stats['scan_ms']:6.1f} ms")
+
+    engine = open_engine(os.path.join(directory, "plain.db"))
+    elapsed = timed(lambda: compression.recompress(engine, threshold))
+    with engine.begin() as conn:
+        optimize_fts(conn)
+    print(f"recompress: {count / elapsed:.0f} notes/s, file "
+          f"{results['plain']['size'] / 2**20:.1f} -> "
+          f"{file_size(engine) / 2**20:.1f} MiB")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--notes", type=int, default=20000)
+    parser.add_argument("--mean-size", type=int, default=4096)
+    args = parser.parse_args()
+    run(args.notes, args.mean_size)
@@ -1,50 +1,136 @@
-from locust import HttpUser, task, between
+"""Weighted note traffic for Locust.
+
+Each simulated user logs in as its own account, ``loadtest0`` to
+``loadtest<LOADTEST_USERS - 1>``, and works on its own notes. Seed the
+accounts and run the whole test offline with ``python -m
+benchmarks.loadtest``; to point Locust at a server seeded the same way::
+
+    locust -f locustfile.py --headless -u 20 -r 10 -t 60s \\
+        --host http://127.0.0.1:8000
+
+Task weights can be changed with ``LOADTEST_WEIGHTS``, e.g.
+``get=40,list=25,create=10,update=10,delete=5,translate=10``. The run
+exits with status 1 if the aggregate results miss the thresholds in
+``benchmarks.loadtest.THRESHOLDS``.
+"""
+
+import itertools
+import json
+import os
 import random
+from locust import HttpUser, constant, events, task
+from benchmarks.loadtest import (
+    LOADTEST_PASSWORD,
+    THRESHOLDS,
+    check_thresholds,
+    loadtest_username,
+    summarize,
+)
+
+LOADTEST_USERS = int(os.getenv("LOADTEST_USERS", "50"))
+LOADTEST_WAIT = float(os.getenv("LOADTEST_WAIT", "0"))
+# Final per-endpoint results are written here as JSON when set
+LOADTEST_RESULTS = os.getenv("LOADTEST_RESULTS")
+WEIGHTS = {"get": 40, "list": 25, "create": 10, "update": 10, "delete": 5,
+           "translate": 10}
+WEIGHTS.update(
+    (name, int(weight)) for name, weight in (
+        item.split("=") for item in
+        os.getenv("LOADTEST_WEIGHTS", "").split(",") if item
+    )
+)
+NOTE_PATH = "/api/notes/{note_id}"
+
+_accounts = itertools.count()
 
 
 class NoteAppUser(HttpUser):
-    wait_time = between(1, 3)
+    wait_time = constant(LOADTEST_WAIT)
 
     def on_start(self):
-        # Login and store the token
+        username = loadtest_username(next(_accounts) % LOADTEST_USERS)
         response = self.client.post(
             "/auth/login",
-            json={"username": "testuser", "password": "testpass"}
+            json={"username": username, "password": LOADTEST_PASSWORD},
+        )
+        response.raise_for_status()
+        token = response.json()["access_token"]
+        self.headers = {"Authorization": f"Bearer {token}"}
+        response = self.client.get(
+            "/api/notes/?limit=1000&fields=id", headers=self.headers,
+            name="/api/notes/ (ids)",
         )
-        self.token = response.json()["access_token"]
-        self.headers = {"Authorization": f"Bearer {self.token}"}
+        self.note_ids = [note["id"] for note in response.json()]
+
+    def _note_id(self):
+        """One of the user's notes, or None to skip the task.
+
+        A user that has deleted all its notes skips note tasks until the
+        create task adds one, so the request mix keeps its weights.
+        """
+        return random.choice(self.note_ids) if self.note_ids else None
 
-    @task(3)
+    @task(WEIGHTS["create"])
     def create_note(self):
-        self.client.post(
-            "/notes/",
-            json={
-                "title": f"Test Note {random.randint(1, 1000)}",
-                "content": "Test Content"
-            },
-            headers=self.headers
+        response = self.client.post(
+            "/api/notes/",
+            json={"title": f"Load test note {random.randint(1, 10**6)}",
+                  "content": "Привет, мир! " * random.randint(1, 20)},
+            headers=self.headers,
         )
+        if response.ok:
+            self.note_ids.append(response.json()["id"])
 
-    @task(2)
+    @task(WEIGHTS["list"])
     def list_notes(self):
-        self.client.get("/notes/", headers=self.headers)
+        self.client.get("/api/notes/?limit=50", headers=self.headers)
+
+    @task(WEIGHTS["get"])
+    def get_note(self):
+        note_id = self._note_id()
+        if note_id is not None:
+            self.client.get(f"/api/notes/{note_id}", headers=self.headers,
+                            name=NOTE_PATH)
+
+    @task(WEIGHTS["update"])
+    def update_note(self):
+        note_id = self._note_id()
+        if note_id is not None:
+            self.client.put(
+                f"/api/notes/{note_id}",
+                json={"title": f"Updated {random.randint(1, 10**6)}"},
+                headers=self.headers, name=NOTE_PATH,
+            )
+
+    @task(WEIGHTS["delete"])
+    def delete_note(self):
+        note_id = self._note_id()
+        if note_id is not None:
+            self.note_ids.remove(note_id)
+            self.client.delete(f"/api/notes/{note_id}",
+                               headers=self.headers, name=NOTE_PATH)
 
-    @task(1)
+    @task(WEIGHTS["translate"])
     def translate_note(self):
-        # First create a note
-        response = self.client.post(
-            "/notes/",
-            json={
-                "title": "Note to Translate",
-                "content": "Привет, мир!"
-            },
-            headers=self.headers
-        )
-        note_id = response.json()["id"]
+        note_id = self._note_id()
+        if note_id is not None:
+            # The route always translates ru -> en and takes no body
+            self.client.post(f"/api/notes/{note_id}/translate",
+                             headers=self.headers,
+                             name=NOTE_PATH + "/translate")
 
-        # Then translate it
-        self.client.post(
-            f"/notes/{note_id}/translate",
-            json={"target_lang": "en"},
-            headers=self.headers
-        )
+
+@events.quitting.add_listener
+def report_results(environment, **kwargs):
+    """Save the final results and fail the run on missed thresholds."""
+    stats = environment.stats
+    rows = [summarize(entry) for _, entry in sorted(stats.entries.items())]
+    rows.append(summarize(stats.total))
+    if LOADTEST_RESULTS:
+        with open(LOADTEST_RESULTS, "w", encoding="utf-8") as file:
+            json.dump(rows, file, indent=2)
+    failures = check_thresholds(rows[-1], THRESHOLDS)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        environment.process_exit_code = 1